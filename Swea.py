@@ -1,12 +1,14 @@
 
 from gevent import monkey
 monkey.patch_all()
-from src.init import init_devika
+from src.init import init_devika, start_warm_up, get_readiness, is_ready
 init_devika()
+start_warm_up()
 
 
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
+from flask_socketio import join_room, leave_room
 from src.socket_instance import socketio, emit_agent
 import os
 import logging
@@ -16,6 +18,7 @@ import tiktoken
 from src.apis.project import project_bp
 from src.config import Config
 from src.logger import Logger, route_logger
+from src.prompts import PromptRegistry
 from src.project import ProjectManager
 from src.state import AgentState
 from src.agents import Agent
@@ -58,7 +61,7 @@ def test_connect(data):
 def data():
     project = manager.get_project_list()
     models = LLM().list_models()
-    search_engines = ["Bing", "Google", "DuckDuckGo"]
+    search_engines = ["Bing", "Google", "DuckDuckGo", "Federated"]
     return jsonify({"projects": project, "models": models, "search_engines": search_engines})
 
 
@@ -213,10 +216,49 @@ def token_usage():
     return jsonify({"token_usage": token_count})
 
 
+@app.route("/api/prompt-stats", methods=["GET"])
+@route_logger(logger)
+def prompt_stats():
+    return jsonify({"prompt_stats": PromptRegistry().get_stats()})
+
+
 @app.route("/api/logs", methods=["GET"])
 def real_time_logs():
-    log_file = logger.read_log_file()
-    return jsonify({"logs": log_file})
+    cursor = request.args.get("cursor")
+    lines = request.args.get("lines", 100, type=int)
+    return jsonify(logger.tail(cursor, lines))
+
+
+log_follower_started = False
+
+
+def follow_logs():
+    """
+    Push the lines appended to the log file to the "logs" room every second.
+    Every message carries the cursor it starts from, so clients can tell
+    when they missed lines and fetch them from /api/logs.
+    """
+    cursor = logger.tail(lines=0)["cursor"]
+    while True:
+        socketio.sleep(1)
+        result = logger.tail(cursor)
+        if result["logs"]:
+            socketio.emit("logs", {"from": cursor, **result}, to="logs")
+        cursor = result["cursor"]
+
+
+@socketio.on('logs_subscribe')
+def logs_subscribe(data=None):
+    global log_follower_started
+    join_room("logs")
+    if not log_follower_started:
+        log_follower_started = True
+        socketio.start_background_task(follow_logs)
+
+
+@socketio.on('logs_unsubscribe')
+def logs_unsubscribe(data=None):
+    leave_room("logs")
 
 
 @app.route("/api/settings", methods=["POST"])
@@ -237,7 +279,7 @@ def get_settings():
 @app.route("/api/status", methods=["GET"])
 @route_logger(logger)
 def status():
-    return jsonify({"status": "server is running!"})
+    return jsonify({"status": "server is running!", "ready": is_ready(), "components": get_readiness()})
 
 if __name__ == "__main__":
     logger.info("Swea is up and running!")
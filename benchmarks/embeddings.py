@@ -0,0 +1,106 @@
+"""
+Compares the embedding backends (src/bert/embeddings.py) for keyword
+extraction: load time, peak RSS, per-sentence latency, and how many of the
+keywords each backend picks agree with the PyTorch model's.
+
+Each backend runs in its own interpreter so the memory numbers don't mix.
+
+    python benchmarks/embeddings.py
+    python benchmarks/embeddings.py --backends torch int8 --runs 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENTENCES = [
+    "Create a Flask REST API with JWT authentication and a SQLite database",
+    "Build a React dashboard that charts real-time stock prices over websockets",
+    "Write a Python script that scrapes product reviews and runs sentiment analysis",
+    "Set up a Dockerfile and GitHub Actions workflow to test and deploy a Node.js service",
+    "Implement a command line todo app in Rust with persistent JSON storage",
+    "Train a small image classifier with PyTorch on the CIFAR-10 dataset",
+    "Add pagination and full-text search to the blog's PostgreSQL queries",
+    "Fix the memory leak in the WebSocket connection handler of the chat server",
+]
+
+
+def worker(backend_name: str, runs: int):
+    sys.path.insert(0, ROOT)
+    from keybert import KeyBERT
+
+    from src.bert.embeddings import create_backend, keybert_embedder
+    from src.bert.sentence import KEYWORD_OPTIONS
+
+    start = time.perf_counter()
+    model = KeyBERT(model=keybert_embedder(create_backend(backend_name)))
+    model.extract_keywords(SENTENCES[0], top_n=5, **KEYWORD_OPTIONS)
+    load_time = time.perf_counter() - start
+
+    latencies, keywords = [], {}
+    for _ in range(runs):
+        for sentence in SENTENCES:
+            start = time.perf_counter()
+            keywords[sentence] = [keyword for keyword, _ in model.extract_keywords(sentence, top_n=5, **KEYWORD_OPTIONS)]
+            latencies.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        "load_seconds": load_time,
+        "latency_ms": statistics.median(latencies) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "keywords": keywords,
+    }))
+
+
+def run_backend(backend_name: str, runs: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", backend_name, "--runs", str(runs)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{backend_name} backend failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def overlap(keywords: dict, baseline: dict) -> float:
+    scores = []
+    for sentence, expected in baseline.items():
+        expected, found = set(expected), set(keywords.get(sentence, []))
+        if expected or found:
+            scores.append(len(expected & found) / len(expected | found))
+    return statistics.mean(scores) if scores else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the embedding backends for keyword extraction.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "int8"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.runs)
+        return
+
+    results = {backend: run_backend(backend, args.runs) for backend in args.backends}
+    baseline = results.get("torch", next(iter(results.values())))["keywords"]
+
+    print(f"{'backend':<8} {'load (s)':>9} {'latency (ms)':>13} {'peak RSS (MB)':>14} {'keyword overlap':>16}")
+    for backend, result in results.items():
+        print(
+            f"{backend:<8} {result['load_seconds']:>9.2f} {result['latency_ms']:>13.1f} "
+            f"{result['peak_rss_mb']:>14.0f} {overlap(result['keywords'], baseline):>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Import-time benchmark for the server's startup path.
+
+Every module is imported in a fresh interpreter (a few times, the median is
+kept), so the numbers are what a new worker pays before it can serve. With
+--budget the script fails when a module takes longer than that, which keeps
+heavy imports (models, provider SDKs) from creeping back into startup.
+
+--importtime breaks each import down with `python -X importtime`: the
+slowest packages it pulls in, and whether any provider SDK is among them
+(which fails the run, as those should load only when the provider is used).
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget 3 src.llm
+    python benchmarks/import_time.py --importtime --top 15 src.agents
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["src.init", "src.llm", "src.agents"]
+
+PROVIDER_SDKS = ["anthropic", "openai", "google.generativeai", "mistralai", "groq", "ollama"]
+
+MEASURE = """
+import sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def measure(module: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", MEASURE, module],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip()}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def import_tree(module: str) -> list:
+    """
+    [(package, self seconds, cumulative seconds)] from `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip()}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|")
+        imports.append((package.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return imports
+
+
+def report_import_tree(module: str, top: int) -> dict:
+    imports = import_tree(module)
+    packages = {package for package, _, _ in imports}
+    sdks = [sdk for sdk in PROVIDER_SDKS if sdk in packages]
+    slowest = sorted(imports, key=lambda entry: -entry[1])[:top]
+    return {
+        "total": sum(self_seconds for _, self_seconds, _ in imports),
+        "modules": len(imports),
+        "provider_sdks": sdks,
+        "slowest": [{"package": package, "self": self_seconds, "cumulative": cumulative} for package, self_seconds, cumulative in slowest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the server's modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="fail when a module takes longer (seconds)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--importtime", action="store_true", help="break the imports down with -X importtime")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages shown with --importtime")
+    args = parser.parse_args()
+
+    if args.importtime:
+        reports = {module: report_import_tree(module, args.top) for module in args.modules}
+        if args.json:
+            print(json.dumps(reports, indent=2))
+        else:
+            for module, report in reports.items():
+                print(f"{module}: {report['total'] * 1000:.1f} ms over {report['modules']} modules")
+                for entry in report["slowest"]:
+                    print(f"  {entry['package']:<40} {entry['self'] * 1000:>8.1f} ms self {entry['cumulative'] * 1000:>9.1f} ms cumulative")
+
+        eager = {module: report["provider_sdks"] for module, report in reports.items() if report["provider_sdks"]}
+        if eager:
+            for module, sdks in eager.items():
+                print(f"{module} imports provider SDKs: {', '.join(sdks)}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    results = {module: measure(module, args.runs) for module in args.modules}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, seconds in results.items():
+            print(f"{module:<30} {seconds * 1000:>9.1f} ms")
+
+    over_budget = [module for module, seconds in results.items() if args.budget and seconds > args.budget]
+    if over_budget:
+        print(f"over the {args.budget}s budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
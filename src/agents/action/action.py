@@ -1,12 +1,11 @@
 import json
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.services.utils import retry_wrapper, validate_responses
 from src.config import Config
 from src.llm import LLM
 
-PROMPT = open("src/agents/action/prompt.jinja2", "r").read().strip()
 
 class Action:
     def __init__(self, base_model: str):
@@ -18,9 +17,8 @@ class Action:
     def render(
         self, conversation: str
     ) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "action/prompt.jinja2",
             conversation=conversation
         )
 
@@ -11,15 +11,18 @@ from .patcher import Patcher
 from .reporter import Reporter
 from .decision import Decision
 
+from src.config import Config
 from src.project import ProjectManager
 from src.state import AgentState
 from src.logger import Logger
 
-from src.bert.sentence import SentenceBert
+from src.bert.sentence import KeywordService
 from src.memory import KnowledgeBase
-from src.services.search import BingSearch, GoogleSearch, DuckDuckGoSearch
+from src.services.search import ENGINES, DuckDuckGoSearch, FederatedSearch
 from src.services.browser import Browser
 from src.services.browser import start_interaction
+from src.services.url_cache import UrlCache
+from src.services.extractor import count_tokens, html_to_markdown, truncate_tokens
 from src.filesystem import ReadCode
 from src.services import Netlify
 from src.documenter.pdf import PDF
@@ -29,9 +32,15 @@ import time
 import platform
 import tiktoken
 import asyncio
+import concurrent.futures
+import threading
 
 from src.socket_instance import emit_agent
 
+# queries whose stored research is being refreshed in the background
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
 
 class Agent:
     def __init__(self, base_model: str, search_engine: str = None, browser: Browser = None):
@@ -70,84 +79,278 @@ class Agent:
         self.agent_state = AgentState()
         self.engine = search_engine
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.url_cache = UrlCache(extract=self.extract_page) if Config().get_url_cache_enabled() else None
+        self.knowledge_base = KnowledgeBase() if Config().get_knowledge_enabled() else None
 
     async def open_page(self, project_name, url):
-        browser = await Browser().start()
+        browser = await Browser(text_only=Config().get_browser_text_only()).start()
 
-        await browser.go_to(url)
-        _, raw = await browser.screenshot(project_name)
-        data = await browser.extract_text()
-        await browser.close()
+        try:
+            await browser.go_to(url)
+            _, raw = await browser.screenshot(project_name)
+            data = await browser.extract_text()
+            html = await browser.get_html()
+        finally:
+            await browser.close()
 
-        return browser, raw, data
+        return {"url": url, "screenshot": raw, "text": data, "html": html, "headers": browser.response_headers}
+
+    def extract_page(self, page: dict) -> str:
+        """
+        Clean Markdown of the page's main content, or its plain text when
+        nothing useful could be extracted from the HTML.
+        """
+        max_tokens = Config().get_research_extract_max_tokens()
+        if page["html"]:
+            try:
+                markdown = html_to_markdown(page["html"], max_tokens)
+                if len(markdown) >= 200 or not page["text"]:
+                    return markdown
+            except Exception as e:
+                self.logger.warning(f"Could not extract {page['url']}: {e}")
+        return truncate_tokens(page["text"] or "", max_tokens)
+
+    def get_search_engine(self):
+        if not self.engine:
+            from src.config.defaults import DEFAULT_SEARCH_ENGINE
+            self.engine = DEFAULT_SEARCH_ENGINE
+
+        if self.engine.lower() == 'federated':
+            return FederatedSearch()
+        # Default to DuckDuckGo
+        return ENGINES.get(self.engine.lower(), DuckDuckGoSearch)()
+
+    def search_links(self, query: str) -> list:
+        # search engines keep the last results, so every query gets its own
+        web_search = self.get_search_engine()
+        web_search.search(query)
+        return web_search.get_links()
+
+    async def fetch_page(self, link: str, project_name: str):
+        """
+        The page at `link`, from the URL cache while it's still valid and from
+        the browser otherwise.
+        """
+        loop = asyncio.get_running_loop()
+
+        if self.url_cache:
+            entry = await loop.run_in_executor(None, self.url_cache.get, link)
+            if entry:
+                self.logger.info(f"Using the cached page: {link}")
+                return {"url": link, "text": entry["text"], "html": entry["html"], "summary": entry["summary"]}
+
+        page = await self.open_page(project_name, link)
+        page["text"] = await loop.run_in_executor(None, self.extract_page, page)
+        if self.url_cache and page["text"]:
+            await loop.run_in_executor(None, self.url_cache.put, link, page["html"], page["text"], page["headers"])
+
+        return page
+
+    async def fetch_query(self, query: str, project_name: str):
+        """
+        The first search result for `query` that has any content.
+        """
+        loop = asyncio.get_running_loop()
+
+        self.logger.info(f"Searching for: {query}")
+        links = await loop.run_in_executor(None, self.search_links, query)
+        if not links:
+            self.logger.warning(f"No results found for query: {query}")
+            return None
+
+        page = None
+        for link in links:
+            page = await self.fetch_page(link, project_name)
+            if page["text"]:
+                break
+            self.logger.warning(f"No content at {link}, trying the next result")
+        return page
+
+    async def research_query(
+        self,
+        query: str,
+        project_name: str,
+        fetch_semaphore: asyncio.Semaphore,
+        format_semaphore: asyncio.Semaphore,
+        timeout: float,
+        use_knowledge: bool = True
+    ):
+        """
+        The stored research for `query` when there is some (refreshing it in
+        the background once it's stale), otherwise research it on the web and
+        store the result.
+        """
+        loop = asyncio.get_running_loop()
+        config = Config()
+
+        if self.knowledge_base and use_knowledge:
+            known = await loop.run_in_executor(
+                None, self.knowledge_base.find_research, query, config.get_knowledge_similarity_threshold()
+            )
+            if known and known["age"] < config.get_knowledge_max_age():
+                self.logger.info(f"Using stored research ({known['tag']}) for: {query}")
+                if known["age"] >= config.get_knowledge_freshness():
+                    self.refresh_research(query, project_name)
+                return known["contents"]
+
+        result, url = await self.research_page(query, project_name, fetch_semaphore, format_semaphore, timeout)
+
+        if result and self.knowledge_base:
+            await loop.run_in_executor(None, self.knowledge_base.save_research, query, result, url, project_name)
+        return result
+
+    def refresh_research(self, query: str, project_name: str):
+        """
+        Research a query again in the background; its stored result is used
+        meanwhile.
+        """
+        with _refreshing_lock:
+            if query in _refreshing:
+                return
+            _refreshing.add(query)
+
+        async def refresh():
+            semaphore = asyncio.Semaphore(1)
+            await self.research_query(
+                query, project_name, semaphore, semaphore, Config().get_research_query_timeout(), use_knowledge=False
+            )
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(refresh())
+                self.logger.info(f"Refreshed stored research for: {query}")
+            except Exception as e:
+                self.logger.warning(f"Could not refresh stored research for '{query}': {e}")
+            finally:
+                loop.close()
+                with _refreshing_lock:
+                    _refreshing.discard(query)
+
+        threading.Thread(target=run, name="research-refresh", daemon=True).start()
+
+    async def research_page(
+        self,
+        query: str,
+        project_name: str,
+        fetch_semaphore: asyncio.Semaphore,
+        format_semaphore: asyncio.Semaphore,
+        timeout: float
+    ):
+        """
+        Search, open the first result and summarize it when it's long.
+        Fetching is bounded separately from the Formatter, so the next pages
+        load while earlier ones are being summarized. The timeout covers the
+        search and the page load, from when the query gets its turn.
+        Returns the result and the URL of the page it came from.
+        """
+        loop = asyncio.get_running_loop()
+
+        async with fetch_semaphore:
+            page = await asyncio.wait_for(self.fetch_query(query, project_name), timeout=timeout)
+
+        if not page:
+            return None, None
+        if not page["text"]:
+            self.logger.error(f"Failed to process search results for: {query}")
+            return None, page["url"]
+
+        if page.get("screenshot"):
+            emit_agent("screenshot", {"data": page["screenshot"], "project_name": project_name}, False)
+        if page.get("summary"):
+            return page["summary"], page["url"]
+
+        # the extracted text is already clean, the Formatter only condenses long pages
+        if count_tokens(page["text"]) <= Config().get_research_formatter_threshold():
+            return page["text"], page["url"]
+
+        async with format_semaphore:
+            summary = await loop.run_in_executor(None, self.formatter.execute, page["text"], project_name)
+
+        if self.url_cache and summary:
+            await loop.run_in_executor(None, self.url_cache.set_summary, page["url"], summary)
+
+        return summary, page["url"]
+
+    async def research(self, queries: list, project_name: str) -> dict:
+        config = Config()
+        concurrency = config.get_research_concurrency()
+        query_timeout = config.get_research_query_timeout()
+        time_budget = config.get_research_time_budget()
+
+        fetch_semaphore = asyncio.Semaphore(concurrency)
+        format_semaphore = asyncio.Semaphore(concurrency)
+
+        tasks = {
+            asyncio.ensure_future(
+                self.research_query(query, project_name, fetch_semaphore, format_semaphore, query_timeout)
+            ): query
+            for query in queries
+        }
+        done, pending = await asyncio.wait(tasks, timeout=time_budget)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.logger.warning(
+                f"Research budget of {time_budget}s used up, "
+                f"continuing without: {', '.join(tasks[task] for task in pending)}"
+            )
+            await asyncio.wait(pending)
 
-    def search_queries(self, queries: list, project_name: str) -> dict:
         results = {}
-        knowledge_base = KnowledgeBase()
-        
-        # Initialize the appropriate search engine
+        for task, query in tasks.items():
+            if task not in done:
+                continue
+            try:
+                result = task.result()
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Query timed out after {query_timeout}s: {query}")
+                continue
+            except Exception as e:
+                self.logger.error(f"Error processing search query '{query}': {str(e)}")
+                continue
+            if result:
+                results[query] = result
+                self.logger.info(f"Successfully processed search results for: {query}")
+
+        return results
+
+    def search_queries(self, queries: list, project_name: str) -> dict:
+        # the same query in other case or spacing is researched once, results
+        # are keyed by the query as the model wrote it
+        unique = {}
+        for query in queries:
+            if query and query.strip():
+                unique.setdefault(" ".join(query.lower().split()), query)
+        queries = list(unique.values())
+        if not queries:
+            return {}
+
+        self.logger.info(f"\nSearch Engine :: {self.engine}")
+
+        start_time = time.time()
+        loop = asyncio.new_event_loop()
+        executor = concurrent.futures.ThreadPoolExecutor()
+        loop.set_default_executor(executor)
         try:
-            if not self.engine:
-                from src.config.defaults import DEFAULT_SEARCH_ENGINE
-                self.engine = DEFAULT_SEARCH_ENGINE
-                
-            self.logger.info(f"Using search engine: {self.engine}")
-            
-            if self.engine.lower() == 'google':
-                from src.services.search import GoogleSearch
-                web_search = GoogleSearch()
-            elif self.engine.lower() == 'bing':
-                from src.services.search import BingSearch
-                web_search = BingSearch()
-            else:  # Default to DuckDuckGo
-                from src.services.search import DuckDuckGoSearch
-                web_search = DuckDuckGoSearch()
-                
-            self.logger.info(f"\nSearch Engine :: {self.engine}")
-
-            for query in queries:
-                if not query or not query.strip():
-                    continue
-                    
-                query = query.strip().lower()
-                self.logger.info(f"Searching for: {query}")
-                
-                try:
-                    # Perform the search
-                    web_search.search(query)
-                    link = web_search.get_first_link()
-                    
-                    if not link:
-                        self.logger.warning(f"No results found for query: {query}")
-                        continue
-                        
-                    # Open the page and get the content
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    browser, raw, data = loop.run_until_complete(self.open_page(project_name, link))
-                    
-                    if browser and raw and data:
-                        emit_agent("screenshot", {"data": raw, "project_name": project_name}, False)
-                        results[query] = self.formatter.execute(data, project_name)
-                        self.logger.info(f"Successfully processed search results for: {query}")
-                    else:
-                        self.logger.error(f"Failed to process search results for: {query}")
-                        
-                except Exception as e:
-                    self.logger.error(f"Error processing search query '{query}': {str(e)}")
-                    continue
-                    
-        except Exception as e:
-            self.logger.error(f"Error initializing search engine: {str(e)}")
-            raise
-            
+            results = loop.run_until_complete(self.research(queries, project_name))
+        finally:
+            # queries cut off by the budget may still be running in threads;
+            # drop what hasn't started rather than wait for them
+            executor.shutdown(wait=False, cancel_futures=True)
+            loop.close()
+
+        self.logger.info(
+            f"Research: {len(results)}/{len(queries)} queries answered in {time.time() - start_time:.2f}s"
+        )
         return results
 
     def update_contextual_keywords(self, sentence: str):
         """
             Update the context keywords with the latest sentence/prompt
         """
-        keywords = SentenceBert(sentence).extract_keywords()
+        keywords = KeywordService().extract_keywords(sentence)
         for keyword in keywords:
             self.collected_context_keywords.append(keyword[0])
 
@@ -267,13 +470,17 @@ class Agent:
             self.feature.save_code_to_project(code, project_name)
 
         elif action == "bug":
+            # a pasted traceback narrows the code down just like a failed run
+            project_path = self.project_manager.get_project_path(project_name)
+            context, focused = self.runner.failure_context(prompt, project_path, code_markdown)
             code = self.patcher.execute(
                 conversation=conversation,
-                code_markdown=code_markdown,
+                code_markdown=context,
                 commands=None,
                 error=prompt,
                 system_os=os_system,
-                project_name=project_name
+                project_name=project_name,
+                focused=focused
             )
             print("\nbug code :: ", code, '\n')
             self.patcher.save_code_to_project(code, project_name)
@@ -1,12 +1,11 @@
 import json
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.services.utils import retry_wrapper, validate_responses
 from src.config import Config
 from src.llm import LLM
 
-PROMPT = open("src/agents/answer/prompt.jinja2", "r").read().strip()
 
 class Answer:
     def __init__(self, base_model: str):
@@ -18,9 +17,8 @@ class Answer:
     def render(
         self, conversation: str, code_markdown: str
     ) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "answer/prompt.jinja2",
             conversation=conversation,
             code_markdown=code_markdown
         )
@@ -1,20 +1,17 @@
 import json
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.services.utils import retry_wrapper, validate_responses
 from src.llm import LLM
 
-PROMPT = open("src/agents/decision/prompt.jinja2").read().strip()
 
 class Decision:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
 
     def render(self, prompt: str) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(prompt=prompt)
+        return PromptRegistry().render("decision/prompt.jinja2", prompt=prompt)
 
     @validate_responses
     def validate_response(self, response: str):
@@ -1,17 +1,14 @@
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.llm import LLM
 
-PROMPT = open("src/agents/formatter/prompt.jinja2").read().strip()
 
 class Formatter:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
 
     def render(self, raw_text: str) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(raw_text=raw_text)
+        return PromptRegistry().render("formatter/prompt.jinja2", raw_text=raw_text)
     
     def validate_response(self, response: str) -> bool:
         return True
@@ -1,20 +1,17 @@
 import json
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.llm import LLM
 from src.services.utils import retry_wrapper, validate_responses
 
-PROMPT = open("src/agents/internal_monologue/prompt.jinja2").read().strip()
 
 class InternalMonologue:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
 
     def render(self, current_prompt: str) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(current_prompt=current_prompt)
+        return PromptRegistry().render("internal_monologue/prompt.jinja2", current_prompt=current_prompt)
 
     @validate_responses
     def validate_response(self, response: str):
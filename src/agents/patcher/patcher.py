@@ -1,22 +1,22 @@
-import os
-import time
-
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 from typing import List, Dict, Union
-from src.socket_instance import emit_agent
 
 from src.config import Config
 from src.llm import LLM
-from src.state import AgentState
+from src.logger import Logger
+from src.filesystem.patch import apply_edit_response
+from src.filesystem.writer import write_files
+from src.filesystem.read_code import ReadCode
+from src.filesystem.failure_context import build_failure_context
+from src.filesystem.code_parser import CodeStreamParser, parse_code_response, present_code, stream_to_editor
 from src.services.utils import retry_wrapper
 
-PROMPT = open("src/agents/patcher/prompt.jinja2", "r").read().strip()
 
 class Patcher:
     def __init__(self, base_model: str):
         config = Config()
         self.project_dir = config.get_projects_dir()
-        
+        self.logger = Logger()
         self.llm = LLM(model_id=base_model)
 
     def render(
@@ -25,60 +25,29 @@ class Patcher:
         code_markdown: str,
         commands: list,
         error :str,
-        system_os: str
+        system_os: str,
+        edit_format: str = "whole",
+        focused: bool = False
     ) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "patcher/prompt.jinja2",
             conversation=conversation,
             code_markdown=code_markdown,
             commands=commands,
             error=error,
-            system_os=system_os
+            system_os=system_os,
+            edit_format=edit_format,
+            focused=focused
         )
 
     def validate_response(self, response: str) -> Union[List[Dict[str, str]], bool]:
-        response = response.strip()
-
-        response = response.split("~~~", 1)[1]
-        response = response[:response.rfind("~~~")]
-        response = response.strip()
-
-        result = []
-        current_file = None
-        current_code = []
-        code_block = False
-
-        for line in response.split("\n"):
-            if line.startswith("File: "):
-                if current_file and current_code:
-                    result.append({"file": current_file, "code": "\n".join(current_code)})
-                current_file = line.split("`")[1].strip()
-                current_code = []
-                code_block = False
-            elif line.startswith("```"):
-                code_block = not code_block
-            else:
-                current_code.append(line)
-
-        if current_file and current_code:
-            result.append({"file": current_file, "code": "\n".join(current_code)})
-
-        return result
+        self.logger.debug(f"Response from the model: {response}")
+
+        return parse_code_response(response)
 
     def save_code_to_project(self, response: List[Dict[str, str]], project_name: str):
-        file_path_dir = None
-        project_name = project_name.lower().replace(" ", "-")
+        return write_files(self.get_project_path(project_name), response)
 
-        for file in response:
-            file_path = os.path.join(self.project_dir, project_name, file['file'])
-            file_path_dir = os.path.dirname(file_path)
-            os.makedirs(file_path_dir, exist_ok=True)
-    
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(file["code"])
-    
-        return file_path_dir
     def get_project_path(self, project_name: str):
         project_name = project_name.lower().replace(" ", "-")
         return f"{self.project_dir}/{project_name}"
@@ -87,27 +56,36 @@ class Patcher:
         response = "\n".join([f"File: `{file['file']}`:\n```\n{file['code']}\n```" for file in response])
         return f"~~~\n{response}\n~~~"
 
+    def inference(self, prompt: str, edit_format: str, project_name: str) -> str:
+        if edit_format != "whole":
+            # edits can only be shown once they've been applied
+            return self.llm.inference(prompt, project_name)
+
+        parser = CodeStreamParser(on_file=stream_to_editor())
+        response = self.llm.inference(prompt, project_name, on_token=parser.feed)
+        parser.close()
+
+        return response
+
+    def whole_file_context(self, error: str, project_name: str):
+        """
+        A focused context only has excerpts of the implicated files, which
+        would be written back as the whole files. For rewriting files in full
+        they are included in full, or the whole project when they don't fit
+        the token budget. Returns (code_markdown, focused).
+        """
+        context = build_failure_context(
+            self.get_project_path(project_name),
+            error,
+            "whole",
+            Config().get_failure_context_tokens()
+        )
+        if context:
+            return context["markdown"], True
+        return ReadCode(project_name).code_set_to_markdown(), False
+
     def emulate_code_writing(self, code_set: list, project_name: str):
-        files = []
-        for current_file in code_set:
-            file = current_file["file"]
-            code = current_file["code"]
-
-            new_state = AgentState().new_state()
-            new_state["internal_monologue"] = "Writing code..."
-            new_state["terminal_session"]["title"] = f"Editing {file}"
-            new_state["terminal_session"]["command"] = f"vim {file}"
-            new_state["terminal_session"]["output"] = code
-            files.append({
-                "file": file,
-                "code": code
-            })
-            AgentState().add_to_current_state(project_name, new_state)
-            time.sleep(1)
-        emit_agent("code", {
-            "files": files,
-            "from": "patcher"
-        })
+        present_code(code_set, project_name, "patcher")
 
     @retry_wrapper
     def execute(
@@ -117,21 +95,50 @@ class Patcher:
         commands: list,
         error: str,
         system_os: dict,
-        project_name: str
+        project_name: str,
+        focused: bool = False
     ) -> str:
+        edit_format = Config().get_edit_format()
         prompt = self.render(
             conversation,
             code_markdown,
             commands,
             error,
-            system_os
+            system_os,
+            edit_format,
+            focused
         )
-        response = self.llm.inference(prompt, project_name)
+        response = self.inference(prompt, edit_format, project_name)
         
         valid_response = self.validate_response(response)
         
         if not valid_response:
             return False
+
+        if edit_format != "whole":
+            valid_response = apply_edit_response(
+                valid_response, response, edit_format, self.get_project_path(project_name), "patcher"
+            )
+
+        if not valid_response:
+            # the edits didn't apply cleanly, ask for the full files instead
+            if focused:
+                code_markdown, focused = self.whole_file_context(error, project_name)
+            prompt = self.render(
+                conversation,
+                code_markdown,
+                commands,
+                error,
+                system_os,
+                "whole",
+                focused
+            )
+            response = self.inference(prompt, "whole", project_name)
+
+            valid_response = self.validate_response(response)
+
+            if not valid_response:
+                return False
         
         self.emulate_code_writing(valid_response, project_name)
 
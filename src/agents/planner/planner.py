@@ -1,17 +1,14 @@
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.llm import LLM
 
-PROMPT = open("src/agents/planner/prompt.jinja2").read().strip()
 
 class Planner:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
 
     def render(self, prompt: str) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(prompt=prompt)
+        return PromptRegistry().render("planner/prompt.jinja2", prompt=prompt)
     
     def validate_response(self, response: str) -> bool:
         return True
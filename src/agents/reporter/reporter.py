@@ -1,20 +1,18 @@
 import json
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.services.utils import retry_wrapper
 from src.llm import LLM
 
-PROMPT = open("src/agents/reporter/prompt.jinja2").read().strip()
 
 class Reporter:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
 
     def render(self, conversation: list, code_markdown: str) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "reporter/prompt.jinja2",
             conversation=conversation,
             code_markdown=code_markdown
         )
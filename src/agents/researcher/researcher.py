@@ -1,23 +1,20 @@
 import json
 from typing import List
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.llm import LLM
 from src.services.utils import retry_wrapper, validate_responses
 from src.services.search import BingSearch
 
-PROMPT = open("src/agents/researcher/prompt.jinja2").read().strip()
-
 
 class Researcher:
     def __init__(self, base_model: str):
         self.llm = LLM(model_id=base_model)
 
     def render(self, step_by_step_plan: str, contextual_keywords: str) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "researcher/prompt.jinja2",
             step_by_step_plan=step_by_step_plan,
             contextual_keywords=contextual_keywords
         )
@@ -0,0 +1,175 @@
+"""
+Dependency graph for the Runner's command plan.
+
+The model can give the dependencies explicitly (`"depends_on": {"2": [0, 1]}`),
+otherwise they are inferred: installs, builds and runs are ordered within the
+directory they work in, commands scoped to different directories (`cd backend
+&& ...`, `--prefix frontend`) and installs with different package managers run
+concurrently, and anything unrecognised keeps the original sequential order.
+"""
+
+import os
+import re
+import shlex
+import time
+import concurrent.futures
+from typing import Callable, Dict, List
+
+INSTALL, BUILD, RUN, OTHER = "install", "build", "run", "other"
+PHASES = {INSTALL: 0, BUILD: 1, RUN: 2}
+
+INSTALL_PATTERNS = [
+    (re.compile(r"^(pip3?|python3? -m pip|uv pip) install\b"), "pip"),
+    (re.compile(r"^poetry install\b"), "poetry"),
+    (re.compile(r"^pipenv install\b"), "pipenv"),
+    (re.compile(r"^npm (install|i|ci)\b"), "npm"),
+    (re.compile(r"^yarn( install)?$|^yarn install\b"), "yarn"),
+    (re.compile(r"^pnpm (install|i)\b"), "pnpm"),
+    (re.compile(r"^bun install\b"), "bun"),
+    (re.compile(r"^bundle install\b"), "bundle"),
+    (re.compile(r"^composer install\b"), "composer"),
+    (re.compile(r"^go mod (download|tidy)\b"), "go"),
+    (re.compile(r"^cargo fetch\b"), "cargo"),
+]
+BUILD_PATTERN = re.compile(
+    r"^(npm run build|yarn build|pnpm (run )?build|cargo build|go build|tsc\b|make\b|mvn (package|compile|install)|"
+    r"gradle(w)? build|\./gradlew build|dotnet build|python3? setup\.py build)"
+)
+RUN_PATTERN = re.compile(
+    r"^(python3?|node|deno|bun|ruby|php|java|go run|cargo run|dotnet run|npm (start|run \w+)|yarn (start|dev|run \w+)|"
+    r"pnpm (start|dev|run \w+)|flask run|uvicorn|gunicorn|streamlit run|npx|\./)"
+)
+CD_PREFIX = re.compile(r"^cd\s+(\S+)\s*&&\s*(.*)$")
+SCOPE_FLAGS = ("--prefix", "--cwd", "-C", "--dir", "--manifest-path")
+
+
+def parse_command(command: str) -> Dict[str, str]:
+    """
+    Classify a command into its phase, the package manager it installs with
+    (if any) and the directory it is scoped to ("" for the project root).
+    """
+    command = command.strip()
+    scope = ""
+
+    match = CD_PREFIX.match(command)
+    if match:
+        scope, command = match.group(1), match.group(2).strip()
+
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        args = command.split()
+
+    for index, arg in enumerate(args[:-1]):
+        if arg in SCOPE_FLAGS:
+            scope = os.path.join(scope, args[index + 1])
+
+    scope = os.path.normpath(scope) if scope else ""
+    if scope == ".":
+        scope = ""
+
+    for pattern, manager in INSTALL_PATTERNS:
+        if pattern.match(command):
+            return {"phase": INSTALL, "manager": manager, "scope": scope}
+    if BUILD_PATTERN.match(command):
+        return {"phase": BUILD, "manager": "", "scope": scope}
+    if RUN_PATTERN.match(command):
+        return {"phase": RUN, "manager": "", "scope": scope}
+    return {"phase": OTHER, "manager": "", "scope": scope}
+
+
+def infer_dependencies(commands: List[str]) -> Dict[int, set]:
+    parsed = [parse_command(command) for command in commands]
+    depends_on = {}
+
+    for j, later in enumerate(parsed):
+        depends_on[j] = set()
+        for i, earlier in enumerate(parsed[:j]):
+            if earlier["phase"] == OTHER or later["phase"] == OTHER:
+                depends_on[j].add(i)
+            elif earlier["scope"] and later["scope"] and earlier["scope"] != later["scope"]:
+                continue
+            elif earlier["phase"] == INSTALL and later["phase"] == INSTALL and earlier["manager"] != later["manager"]:
+                continue
+            elif PHASES[earlier["phase"]] <= PHASES[later["phase"]]:
+                depends_on[j].add(i)
+
+    return depends_on
+
+
+class CommandGraph:
+    def __init__(self, commands: List[str], depends_on: dict = None):
+        # the model's dependencies index the commands as given, blank ones included
+        kept = [index for index, command in enumerate(commands) if command and command.strip()]
+        self.commands = [commands[index] for index in kept]
+        self.depends_on = self.parse_dependencies(depends_on, len(commands), kept) if depends_on else None
+        if self.depends_on is None:
+            self.depends_on = infer_dependencies(self.commands)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def parse_dependencies(self, depends_on: dict, count: int, kept: List[int]):
+        """
+        Use the model's dependencies when they are well-formed, i.e. only point
+        at earlier commands (which also rules out cycles). They index the
+        `count` commands as given; `kept` are the indices of the non-blank
+        ones, dependencies on blank commands are dropped.
+        """
+        positions = {index: position for position, index in enumerate(kept)}
+        graph = {position: set() for position in range(len(kept))}
+        try:
+            for index, dependencies in depends_on.items():
+                index = int(index)
+                for dependency in dependencies:
+                    dependency = int(dependency)
+                    if not 0 <= dependency < index < count:
+                        return None
+                    if index in positions and dependency in positions:
+                        graph[positions[index]].add(positions[dependency])
+        except (AttributeError, TypeError, ValueError):
+            return None
+        return graph
+
+    def run(self, execute: Callable[[str], dict], max_workers: int) -> List[dict]:
+        """
+        Run every command through `execute` (which returns a result dict with
+        at least "failed") as soon as its dependencies have succeeded, at most
+        `max_workers` at a time. Commands depending on a failed command are
+        skipped. Results keep the order of the commands.
+        """
+        max_workers = max(1, max_workers)
+        results = [None] * len(self.commands)
+        pending = set(range(len(self.commands)))
+        succeeded, failed = set(), set()
+        running = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for index in sorted(pending):
+                    dependencies = self.depends_on[index]
+                    if dependencies & failed:
+                        pending.discard(index)
+                        failed.add(index)
+                        results[index] = {"command": self.commands[index], "failed": True, "skipped": True, "duration": 0.0}
+                    elif dependencies <= succeeded and len(running) < max_workers:
+                        pending.discard(index)
+                        running[executor.submit(self._timed, execute, self.commands[index])] = index
+
+                if not running:
+                    continue
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    results[index] = future.result()
+                    (failed if results[index]["failed"] else succeeded).add(index)
+
+        return results
+
+    @staticmethod
+    def _timed(execute: Callable[[str], dict], command: str) -> dict:
+        start_time = time.time()
+        result = execute(command)
+        result["duration"] = time.time() - start_time
+        return result
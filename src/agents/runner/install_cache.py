@@ -0,0 +1,168 @@
+"""
+Remembers dependency installs that succeeded, keyed by the command and the
+manifests and lockfiles it installs from, so the Runner (and the rerunner
+after every patch) can skip an install when nothing about the dependencies
+has changed. Package managers also share one download cache across projects.
+"""
+
+import os
+import re
+import glob
+import shlex
+import shutil
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, Session, SQLModel, create_engine
+
+from src.config import Config
+from src.agents.runner.command_graph import INSTALL, CD_PREFIX, parse_command
+
+MANIFESTS = {
+    "pip": ["requirements.txt", "requirements-*.txt", "setup.py", "setup.cfg", "pyproject.toml"],
+    "poetry": ["pyproject.toml", "poetry.lock"],
+    "pipenv": ["Pipfile", "Pipfile.lock"],
+    "npm": ["package.json", "package-lock.json", "npm-shrinkwrap.json"],
+    "yarn": ["package.json", "yarn.lock"],
+    "pnpm": ["package.json", "pnpm-lock.yaml"],
+    "bun": ["package.json", "bun.lockb"],
+    "bundle": ["Gemfile", "Gemfile.lock"],
+    "composer": ["composer.json", "composer.lock"],
+    "go": ["go.mod", "go.sum"],
+    "cargo": ["Cargo.toml", "Cargo.lock"],
+}
+# installs into the project directory, which has to still be there to skip
+INSTALL_DIRS = {
+    "npm": "node_modules",
+    "yarn": "node_modules",
+    "pnpm": "node_modules",
+    "bun": "node_modules",
+    "composer": "vendor",
+}
+REQUIREMENT_FLAGS = ("-r", "--requirement", "-c", "--constraint")
+# installs that depend on more than the manifests: `go mod tidy` adds and
+# drops requirements according to the imports in the .go sources
+UNCACHED_PATTERN = re.compile(r"^go mod tidy\b")
+SITE_PACKAGES = ["lib/python*/site-packages", "lib64/python*/site-packages", "Lib/site-packages"]
+
+
+class InstallRecord(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project: str
+    key: str
+    command: str
+    created_at: str
+
+
+def shared_cache_env() -> dict:
+    """
+    Environment pointing pip, npm, yarn and pnpm at download caches shared by
+    every project.
+    """
+    cache_dir = os.path.abspath(Config().get_cache_dir())
+    return {
+        "PIP_CACHE_DIR": os.path.join(cache_dir, "pip"),
+        "npm_config_cache": os.path.join(cache_dir, "npm"),
+        "YARN_CACHE_FOLDER": os.path.join(cache_dir, "yarn"),
+        "npm_config_store_dir": os.path.join(cache_dir, "pnpm"),
+    }
+
+
+def _pip_environment_exists(binary: str, command: str, directory: str) -> bool:
+    """
+    Whether the environment pip installed into is still there: the
+    site-packages of the interpreter `binary` belongs to (or of the project's
+    virtualenv for `uv pip`), or the --target directory.
+    """
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        args = command.split()
+    for index, arg in enumerate(args[:-1]):
+        if arg in ("-t", "--target"):
+            return os.path.isdir(os.path.join(directory, args[index + 1]))
+
+    if args and args[0] == "uv":
+        prefix = os.environ.get("VIRTUAL_ENV") or os.path.join(directory, ".venv")
+    elif binary:
+        prefix = os.path.dirname(os.path.dirname(os.path.realpath(binary)))
+    else:
+        return False
+    return any(glob.glob(os.path.join(prefix, pattern)) for pattern in SITE_PACKAGES)
+
+
+def _manifest_files(manager: str, command: str, directory: str) -> list:
+    files = set()
+    for pattern in MANIFESTS.get(manager, []):
+        files.update(glob.glob(os.path.join(directory, pattern)))
+
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        args = command.split()
+    for index, arg in enumerate(args[:-1]):
+        if arg in REQUIREMENT_FLAGS:
+            files.add(os.path.join(directory, args[index + 1]))
+
+    return sorted(path for path in files if os.path.isfile(path))
+
+
+class InstallCache:
+    def __init__(self):
+        config = Config()
+        sqlite_path = config.get_sqlite_db()
+        self.engine = create_engine(f"sqlite:///{sqlite_path}")
+        SQLModel.metadata.create_all(self.engine)
+
+    def get_key(self, command: str, project_path: str) -> Optional[str]:
+        """
+        Key of an install command: the command, the package manager binary it
+        resolves to and the contents of the manifests it installs from. None
+        for commands that aren't installs, that depend on more than their
+        manifests (`go mod tidy`), or whose installed dependencies are gone
+        (node_modules, vendor, the environment pip installed into).
+        """
+        parsed = parse_command(command)
+        if parsed["phase"] != INSTALL:
+            return None
+
+        manager = parsed["manager"]
+        directory = os.path.join(project_path, parsed["scope"])
+        if manager in INSTALL_DIRS and not os.path.isdir(os.path.join(directory, INSTALL_DIRS[manager])):
+            return None
+
+        match = CD_PREFIX.match(command.strip())
+        bare_command = match.group(2).strip() if match else command.strip()
+        if UNCACHED_PATTERN.match(bare_command):
+            return None
+        binary = shutil.which(bare_command.split()[0]) or ""
+        if manager == "pip" and not _pip_environment_exists(binary, bare_command, directory):
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(f"{' '.join(command.split())}\0{parsed['scope']}\0{binary}\0".encode("utf-8"))
+        for path in _manifest_files(manager, bare_command, directory):
+            digest.update(os.path.relpath(path, project_path).encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def contains(self, project: str, key: str) -> bool:
+        with Session(self.engine) as session:
+            record = session.query(InstallRecord).filter(
+                InstallRecord.project == project,
+                InstallRecord.key == key
+            ).first()
+            return record is not None
+
+    def add(self, project: str, key: str, command: str):
+        with Session(self.engine) as session:
+            session.add(InstallRecord(
+                project=project,
+                key=key,
+                command=command,
+                created_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ))
+            session.commit()
+
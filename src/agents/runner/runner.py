@@ -1,23 +1,29 @@
-import time
 import json
 import os
-import subprocess
+import time
+import threading
 
-from jinja2 import Environment, BaseLoader
+from src.prompts import PromptRegistry
 
 from src.agents.patcher import Patcher
+from src.agents.runner.command_graph import CommandGraph
+from src.agents.runner.install_cache import InstallCache, shared_cache_env
+from src.filesystem.failure_context import build_failure_context, count_tokens
 
+from src.config import Config
 from src.llm import LLM
+from src.logger import Logger
 from src.state import AgentState
 from src.project import ProjectManager
+from src.sandbox.code_runner import CodeRunner, stop_background_processes
 from src.services.utils import retry_wrapper, validate_responses
+from src.socket_instance import emit_agent
 
-PROMPT = open("src/agents/runner/prompt.jinja2", "r").read().strip()
-RERUNNER_PROMPT = open("src/agents/runner/rerunner.jinja2", "r").read().strip()
 
 class Runner:
     def __init__(self, base_model: str):
         self.base_model = base_model
+        self.logger = Logger()
         self.llm = LLM(model_id=base_model)
 
     def render(
@@ -26,9 +32,8 @@ class Runner:
         code_markdown: str,
         system_os: str
     ) -> str:
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "runner/prompt.jinja2",
             conversation=conversation,
             code_markdown=code_markdown,
             system_os=system_os,
@@ -40,24 +45,25 @@ class Runner:
         code_markdown: str,
         system_os: str,
         commands: list,
-        error: str
+        error: str,
+        focused: bool = False
     ):
-        env = Environment(loader=BaseLoader())
-        template = env.from_string(RERUNNER_PROMPT)
-        return template.render(
+        return PromptRegistry().render(
+            "runner/rerunner.jinja2",
             conversation=conversation,
             code_markdown=code_markdown,
             system_os=system_os,
             commands=commands,
-            error=error
+            error=error,
+            focused=focused
         )
 
     @validate_responses
     def validate_response(self, response: str):
-        if "commands" not in response:
+        if "commands" not in response or not isinstance(response["commands"], list):
             return False
         else:
-            return response["commands"]
+            return CommandGraph(response["commands"], response.get("depends_on"))
     
     @validate_responses
     def validate_rerunner_response(self, response: str):
@@ -66,135 +72,205 @@ class Runner:
         else:
             return response
 
-    @retry_wrapper
-    def run_code(
+    def run_command(self, command: str, project_path: str, project_name: str) -> dict:
+        install_cache = InstallCache() if Config().get_runner_install_cache() else None
+
+        if install_cache:
+            key = install_cache.get_key(command, project_path)
+            if key and install_cache.contains(project_name, key):
+                self.logger.info(f"Runner: dependencies unchanged, skipping {command}")
+                new_state = AgentState().new_state()
+                new_state["terminal_session"]["title"] = "Terminal"
+                new_state["terminal_session"]["command"] = command
+                new_state["terminal_session"]["output"] = "[Dependencies unchanged since the last install, skipped]"
+                AgentState().add_to_current_state(project_name, new_state)
+                return {
+                    "command": command,
+                    "output": new_state["terminal_session"]["output"],
+                    "returncode": 0,
+                    "timed_out": False,
+                    "background": False,
+                    "cached": True,
+                    "failed": False,
+                    "duration": 0.0,
+                }
+
+        result = CodeRunner(project_name, project_path, env=shared_cache_env()).run(command)
+        result["failed"] = result["timed_out"] or (not result["background"] and result["returncode"] != 0)
+
+        if install_cache and not result["failed"]:
+            # installs can rewrite their lockfile, so key the state they left behind
+            key = install_cache.get_key(command, project_path)
+            if key:
+                install_cache.add(project_name, key, command)
+
+        return result
+
+    def failure_context(self, output: str, project_path: str, code_markdown: str):
+        """
+        The code to fix a failure with: just the files and lines implicated by
+        the error output when they can be found, the full code otherwise.
+        Returns (code_markdown, focused).
+        """
+        config = Config()
+        token_budget = config.get_failure_context_tokens()
+        context = None
+        if token_budget:
+            context = build_failure_context(project_path, output, config.get_edit_format(), token_budget)
+
+        if not context:
+            self.logger.info("Runner: the error doesn't point at project files, using the full code")
+            return code_markdown, False
+
+        full_tokens = count_tokens(code_markdown)
+        self.logger.info(
+            f"Runner: error context from {', '.join(context['files'])}: "
+            f"{context['tokens']} tokens instead of {full_tokens}"
+        )
+        emit_agent("metrics", {
+            "type": "failure_context",
+            "files": context["files"],
+            "tokens": context["tokens"],
+            "full_tokens": full_tokens
+        })
+
+        return context["markdown"], True
+
+    def fix_command(
         self,
-        commands: list,
+        command: str,
+        result: dict,
+        attempts: dict,
         project_path: str,
         project_name: str,
         conversation: list,
         code_markdown: str,
-        system_os: str
-    ):  
-        retries = 0
-        
-        for command in commands:
-            command_set = command.split(" ")
-            command_failed = False
-            
-            process = subprocess.run(
-                command_set,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=project_path
-            )
-            command_output = process.stdout.decode('utf-8')
-            command_failed = process.returncode != 0
-            
+        system_os: str,
+        commands: list
+    ) -> dict:
+        while result["failed"] and attempts["retries"] < 2:
             new_state = AgentState().new_state()
-            new_state["internal_monologue"] = "Running code..."
+            new_state["internal_monologue"] = "Oh seems like there is some error... :("
             new_state["terminal_session"]["title"] = "Terminal"
             new_state["terminal_session"]["command"] = command
-            new_state["terminal_session"]["output"] = command_output
+            new_state["terminal_session"]["output"] = result["output"]
             AgentState().add_to_current_state(project_name, new_state)
-            time.sleep(1)
             
-            while command_failed and retries < 2:
-                new_state = AgentState().new_state()
-                new_state["internal_monologue"] = "Oh seems like there is some error... :("
-                new_state["terminal_session"]["title"] = "Terminal"
-                new_state["terminal_session"]["command"] = command
-                new_state["terminal_session"]["output"] = command_output
-                AgentState().add_to_current_state(project_name, new_state)
-                time.sleep(1)
+            context, focused = self.failure_context(result["output"], project_path, code_markdown)
+
+            prompt = self.render_rerunner(
+                conversation=conversation,
+                code_markdown=context,
+                system_os=system_os,
+                commands=commands,
+                error=result["output"],
+                focused=focused
+            )
+            
+            response = self.llm.inference(prompt, project_name)
+            
+            valid_response = self.validate_rerunner_response(response)
+            
+            if not valid_response:
+                break
+            
+            action = valid_response["action"]
+            
+            if action == "command":
+                command = valid_response["command"]
+                response = valid_response["response"]
+                
+                ProjectManager().add_message_from_Swea(project_name, response)
+            elif action == "patch":
+                response = valid_response["response"]
+                
+                ProjectManager().add_message_from_Swea(project_name, response)
                 
-                prompt = self.render_rerunner(
+                patcher = Patcher(base_model=self.base_model)
+                code = patcher.execute(
                     conversation=conversation,
-                    code_markdown=code_markdown,
-                    system_os=system_os,
+                    code_markdown=context,
                     commands=commands,
-                    error=command_output
+                    error=result["output"],
+                    system_os=system_os,
+                    project_name=project_name,
+                    focused=focused
                 )
                 
-                response = self.llm.inference(prompt, project_name)
-                
-                valid_response = self.validate_rerunner_response(response)
-                
-                if not valid_response:
-                    return False
-                
-                action = valid_response["action"]
-                
-                if action == "command":
-                    command = valid_response["command"]
-                    response = valid_response["response"]
-                    
-                    ProjectManager().add_message_from_Swea(project_name, response)
-                    
-                    command_set = command.split(" ")
-                    command_failed = False
-                    
-                    process = subprocess.run(
-                        command_set,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        cwd=project_path
-                    )
-                    command_output = process.stdout.decode('utf-8')
-                    command_failed = process.returncode != 0
-                    
-                    new_state = AgentState().new_state()
-                    new_state["internal_monologue"] = "Running code..."
-                    new_state["terminal_session"]["title"] = "Terminal"
-                    new_state["terminal_session"]["command"] = command
-                    new_state["terminal_session"]["output"] = command_output
-                    AgentState().add_to_current_state(project_name, new_state)
-                    time.sleep(1)
-                    
-                    if command_failed:
-                        retries += 1
-                    else:
-                        break
-                elif action == "patch":
-                    response = valid_response["response"]
-                    
-                    ProjectManager().add_message_from_Swea(project_name, response)
-                    
-                    code = Patcher(base_model=self.base_model).execute(
-                        conversation=conversation,
-                        code_markdown=code_markdown,
-                        commands=commands,
-                        error=command_output,
-                        system_os=system_os,
-                        project_name=project_name
-                    )
-                    
-                    Patcher(base_model=self.base_model).save_code_to_project(code, project_name)
-                    
-                    command_set = command.split(" ")
-                    command_failed = False
-                    
-                    process = subprocess.run(
-                        command_set,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        cwd=project_path
+                patcher.save_code_to_project(code, project_name)
+            else:
+                break
+            
+            result = self.run_command(command, project_path, project_name)
+            
+            if result["failed"]:
+                attempts["retries"] += 1
+
+        return result
+
+    @retry_wrapper
+    def run_code(
+        self,
+        commands: CommandGraph,
+        project_path: str,
+        project_name: str,
+        conversation: list,
+        code_markdown: str,
+        system_os: str
+    ):  
+        if not isinstance(commands, CommandGraph):
+            commands = CommandGraph(commands)
+
+        # fixing a command patches the code, so only one fix loop runs at a time
+        fix_lock = threading.Lock()
+        attempts = {"retries": 0}
+
+        def execute(command: str) -> dict:
+            result = self.run_command(command, project_path, project_name)
+            if result["failed"]:
+                with fix_lock:
+                    result = self.fix_command(
+                        command,
+                        result,
+                        attempts,
+                        project_path,
+                        project_name,
+                        conversation,
+                        code_markdown,
+                        system_os,
+                        commands.commands
                     )
-                    command_output = process.stdout.decode('utf-8')
-                    command_failed = process.returncode != 0
-                    
-                    new_state = AgentState().new_state()
-                    new_state["internal_monologue"] = "Running code..."
-                    new_state["terminal_session"]["title"] = "Terminal"
-                    new_state["terminal_session"]["command"] = command
-                    new_state["terminal_session"]["output"] = command_output
-                    AgentState().add_to_current_state(project_name, new_state)
-                    time.sleep(1)
-                    
-                    if command_failed:
-                        retries += 1
-                    else:
-                        break
+            return result
+
+        max_parallel = Config().get_runner_max_parallel() or min(4, os.cpu_count() or 1)
+
+        start_time = time.time()
+        results = commands.run(execute, max_parallel)
+        total_duration = time.time() - start_time
+
+        for result in results:
+            status = "skipped" if result.get("skipped") else "cached" if result.get("cached") else "failed" if result["failed"] else "ok"
+            self.logger.info(f"Runner: {result['command']} -> {status} in {result['duration']:.2f}s")
+        self.logger.info(f"Runner: {len(results)} commands in {total_duration:.2f}s (max {max_parallel} in parallel)")
+
+        emit_agent("metrics", {
+            "type": "runner",
+            "total_duration": total_duration,
+            "commands": [
+                {
+                    "command": result["command"],
+                    "duration": result["duration"],
+                    "failed": result["failed"],
+                    "skipped": result.get("skipped", False),
+                    "cached": result.get("cached", False),
+                    "background": result.get("background", False)
+                }
+                for result in results
+            ]
+        })
+
+        # a dict, so retry_wrapper doesn't take an empty plan for a failure
+        return {"results": results}
 
     @retry_wrapper
     def execute(
@@ -210,6 +286,9 @@ class Runner:
         
         valid_response = self.validate_response(response)
         
+        # servers left running by the previous run would hold on to their ports
+        stop_background_processes(project_name)
+        
         self.run_code(
             valid_response,
             project_path,
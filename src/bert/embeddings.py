@@ -0,0 +1,200 @@
+"""
+Sentence embeddings for keyword extraction and retrieval, behind one
+interface with interchangeable backends (EMBEDDINGS.BACKEND):
+
+torch  the sentence-transformers model as published (PyTorch, float32)
+onnx   the same model run with ONNX Runtime, without loading PyTorch
+int8   the ONNX model with its weights dynamically quantized to int8
+
+Every backend returns L2-normalized float32 vectors (mean pooling, like the
+sentence-transformers models), so a dot product is the cosine similarity.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from src.config import Config
+from src.logger import Logger
+
+logger = Logger()
+
+
+class EmbeddingBackend:
+    name = "embedding"
+
+    def __init__(self, model: str, batch_size: int, max_length: int, models_dir: str):
+        self.model_name = model
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.models_dir = models_dir
+
+    def embed(self, documents: list) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model: str, batch_size: int, max_length: int, models_dir: str):
+        super().__init__(model, batch_size, max_length, models_dir)
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model, device="cpu", cache_folder=models_dir)
+        self.model.max_seq_length = max_length
+
+    def embed(self, documents: list) -> np.ndarray:
+        embeddings = self.model.encode(
+            list(documents),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return embeddings.astype(np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+
+    def __init__(self, model: str, batch_size: int, max_length: int, models_dir: str):
+        super().__init__(model, batch_size, max_length, models_dir)
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = self._model_dir()
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            self._model_path(model_dir), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _model_dir(self) -> str:
+        """
+        A local directory with tokenizer.json and onnx/model.onnx, or the
+        model's ONNX export downloaded from the Hugging Face Hub.
+        """
+        model_dir = self.model_name
+        if not os.path.isdir(model_dir):
+            from huggingface_hub import snapshot_download
+
+            model_dir = snapshot_download(
+                self.model_name,
+                cache_dir=self.models_dir,
+                allow_patterns=["tokenizer.json", "onnx/model.onnx"],
+            )
+
+        if not os.path.exists(os.path.join(model_dir, "onnx", "model.onnx")):
+            raise OSError(f"{self.model_name} has no ONNX export (onnx/model.onnx)")
+        return model_dir
+
+    def _model_path(self, model_dir: str) -> str:
+        return os.path.join(model_dir, "onnx", "model.onnx")
+
+    def _embed_batch(self, documents: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(documents)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def embed(self, documents: list) -> np.ndarray:
+        documents = list(documents)
+        if not documents:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        embeddings = np.concatenate([
+            self._embed_batch(documents[start:start + self.batch_size])
+            for start in range(0, len(documents), self.batch_size)
+        ])
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+class Int8Backend(OnnxBackend):
+    name = "int8"
+
+    def _model_path(self, model_dir: str) -> str:
+        path = os.path.join(self.models_dir, self.model_name.strip("/").replace("/", "--") + "-int8.onnx")
+        if not os.path.exists(path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing {self.model_name} to int8...")
+            os.makedirs(self.models_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            quantize_dynamic(super()._model_path(model_dir), tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, path)
+        return path
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "onnx": OnnxBackend,
+    "int8": Int8Backend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name: str = None) -> EmbeddingBackend:
+    config = Config()
+    name = name or config.get_embeddings_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name}")
+
+    return BACKENDS[name](
+        config.get_embeddings_model(),
+        config.get_embeddings_batch_size(),
+        config.get_embeddings_max_length(),
+        os.path.join(config.get_cache_dir(), "models"),
+    )
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """
+    The process-wide backend chosen in the config. If an ONNX backend can't be
+    loaded (onnxruntime missing, no export for the model), the PyTorch model is
+    used instead.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            try:
+                _backend = create_backend()
+            except (ImportError, OSError, ValueError) as e:
+                if Config().get_embeddings_backend() == "torch":
+                    raise
+                logger.warning(f"Embedding backend unavailable ({e}), falling back to torch")
+                _backend = create_backend("torch")
+            logger.info(f"Embedding backend: {_backend.name} ({_backend.model_name})")
+        return _backend
+
+
+def keybert_embedder(backend: EmbeddingBackend):
+    """
+    Wrap `backend` so KeyBERT embeds documents and candidates with it.
+    """
+    from keybert.backend import BaseEmbedder
+
+    class Embedder(BaseEmbedder):
+        def __init__(self):
+            super().__init__(embedding_model=backend)
+
+        def embed(self, documents, verbose=False) -> np.ndarray:
+            return backend.embed(documents)
+
+    return Embedder()
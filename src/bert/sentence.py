@@ -1,17 +1,118 @@
-from keybert import KeyBERT
+"""
+Keyword extraction with KeyBERT, shared by the whole process.
+
+The embedding backend (src/bert/embeddings.py) is loaded once, on first use
+or by warm_up, and every extraction runs on one worker thread: under gevent
+that's a real OS thread from a gevent ThreadPool, so inference doesn't block
+the hub.
+Sentences are extracted in batches and the results are cached by hash.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.bert.embeddings import get_embedding_backend, keybert_embedder
+
+MAX_CACHED_SENTENCES = 1024
+
+KEYWORD_OPTIONS = {
+    "keyphrase_ngram_range": (1, 1),
+    "stop_words": "english",
+    "use_mmr": True,
+    "diversity": 0.7,
+}
+
+
+def _gevent_threadpool():
+    try:
+        from gevent.monkey import is_module_patched
+        if is_module_patched("threading"):
+            from gevent.threadpool import ThreadPool
+            return ThreadPool(1)
+    except ImportError:
+        pass
+    return None
+
+
+class KeywordService:
+    _instance = None
+    # guards creating the instance and the result cache
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._setup()
+                    cls._instance = instance
+        return cls._instance
+
+    def _setup(self):
+        self.model = None
+        self.cache = OrderedDict()
+        self.pool = _gevent_threadpool()
+        # without the gevent pool, extractions (and the model load) take turns
+        self._run_lock = threading.Lock()
+
+    def _run(self, func, *args):
+        if self.pool is not None:
+            return self.pool.apply(func, args)
+        with self._run_lock:
+            return func(*args)
+
+    def _load_model(self):
+        if self.model is None:
+            from keybert import KeyBERT
+            self.model = KeyBERT(model=keybert_embedder(get_embedding_backend()))
+        return self.model
+
+    def _extract(self, sentences: list, top_n: int) -> list:
+        keywords = self._load_model().extract_keywords(sentences, top_n=top_n, **KEYWORD_OPTIONS)
+        # a single document gets a flat list back
+        return [keywords] if len(sentences) == 1 else keywords
+
+    @staticmethod
+    def _key(sentence: str, top_n: int) -> str:
+        return hashlib.sha256(f"{top_n}\0{sentence}".encode("utf-8")).hexdigest()
+
+    def warm_up(self):
+        self._run(self._load_model)
+
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def extract_keywords_batch(self, sentences: list, top_n: int = 5) -> list:
+        keys = [self._key(sentence, top_n) for sentence in sentences]
+
+        found, missing = {}, {}
+        with self._lock:
+            for key, sentence in zip(keys, sentences):
+                if key in self.cache:
+                    found[key] = self.cache[key]
+                    self.cache.move_to_end(key)
+                elif key not in missing:
+                    missing[key] = sentence
+
+        if missing:
+            # outside the lock, other callers keep using the cache meanwhile
+            results = self._run(self._extract, list(missing.values()), top_n)
+            found.update(zip(missing, results))
+            with self._lock:
+                self.cache.update(zip(missing, results))
+                while len(self.cache) > MAX_CACHED_SENTENCES:
+                    self.cache.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def extract_keywords(self, sentence: str, top_n: int = 5) -> list:
+        return self.extract_keywords_batch([sentence], top_n)[0]
+
 
 class SentenceBert:
     def __init__(self, sentence: str):
         self.sentence = sentence
-        self.kw_model = KeyBERT()
 
     def extract_keywords(self, top_n: int = 5) -> list:
-        keywords = self.kw_model.extract_keywords(
-            self.sentence,
-            keyphrase_ngram_range=(1, 1),
-            stop_words='english',
-            top_n=top_n,
-            use_mmr=True,
-            diversity=0.7
-        )
-        return keywords
+        return KeywordService().extract_keywords(self.sentence, top_n)
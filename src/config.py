@@ -1,44 +1,166 @@
-import toml
+"""
+Settings from config.toml, with defaults for missing keys from
+sample.config.toml.
+
+The file is parsed once and re-read only when its mtime changes (checked at
+most every RELOAD_INTERVAL seconds), so settings edited on disk apply without
+a restart. Environment variables named SWEA_<SECTION>__<KEY> override the
+file, e.g. SWEA_API_KEYS__OPENAI or SWEA_TIMEOUT__INFERENCE=120. Writes go to
+a temporary file that replaces config.toml, and subscribers are told which
+keys changed, whether by a setter, the settings API or an edit on disk.
+"""
+
 import os
+import copy
+import inspect
+import logging
+import time
+import weakref
+import tempfile
+import threading
+
+import toml
+
+CONFIG_FILE = "config.toml"
+SAMPLE_CONFIG_FILE = "sample.config.toml"
+ENV_PREFIX = "SWEA_"
+RELOAD_INTERVAL = 1.0
+
+# src.logger builds on Config, so this goes through stdlib logging to the
+# handlers it attaches
+logger = logging.getLogger("swea.config")
+
+
+def _parse_env_value(value: str):
+    try:
+        return toml.loads(f"value = {value}")["value"]
+    except Exception:
+        return value
 
 
 class Config:
     _instance = None
+    _lock = threading.RLock()
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._load_config()
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._subscribers = []
+                cls._instance._load_config()
         return cls._instance
 
+    @property
+    def config(self) -> dict:
+        if time.monotonic() - self._checked_at >= RELOAD_INTERVAL:
+            self._checked_at = time.monotonic()
+            if self._file_mtime() != self._mtime:
+                self.reload()
+        return self._config
+
+    def _file_mtime(self):
+        try:
+            return os.stat(CONFIG_FILE).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> tuple:
+        """
+        The file's settings merged with the sample's defaults, and whether
+        any were missing from the file.
+        """
+        with open(SAMPLE_CONFIG_FILE, "r") as f:
+            config = toml.load(f)
+        if not os.path.exists(CONFIG_FILE):
+            return config, True
+
+        with open(CONFIG_FILE, "r") as f:
+            file_config = toml.load(f)
+
+        missing = False
+        for key, value in config.items():
+            if key not in file_config:
+                file_config[key] = value
+                missing = True
+            elif isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    if sub_key not in file_config[key]:
+                        file_config[key][sub_key] = sub_value
+                        missing = True
+        return file_config, missing
+
+    def _apply_env(self, config: dict) -> dict:
+        self._overrides = {}
+        for name, value in os.environ.items():
+            if not name.startswith(ENV_PREFIX) or "__" not in name:
+                continue
+            section, key = name[len(ENV_PREFIX):].split("__", 1)
+            section, key = section.upper(), key.upper()
+            if section not in config or not isinstance(config[section], dict):
+                continue
+            self._overrides[(section, key)] = config[section].get(key)
+            config[section][key] = _parse_env_value(value)
+        return config
+
     def _load_config(self):
-        # If the config file doesn't exist, copy from the sample
-        if not os.path.exists("config.toml"):
-            with open("sample.config.toml", "r") as f_in, open("config.toml", "w+") as f_out:
-                f_out.write(f_in.read())
-                f_out.seek(0)
-                self.config = toml.load(f_out)
-        else:
-            # check if all the keys are present in the config file
-            with open("sample.config.toml", "r") as f:
-                sample_config = toml.load(f)
-            
-            with open("config.toml", "r+") as f:
-                config = toml.load(f)
-            
-                # Update the config with any missing keys and their keys of keys
-                for key, value in sample_config.items():
-                    config.setdefault(key, value)
-                    if isinstance(value, dict):
-                        for sub_key, sub_value in value.items():
-                            config[key].setdefault(sub_key, sub_value)
-            
-                f.seek(0)
-                toml.dump(config, f)
-                f.truncate()
-        
-            self.config = config
-            
+        with self._lock:
+            config, missing = self._read()
+            self._config = self._apply_env(config)
+            self._snapshot = copy.deepcopy(self._config)
+            # only write when the file is new or lacks keys from the sample
+            if missing:
+                self.save_config()
+            self._mtime = self._file_mtime()
+            self._checked_at = time.monotonic()
+
+    def reload(self):
+        with self._lock:
+            try:
+                config, _ = self._read()
+            except (OSError, toml.TomlDecodeError):
+                # the file is being rewritten or is broken, keep the current settings
+                return
+            self._config = self._apply_env(config)
+            self._mtime = self._file_mtime()
+        self._notify()
+
+    def subscribe(self, callback, section: str = None):
+        """
+        Call `callback(changes)` whenever settings change, with changes as
+        {section: {key: new value}}; only for changes in `section` if given.
+        Bound methods are held weakly, so subscribing doesn't keep objects alive.
+        """
+        reference = weakref.WeakMethod(callback) if inspect.ismethod(callback) else (lambda: callback)
+        with self._lock:
+            self._subscribers.append((reference, section))
+
+    def _notify(self):
+        with self._lock:
+            old, self._snapshot = self._snapshot, copy.deepcopy(self._config)
+
+        changes = {}
+        for section, values in self._snapshot.items():
+            if not isinstance(values, dict):
+                if old.get(section) != values:
+                    changes[section] = values
+                continue
+            for key, value in values.items():
+                if old.get(section, {}).get(key) != value:
+                    changes.setdefault(section, {})[key] = value
+        if not changes:
+            return
+
+        with self._lock:
+            self._subscribers = [(reference, section) for reference, section in self._subscribers if reference()]
+            subscribers = list(self._subscribers)
+        for reference, section in subscribers:
+            callback = reference()
+            if callback and (section is None or section in changes):
+                try:
+                    callback(changes)
+                except Exception:
+                    logger.exception(f"Config subscriber {callback!r} failed")
+
     def get_config(self):
         return self.config
 
@@ -57,6 +179,9 @@ class Config:
     def get_google_search_api_endpoint(self):
         return self.config["API_ENDPOINTS"]["GOOGLE"]
 
+    def get_duckduckgo_api_endpoint(self):
+        return self.config["API_ENDPOINTS"]["DUCKDUCKGO"]
+
     def get_ollama_api_endpoint(self):
         return self.config["API_ENDPOINTS"]["OLLAMA"]
     
@@ -102,15 +227,177 @@ class Config:
     def get_repos_dir(self):
         return self.config["STORAGE"]["REPOS_DIR"]
 
+    def get_cache_dir(self):
+        return self.config["STORAGE"]["CACHE_DIR"]
+
+    def get_vectors_dir(self):
+        return self.config["STORAGE"]["VECTORS_DIR"]
+
     def get_logging_rest_api(self):
         return self.config["LOGGING"]["LOG_REST_API"] == "true"
 
     def get_logging_prompts(self):
         return self.config["LOGGING"]["LOG_PROMPTS"] == "true"
+
+    def get_logging_level(self):
+        return self.config["LOGGING"]["LEVEL"]
+
+    def get_logging_channel_levels(self):
+        return self.config["LOGGING"]["CHANNEL_LEVELS"]
+
+    def get_logging_console(self):
+        return self.config["LOGGING"]["CONSOLE"] == "true"
+
+    def get_logging_max_bytes(self):
+        return self.config["LOGGING"]["MAX_BYTES"]
+
+    def get_logging_backup_count(self):
+        return self.config["LOGGING"]["BACKUP_COUNT"]
+
+    def get_logging_rotate_when(self):
+        return self.config["LOGGING"]["ROTATE_WHEN"]
+
+    def get_logging_max_message_length(self):
+        return self.config["LOGGING"]["MAX_MESSAGE_LENGTH"]
     
     def get_timeout_inference(self):
         return self.config["TIMEOUT"]["INFERENCE"]
 
+    def get_edit_format(self):
+        return self.config["EDITING"]["FORMAT"]
+
+    def get_failure_context_tokens(self):
+        return self.config["EDITING"]["FAILURE_CONTEXT_TOKENS"]
+
+    def get_code_writing_mode(self):
+        return self.config["PRESENTATION"]["CODE_WRITING"]
+
+    def get_prompts_hot_reload(self):
+        return self.config["PROMPTS"]["HOT_RELOAD"] == "true"
+
+    def get_runner_timeout(self):
+        return self.config["RUNNER"]["TIMEOUT"]
+
+    def get_runner_idle_timeout(self):
+        return self.config["RUNNER"]["IDLE_TIMEOUT"]
+
+    def get_runner_output_interval(self):
+        return self.config["RUNNER"]["OUTPUT_INTERVAL"]
+
+    def get_runner_max_parallel(self):
+        return self.config["RUNNER"]["MAX_PARALLEL"]
+
+    def get_runner_install_cache(self):
+        return self.config["RUNNER"]["INSTALL_CACHE"] == "true"
+
+    def get_browser_pool_size(self):
+        return self.config["BROWSER"]["POOL_SIZE"]
+
+    def get_browser_contexts_per_browser(self):
+        return self.config["BROWSER"]["CONTEXTS_PER_BROWSER"]
+
+    def get_browser_max_context_uses(self):
+        return self.config["BROWSER"]["MAX_CONTEXT_USES"]
+
+    def get_browser_navigation_timeout(self):
+        return self.config["BROWSER"]["NAVIGATION_TIMEOUT"]
+
+    def get_browser_text_only(self):
+        return self.config["BROWSER"]["TEXT_ONLY"] == "true"
+
+    def get_search_result_count(self):
+        return self.config["SEARCH"]["RESULT_COUNT"]
+
+    def get_search_cache_ttl(self):
+        return self.config["SEARCH"]["CACHE_TTL"]
+
+    def get_search_federated_engines(self):
+        return self.config["SEARCH"]["FEDERATED_ENGINES"]
+
+    def get_url_cache_enabled(self):
+        return self.config["URL_CACHE"]["ENABLED"] == "true"
+
+    def get_url_cache_ttl(self):
+        return self.config["URL_CACHE"]["TTL"]
+
+    def get_url_cache_max_age(self):
+        return self.config["URL_CACHE"]["MAX_AGE"]
+
+    def get_research_concurrency(self):
+        return self.config["RESEARCH"]["CONCURRENCY"]
+
+    def get_research_query_timeout(self):
+        return self.config["RESEARCH"]["QUERY_TIMEOUT"]
+
+    def get_research_time_budget(self):
+        return self.config["RESEARCH"]["TIME_BUDGET"]
+
+    def get_research_extract_max_tokens(self):
+        return self.config["RESEARCH"]["EXTRACT_MAX_TOKENS"]
+
+    def get_research_formatter_threshold(self):
+        return self.config["RESEARCH"]["FORMATTER_THRESHOLD"]
+
+    def get_sandbox_enabled(self):
+        return self.config["SANDBOX"]["ENABLED"] == "true"
+
+    def get_sandbox_backend(self):
+        return self.config["SANDBOX"]["BACKEND"]
+
+    def get_sandbox_pool_size(self):
+        return self.config["SANDBOX"]["POOL_SIZE"]
+
+    def get_sandbox_max_uses(self):
+        return self.config["SANDBOX"]["MAX_USES"]
+
+    def get_sandbox_memory_limit(self):
+        return self.config["SANDBOX"]["MEMORY_LIMIT_MB"]
+
+    def get_sandbox_cpu_limit(self):
+        return self.config["SANDBOX"]["CPU_LIMIT"]
+
+    def get_sandbox_cpu_time_limit(self):
+        return self.config["SANDBOX"]["CPU_TIME_LIMIT"]
+
+    def get_embeddings_backend(self):
+        return self.config["EMBEDDINGS"]["BACKEND"]
+
+    def get_embeddings_model(self):
+        return self.config["EMBEDDINGS"]["MODEL"]
+
+    def get_embeddings_batch_size(self):
+        return self.config["EMBEDDINGS"]["BATCH_SIZE"]
+
+    def get_embeddings_max_length(self):
+        return self.config["EMBEDDINGS"]["MAX_LENGTH"]
+
+    def get_knowledge_enabled(self):
+        return self.config["KNOWLEDGE"]["ENABLED"] == "true"
+
+    def get_knowledge_similarity_threshold(self):
+        return self.config["KNOWLEDGE"]["SIMILARITY_THRESHOLD"]
+
+    def get_knowledge_freshness(self):
+        return self.config["KNOWLEDGE"]["FRESHNESS"]
+
+    def get_knowledge_max_age(self):
+        return self.config["KNOWLEDGE"]["MAX_AGE"]
+
+    def get_vector_store_dtype(self):
+        return self.config["VECTOR_STORE"]["DTYPE"]
+
+    def get_vector_store_ivf_threshold(self):
+        return self.config["VECTOR_STORE"]["IVF_THRESHOLD"]
+
+    def get_vector_store_ivf_probes(self):
+        return self.config["VECTOR_STORE"]["IVF_PROBES"]
+
+    def get_vector_store_compact_ratio(self):
+        return self.config["VECTOR_STORE"]["COMPACT_RATIO"]
+
+    def get_models(self):
+        return self.config["MODELS"]
+
     def set_bing_api_key(self, key):
         self.config["API_KEYS"]["BING"] = key
         self.save_config()
@@ -128,7 +415,11 @@ class Config:
         self.save_config()
 
     def set_google_search_api_endpoint(self, endpoint):
-        self.config["API_ENDPOINTS"]["GOOGLE_SEARCH"] = endpoint
+        self.config["API_ENDPOINTS"]["GOOGLE"] = endpoint
+        self.save_config()
+
+    def set_duckduckgo_api_endpoint(self, endpoint):
+        self.config["API_ENDPOINTS"]["DUCKDUCKGO"] = endpoint
         self.save_config()
 
     def set_ollama_api_endpoint(self, endpoint):
@@ -175,21 +466,145 @@ class Config:
         self.config["LOGGING"]["LOG_PROMPTS"] = "true" if value else "false"
         self.save_config()
 
+    def set_logging_level(self, value):
+        self.config["LOGGING"]["LEVEL"] = value
+        self.save_config()
+
     def set_timeout_inference(self, value):
         self.config["TIMEOUT"]["INFERENCE"] = value
         self.save_config()
 
+    def set_edit_format(self, value):
+        self.config["EDITING"]["FORMAT"] = value
+        self.save_config()
+
+    def set_failure_context_tokens(self, value):
+        self.config["EDITING"]["FAILURE_CONTEXT_TOKENS"] = value
+        self.save_config()
+
+    def set_code_writing_mode(self, value):
+        self.config["PRESENTATION"]["CODE_WRITING"] = value
+        self.save_config()
+
+    def set_prompts_hot_reload(self, value):
+        self.config["PROMPTS"]["HOT_RELOAD"] = "true" if value else "false"
+        self.save_config()
+
+    def set_runner_timeout(self, value):
+        self.config["RUNNER"]["TIMEOUT"] = value
+        self.save_config()
+
+    def set_runner_idle_timeout(self, value):
+        self.config["RUNNER"]["IDLE_TIMEOUT"] = value
+        self.save_config()
+
+    def set_runner_max_parallel(self, value):
+        self.config["RUNNER"]["MAX_PARALLEL"] = value
+        self.save_config()
+
+    def set_runner_install_cache(self, value):
+        self.config["RUNNER"]["INSTALL_CACHE"] = "true" if value else "false"
+        self.save_config()
+
+    def set_browser_pool_size(self, value):
+        self.config["BROWSER"]["POOL_SIZE"] = value
+        self.save_config()
+
+    def set_browser_navigation_timeout(self, value):
+        self.config["BROWSER"]["NAVIGATION_TIMEOUT"] = value
+        self.save_config()
+
+    def set_browser_text_only(self, value):
+        self.config["BROWSER"]["TEXT_ONLY"] = "true" if value else "false"
+        self.save_config()
+
+    def set_search_result_count(self, value):
+        self.config["SEARCH"]["RESULT_COUNT"] = value
+        self.save_config()
+
+    def set_search_federated_engines(self, value):
+        self.config["SEARCH"]["FEDERATED_ENGINES"] = value
+        self.save_config()
+
+    def set_url_cache_enabled(self, value):
+        self.config["URL_CACHE"]["ENABLED"] = "true" if value else "false"
+        self.save_config()
+
+    def set_url_cache_ttl(self, value):
+        self.config["URL_CACHE"]["TTL"] = value
+        self.save_config()
+
+    def set_research_concurrency(self, value):
+        self.config["RESEARCH"]["CONCURRENCY"] = value
+        self.save_config()
+
+    def set_research_query_timeout(self, value):
+        self.config["RESEARCH"]["QUERY_TIMEOUT"] = value
+        self.save_config()
+
+    def set_research_time_budget(self, value):
+        self.config["RESEARCH"]["TIME_BUDGET"] = value
+        self.save_config()
+
+    def set_research_formatter_threshold(self, value):
+        self.config["RESEARCH"]["FORMATTER_THRESHOLD"] = value
+        self.save_config()
+
+    def set_knowledge_enabled(self, value):
+        self.config["KNOWLEDGE"]["ENABLED"] = "true" if value else "false"
+        self.save_config()
+
+    def set_embeddings_backend(self, value):
+        self.config["EMBEDDINGS"]["BACKEND"] = value
+        self.save_config()
+
+    def set_embeddings_model(self, value):
+        self.config["EMBEDDINGS"]["MODEL"] = value
+        self.save_config()
+
+    def set_sandbox_enabled(self, value):
+        self.config["SANDBOX"]["ENABLED"] = "true" if value else "false"
+        self.save_config()
+
+    def set_sandbox_backend(self, value):
+        self.config["SANDBOX"]["BACKEND"] = value
+        self.save_config()
+
+    def set_sandbox_pool_size(self, value):
+        self.config["SANDBOX"]["POOL_SIZE"] = value
+        self.save_config()
+
     def save_config(self):
-        with open("config.toml", "w") as f:
-            toml.dump(self.config, f)
+        """
+        Write the settings to config.toml atomically, without the values that
+        come from environment overrides.
+        """
+        with self._lock:
+            config = copy.deepcopy(self._config)
+            for (section, key), file_value in self._overrides.items():
+                if config[section].get(key) == _parse_env_value(os.environ.get(f"{ENV_PREFIX}{section}__{key}", "")):
+                    if file_value is None:
+                        config[section].pop(key, None)
+                    else:
+                        config[section][key] = file_value
+
+            directory = os.path.dirname(os.path.abspath(CONFIG_FILE))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config.", suffix=".toml")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    toml.dump(config, f)
+                os.replace(tmp_path, CONFIG_FILE)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._mtime = self._file_mtime()
+        if hasattr(self, "_snapshot"):
+            self._notify()
 
     def update_config(self, data):
-        for key, value in data.items():
-            if key in self.config:
-                with open("config.toml", "r+") as f:
-                    config = toml.load(f)
-                    for sub_key, sub_value in value.items():
-                        self.config[key][sub_key] = sub_value
-                        config[key][sub_key] = sub_value
-                    f.seek(0)
-                    toml.dump(config, f)
+        with self._lock:
+            for key, value in data.items():
+                if key in self._config and isinstance(value, dict):
+                    self._config[key].update(value)
+            self.save_config()
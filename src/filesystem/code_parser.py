@@ -0,0 +1,149 @@
+"""
+Parser for the code format the Coder, Feature and Patcher agents respond with:
+
+~~~
+File: `main.py`:
+```py
+print("Example")
+```
+~~~
+
+It consumes the response incrementally, so files can be shown while the
+model is still generating the rest of the response.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from src.config import Config
+from src.state import AgentState
+from src.socket_instance import emit_agent
+
+class CodeStreamParser:
+    def __init__(self, on_file: Optional[Callable[[Dict[str, str]], None]] = None):
+        self.on_file = on_file
+        self.files = []
+
+        self._buffer = ""
+        self._started = False
+        self._current_file = None
+        self._current_code = []
+        self._fence_depth = 0
+
+    def feed(self, chunk: str):
+        """
+        Feed the next chunk of the response. Only complete lines are parsed,
+        the rest is kept until the next chunk (or `close`) completes it.
+        """
+        self._buffer += chunk
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._parse_line(line)
+
+    def close(self) -> List[Dict[str, str]]:
+        if self._buffer:
+            self._parse_line(self._buffer)
+            self._buffer = ""
+        self._finish_file()
+        return self.files
+
+    @staticmethod
+    def parse_filename(line: str) -> str:
+        header = line[len("File:"):].strip()
+        if header.count("`") >= 2:
+            return header.split("`")[1].strip()
+        return header.rstrip(":").strip("*` ")
+
+    def _parse_line(self, line: str):
+        if line.startswith("File:") and self._fence_depth == 0:
+            self._finish_file()
+            self._started = True
+            self._current_file = self.parse_filename(line)
+            return
+
+        if not self._started:
+            self._started = line.strip().startswith("~~~")
+            return
+
+        if line.startswith("~~~") and self._fence_depth == 0:
+            self._finish_file()
+            return
+
+        if self._current_file is None:
+            return
+
+        if line.startswith("```"):
+            if self._fence_depth == 0:
+                self._fence_depth = 1
+                return
+            if line.rstrip() == "```":
+                self._fence_depth -= 1
+                if self._fence_depth == 0:
+                    return
+            else:
+                # a fence with an info string inside a file, e.g. in a README
+                self._fence_depth += 1
+
+        self._current_code.append(line)
+
+    def _finish_file(self):
+        if self._current_file and self._current_code:
+            file = {"file": self._current_file, "code": "\n".join(self._current_code)}
+            self.files.append(file)
+            if self.on_file:
+                self.on_file(file)
+
+        self._current_file = None
+        self._current_code = []
+        self._fence_depth = 0
+
+
+def parse_code_response(response: str) -> List[Dict[str, str]]:
+    parser = CodeStreamParser()
+    parser.feed(response.strip())
+    return parser.close()
+
+
+def stream_to_editor() -> Callable[[Dict[str, str]], None]:
+    """
+    Build an `on_file` callback that pushes each completed file to the editor
+    right away. Nothing is written to the project here: the files are only
+    saved once the whole response has been validated, so a response that
+    fails validation or is cut off leaves the project as it was.
+    """
+    def on_file(file: Dict[str, str]):
+        emit_agent("code", {
+            "files": [file],
+            "from": "stream"
+        })
+
+    return on_file
+
+
+def present_code(code_set: List[Dict[str, str]], project_name: str, source: str):
+    """
+    Show freshly written files in the UI with a single agent state update and
+    one batched `code` event. With the "paced" presentation mode the editor
+    animates the writing client-side, the agent never waits for it.
+    """
+    files = [{"file": file["file"], "code": file["code"]} for file in code_set]
+    if not files:
+        return
+
+    filenames = [file["file"] for file in files]
+
+    agent_state = AgentState()
+    current_state = agent_state.get_latest_state(project_name)
+    new_state = agent_state.new_state()
+    if current_state:
+        new_state["browser_session"] = current_state["browser_session"] # keep the browser session
+    new_state["internal_monologue"] = "Writing code..."
+    new_state["terminal_session"]["title"] = f"Editing {filenames[0]}" if len(files) == 1 else f"Editing {len(files)} files"
+    new_state["terminal_session"]["command"] = f"vim {' '.join(filenames)}"
+    new_state["terminal_session"]["output"] = files[-1]["code"] if len(files) == 1 else "\n".join(filenames)
+    agent_state.add_to_current_state(project_name, new_state)
+
+    emit_agent("code", {
+        "files": files,
+        "from": source,
+        "paced": Config().get_code_writing_mode() == "paced"
+    })
@@ -0,0 +1,233 @@
+"""
+Builds the code context for fixing a failed command from its output, instead
+of sending the whole project.
+
+Python, Node and compiler (gcc/clang, rustc, tsc, go, javac, ...) error
+locations are parsed out of the output and mapped to project files. The
+implicated files, or just the regions around the reported lines for the edit
+formats that don't need whole files, are included first, then the project
+files they import directly, until the token budget runs out. When nothing in
+the output points at a project file there is no focused context and the
+caller falls back to the full code.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+
+TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+
+CONTEXT_LINES = 20
+LIBRARY_DIRS = {"site-packages", "dist-packages", "node_modules"}
+IGNORED_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", "env", "dist", "build", "target", ".next"}
+
+PYTHON_TRACEBACK = "Traceback (most recent call last)"
+LOCATION_PATTERNS = [
+    # Python: File "app/main.py", line 12, in <module>
+    re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+)'),
+    # Node stack frames: at handler (/app/src/index.js:12:5)
+    re.compile(r"at (?:.+? \()?(?:file://)?(?P<file>[^\s()]+?):(?P<line>\d+):\d+\)?$"),
+    # tsc: src/index.ts(12,5): error TS2322
+    re.compile(r"^(?P<file>[^\s()]+?\.\w+)\((?P<line>\d+),\d+\)"),
+    # rustc: --> src/main.rs:12:5
+    re.compile(r"--> (?P<file>[^\s:]+):(?P<line>\d+)"),
+    # gcc, clang, go, javac, eslint, Node's first line: src/main.c:12:5: error
+    re.compile(r"(?:^|\s)(?P<file>[\w./\\-]+\.\w+):(?P<line>\d+)(?::\d+)?(?::|\s|$)"),
+]
+
+PYTHON_IMPORT = re.compile(r"^\s*(?:from\s+(?P<from>[\w.]+)\s+import|import\s+(?P<import>[\w.]+))", re.MULTILINE)
+JS_IMPORT = re.compile(r"""(?:require\(\s*|import\s*\(\s*|from\s+|import\s+)['"](?P<path>\.{1,2}/[^'"]+)['"]""")
+C_INCLUDE = re.compile(r'^\s*#\s*include\s+"(?P<path>[^"]+)"', re.MULTILINE)
+JS_EXTENSIONS = ["", ".js", ".ts", ".jsx", ".tsx", ".mjs", ".cjs", "/index.js", "/index.ts"]
+
+
+def count_tokens(text: str) -> int:
+    return len(TIKTOKEN_ENC.encode(text))
+
+
+def list_project_files(project_path: str) -> List[str]:
+    files = []
+    for root, dirs, filenames in os.walk(project_path):
+        dirs[:] = [directory for directory in dirs if directory not in IGNORED_DIRS]
+        for filename in filenames:
+            files.append(os.path.relpath(os.path.join(root, filename), project_path).replace(os.sep, "/"))
+    return files
+
+
+def _resolve(path: str, project_path: str, project_files: set) -> Optional[str]:
+    """
+    The project file a reported path points at: an absolute path under the
+    project, or a path relative to it. Frames from installed packages are
+    never project files, even when their names match one.
+    """
+    path = path.replace("\\", "/")
+    if LIBRARY_DIRS & set(path.split("/")):
+        return None
+
+    project_path = os.path.abspath(project_path)
+    candidate = os.path.abspath(path if os.path.isabs(path) else os.path.join(project_path, path))
+    if os.path.commonpath([project_path, candidate]) != project_path:
+        return None
+
+    relative = os.path.relpath(candidate, project_path).replace(os.sep, "/")
+    return relative if relative in project_files else None
+
+
+def find_locations(output: str, project_path: str, project_files: List[str]) -> List[Tuple[str, int]]:
+    """
+    (file, line) locations in the project, closest to the error first.
+    """
+    project_files = set(project_files)
+    locations = []
+    for line in output.splitlines():
+        for pattern in LOCATION_PATTERNS:
+            match = pattern.search(line.strip())
+            if not match:
+                continue
+            file = _resolve(match.group("file"), project_path, project_files)
+            if file:
+                locations.append((file, int(match.group("line"))))
+            break
+
+    if PYTHON_TRACEBACK in output:
+        # Python prints the innermost frame last
+        locations.reverse()
+
+    unique = []
+    for location in locations:
+        if location not in unique:
+            unique.append(location)
+    return unique
+
+
+def direct_imports(file: str, code: str, project_files: List[str]) -> List[str]:
+    """
+    Project files imported by `file` (Python, JavaScript/TypeScript, C/C++).
+    """
+    project_files = set(project_files)
+    directory = os.path.dirname(file)
+    candidates = []
+
+    if file.endswith(".py"):
+        for match in PYTHON_IMPORT.finditer(code):
+            module = match.group("from") or match.group("import")
+            level = len(module) - len(module.lstrip("."))
+            module_path = module.lstrip(".").replace(".", "/")
+            base = directory
+            for _ in range(max(level - 1, 0)):
+                base = os.path.dirname(base)
+            for root in ([base] if level else ["", directory]):
+                path = os.path.join(root, module_path) if module_path else root
+                candidates += [f"{path}.py", f"{path}/__init__.py"]
+    elif file.endswith((".js", ".ts", ".jsx", ".tsx", ".mjs", ".cjs", ".svelte", ".vue")):
+        for match in JS_IMPORT.finditer(code):
+            path = os.path.normpath(os.path.join(directory, match.group("path")))
+            candidates += [path + extension for extension in JS_EXTENSIONS]
+    elif file.endswith((".c", ".h", ".cc", ".cpp", ".hpp")):
+        for match in C_INCLUDE.finditer(code):
+            candidates.append(os.path.normpath(os.path.join(directory, match.group("path"))))
+
+    imports = []
+    for candidate in candidates:
+        candidate = os.path.normpath(candidate).replace(os.sep, "/")
+        if candidate in project_files and candidate != file and candidate not in imports:
+            imports.append(candidate)
+    return imports
+
+
+def _excerpt(code: str, lines: List[int]) -> List[Tuple[int, int, str]]:
+    """
+    The regions around `lines`, merged where they overlap, as
+    (first line, last line, text).
+    """
+    code_lines = code.splitlines()
+    ranges = []
+    for line in sorted(lines):
+        start, end = max(line - CONTEXT_LINES, 1), min(line + CONTEXT_LINES, len(code_lines))
+        if ranges and start <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return [(start, end, "\n".join(code_lines[start - 1:end])) for start, end in ranges]
+
+
+def _section(title: str, code: str) -> str:
+    return f"### {title}:\n\n```\n{code}\n```\n\n---\n\n"
+
+
+def build_failure_context(project_path: str, output: str, edit_format: str, token_budget: int) -> Optional[Dict]:
+    """
+    Focused code context for a failed command:
+
+    {
+        "markdown": ...,  # same layout as ReadCode.code_set_to_markdown
+        "files": [...],   # implicated files, closest to the error first
+        "tokens": ...
+    }
+
+    or None when the output doesn't point at any project file. With the
+    "whole" edit format implicated files are included in full, since they are
+    rewritten in full; the diff formats only get the reported regions.
+    """
+    project_files = list_project_files(project_path)
+    locations = find_locations(output, project_path, project_files)
+    if not locations:
+        return None
+
+    lines_by_file = {}
+    for file, line in locations:
+        lines_by_file.setdefault(file, []).append(line)
+
+    codes = {}
+
+    def read(file: str) -> Optional[str]:
+        if file not in codes:
+            try:
+                with open(os.path.join(project_path, file), "r") as f:
+                    codes[file] = f.read()
+            except (OSError, UnicodeDecodeError):
+                codes[file] = None
+        return codes[file]
+
+    sections, tokens, included = [], 0, []
+
+    def add(section: str) -> bool:
+        nonlocal tokens
+        section_tokens = count_tokens(section)
+        if tokens + section_tokens > token_budget:
+            return False
+        sections.append(section)
+        tokens += section_tokens
+        return True
+
+    for file, lines in lines_by_file.items():
+        code = read(file)
+        if code is None:
+            continue
+        if edit_format == "whole":
+            # an excerpt would get written back as the whole file
+            if add(_section(file, code)):
+                included.append(file)
+            elif not included:
+                return None
+            continue
+        added = [
+            add(_section(f"{file} (lines {start}-{end})", text))
+            for start, end, text in _excerpt(code, lines)
+        ]
+        if any(added):
+            included.append(file)
+
+    if not included:
+        return None
+
+    for file in list(included):
+        for imported in direct_imports(file, read(file), project_files):
+            if imported in included or read(imported) is None:
+                continue
+            if add(_section(imported, read(imported))):
+                included.append(imported)
+
+    return {"markdown": "".join(sections), "files": included, "tokens": tokens}
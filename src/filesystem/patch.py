@@ -0,0 +1,326 @@
+"""
+Applies the edit formats the Feature and Patcher agents can ask the model for.
+
+- "whole": every file is re-emitted in full (the original behaviour)
+- "udiff": every file block holds unified diff hunks
+- "search_replace": every file block holds SEARCH/REPLACE blocks
+
+Hunks are located exactly first, then ignoring whitespace, then by fuzzy
+similarity, since models rarely reproduce context lines or line numbers
+perfectly. A hunk that matches more than one place, or only loosely, is
+refused rather than applied somewhere it may not belong.
+"""
+
+import os
+import re
+import difflib
+
+import tiktoken
+
+from src.logger import Logger
+from src.socket_instance import emit_agent
+
+EDIT_FORMATS = ("whole", "udiff", "search_replace")
+
+FUZZY_THRESHOLD = 0.92
+FUZZY_MARGIN = 0.03
+FUZZY_MIN_LINES = 4
+
+TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+
+HUNK_HEADER = re.compile(r"^@@ .*@@")
+HUNK_COUNTS = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+FILE_HEADER = re.compile(r"^(---|\+\+\+) ")
+SEARCH_MARKER = re.compile(r"^<{5,} ?SEARCH\s*$")
+DIVIDER_MARKER = re.compile(r"^={5,}\s*$")
+REPLACE_MARKER = re.compile(r"^>{5,} ?REPLACE\s*$")
+
+
+logger = Logger()
+
+
+class PatchError(Exception):
+    pass
+
+
+def parse_unified_diff(diff: str) -> list:
+    """
+    Split a unified diff into (before, after) line lists, one pair per hunk.
+    Line numbers in the hunk headers are ignored on purpose, their line counts
+    only tell "---"/"+++" file headers from changed lines that start with them.
+    """
+    hunks = []
+    current = None
+    # lines of the current hunk still to come per its header, None when the
+    # header has no counts (models often write a bare "@@ @@")
+    remaining = None
+
+    for line in diff.split("\n"):
+        if HUNK_HEADER.match(line):
+            current = []
+            hunks.append(current)
+            counts = HUNK_COUNTS.match(line)
+            remaining = [int(count or 1) for count in counts.groups()] if counts else None
+            continue
+        # "--- a/file" is a header only before the first hunk or once a hunk
+        # is complete, otherwise it is a removed "-- comment" line
+        if FILE_HEADER.match(line) and (current is None or remaining == [0, 0]):
+            current = None
+            continue
+        if current is None:
+            current = []
+            hunks.append(current)
+            remaining = None
+        current.append(line)
+
+        if remaining is not None:
+            if line.startswith("-"):
+                remaining[0] -= 1
+            elif line.startswith("+"):
+                remaining[1] -= 1
+            elif not line.startswith("\\"):
+                remaining[0] -= 1
+                remaining[1] -= 1
+
+    result = []
+    for hunk in hunks:
+        # trailing blank lines are almost always an artifact of the fence
+        while hunk and hunk[-1].strip() == "":
+            hunk.pop()
+
+        before, after = [], []
+        for line in hunk:
+            if line.startswith("-"):
+                before.append(line[1:])
+            elif line.startswith("+"):
+                after.append(line[1:])
+            elif line.startswith("\\"):
+                # "\ No newline at end of file"
+                continue
+            else:
+                line = line[1:] if line.startswith(" ") else line
+                before.append(line)
+                after.append(line)
+
+        if before != after:
+            result.append((before, after))
+
+    return result
+
+
+def parse_search_replace(text: str) -> list:
+    """
+    Split SEARCH/REPLACE blocks into (search, replace) line lists.
+    """
+    blocks = []
+    search, replace = None, None
+    section = None
+
+    for line in text.split("\n"):
+        if SEARCH_MARKER.match(line):
+            search, replace = [], []
+            section = "search"
+        elif DIVIDER_MARKER.match(line) and section == "search":
+            section = "replace"
+        elif REPLACE_MARKER.match(line) and section == "replace":
+            blocks.append((search, replace))
+            section = None
+        elif section == "search":
+            search.append(line)
+        elif section == "replace":
+            replace.append(line)
+
+    if section is not None:
+        raise PatchError("Unterminated SEARCH/REPLACE block")
+
+    return blocks
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _find_exact(lines: list, needle: list, key=None) -> list:
+    if key:
+        lines = [key(line) for line in lines]
+        needle = [key(line) for line in needle]
+
+    size = len(needle)
+    return [start for start in range(len(lines) - size + 1) if lines[start:start + size] == needle]
+
+
+def _find_fuzzy(lines: list, needle: list) -> int:
+    # short blocks look alike whatever they say, they must match exactly
+    if sum(1 for line in needle if line.strip()) < FUZZY_MIN_LINES:
+        return -1
+
+    size = len(needle)
+    target = "\n".join(_normalize(line) for line in needle)
+    normalized = [_normalize(line) for line in lines]
+
+    candidates = []
+    floor = FUZZY_THRESHOLD - FUZZY_MARGIN
+    for start in range(len(lines) - size + 1):
+        window = "\n".join(normalized[start:start + size])
+        matcher = difflib.SequenceMatcher(None, window, target, autojunk=False)
+        if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= floor:
+            candidates.append((ratio, start))
+            floor = max(floor, ratio - FUZZY_MARGIN)
+
+    if not candidates:
+        return -1
+    best_ratio, best_start = max(candidates)
+    if best_ratio < FUZZY_THRESHOLD:
+        return -1
+
+    # another place (not overlapping the best one) that matches about as well
+    for ratio, start in candidates:
+        if abs(start - best_start) >= size and ratio >= best_ratio - FUZZY_MARGIN:
+            raise PatchError(f"Hunk matches several places about equally well (at lines {best_start + 1} and {start + 1})")
+    return best_start
+
+
+def _locate(lines: list, needle: list) -> int:
+    for key in (None, str.rstrip, _normalize):
+        matches = _find_exact(lines, needle, key)
+        if len(matches) > 1:
+            preview = "\n".join(needle[:3])
+            raise PatchError(f"Hunk matches {len(matches)} places, starting with:\n{preview}")
+        if matches:
+            return matches[0]
+    return _find_fuzzy(lines, needle)
+
+
+def replace_lines(lines: list, before: list, after: list, append: bool = False) -> list:
+    """
+    Replace the block `before` with `after` inside `lines`. The block must be
+    found exactly once. An empty `before` has nothing to anchor it, so it is
+    only accepted with `append` (a new or empty file), where `after` is added
+    to the end.
+    """
+    if not any(line.strip() for line in before):
+        if not append:
+            raise PatchError("Hunk without context lines for an existing file")
+        return lines + after
+
+    start = _locate(lines, before)
+
+    if start == -1:
+        # blank context lines at the edges are the usual reason a hunk misses
+        before, after = list(before), list(after)
+        while before and before[0].strip() == "":
+            before.pop(0)
+            if after and after[0].strip() == "":
+                after.pop(0)
+        while before and before[-1].strip() == "":
+            before.pop()
+            if after and after[-1].strip() == "":
+                after.pop()
+        if before:
+            start = _locate(lines, before)
+
+    if start == -1:
+        preview = "\n".join(before[:3])
+        raise PatchError(f"Could not locate hunk starting with:\n{preview}")
+
+    return lines[:start] + after + lines[start + len(before):]
+
+
+def apply_edit(original, edit: str, edit_format: str) -> str:
+    """
+    Apply a single file's edit to its original content. `original` is None
+    when the file doesn't exist yet.
+    """
+    if edit_format == "udiff":
+        hunks = parse_unified_diff(edit)
+    elif edit_format == "search_replace":
+        hunks = parse_search_replace(edit)
+    else:
+        raise PatchError(f"Unknown edit format: {edit_format}")
+
+    if not hunks:
+        raise PatchError("No hunks found in the edit")
+
+    trailing_newline = original is None or original.endswith("\n")
+    lines = [] if original is None else original.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    append = not any(line.strip() for line in lines)
+
+    for before, after in hunks:
+        lines = replace_lines(lines, before, after, append)
+
+    content = "\n".join(lines)
+    if trailing_newline and content:
+        content += "\n"
+    return content
+
+
+def apply_edits(files: list, project_path: str, edit_format: str):
+    """
+    Turn parsed `{"file", "code"}` edit blocks into full-file contents by
+    applying them to what is on disk. Returns the applied files and the names
+    of the files whose edits could not be applied.
+    """
+    applied = []
+    failed = []
+
+    for file in files:
+        file_path = os.path.join(project_path, file["file"])
+
+        original = None
+        if os.path.isfile(file_path):
+            with open(file_path, "r", encoding="utf-8") as f:
+                original = f.read()
+
+        try:
+            code = apply_edit(original, file["code"], edit_format)
+        except PatchError:
+            failed.append(file["file"])
+            continue
+
+        applied.append({"file": file["file"], "code": code})
+
+    return applied, failed
+
+
+def edit_metrics(response: str, files: list) -> dict:
+    """
+    Compare the output tokens spent on an edit response with what re-emitting
+    the same files in full would have cost.
+    """
+    response_tokens = len(TIKTOKEN_ENC.encode(response))
+    full_tokens = sum(len(TIKTOKEN_ENC.encode(file["code"])) for file in files)
+
+    return {
+        "response_tokens": response_tokens,
+        "full_file_tokens": full_tokens,
+        "tokens_saved": full_tokens - response_tokens,
+    }
+
+
+def apply_edit_response(code_set: list, response: str, edit_format: str, project_path: str, source: str):
+    """
+    Apply the edits an agent (`source`) responded with to the project and
+    report how many tokens they saved. Returns the full-file contents, or
+    False when any edit could not be applied and the files must be rewritten
+    in full instead.
+    """
+    applied, failed = apply_edits(code_set, project_path, edit_format)
+
+    if failed:
+        logger.warning(f"Could not apply the {edit_format} edits to: {', '.join(failed)}")
+        emit_agent("info", {"type": "warning", "message": "Couldn't apply the edits, rewriting the full files instead..."})
+        return False
+
+    metrics = edit_metrics(response, applied)
+    logger.info(
+        f"{edit_format} edits: {metrics['response_tokens']} output tokens instead of "
+        f"{metrics['full_file_tokens']} for the full files ({metrics['tokens_saved']} saved)"
+    )
+    emit_agent("metrics", {"type": "edit", "from": source, "edit_format": edit_format, **metrics})
+
+    return applied
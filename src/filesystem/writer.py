@@ -0,0 +1,97 @@
+"""
+Writes a set of generated files into a project directory.
+
+Files whose content is already on disk are left alone (so their mtimes don't
+change), everything else is written to a temporary file next to the target
+and renamed over it, so a file is either fully old or fully new.
+"""
+
+import os
+import secrets
+import hashlib
+from typing import Dict, List
+
+# mode for new files, narrowed by the process umask when they're created
+NEW_FILE_MODE = 0o666
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_hash(path: str, size: int):
+    """
+    Hash of the file on disk, or None when it doesn't exist. When the size
+    differs there's no need to read the file at all.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None, None
+
+    if stat.st_size != size:
+        return "", stat.st_mode
+
+    with open(path, "rb") as f:
+        return content_hash(f.read()), stat.st_mode
+
+
+def _atomic_write(path: str, data: bytes, mode: int = None):
+    """
+    Write `data` to a temporary file next to `path` and rename it over it.
+    The temporary file gets the mode of the file it replaces, or for a new
+    file NEW_FILE_MODE with the umask applied by the kernel.
+    """
+    directory, filename = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{filename}.{secrets.token_hex(4)}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, NEW_FILE_MODE)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if mode is not None:
+                os.fchmod(f.fileno(), mode & 0o7777)
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_files(base_dir: str, files: List[Dict[str, str]]) -> Dict[str, list]:
+    """
+    Write `{"file", "code"}` entries under `base_dir` and return a manifest of
+    what actually changed:
+
+    {
+        "created": [...], "modified": [...], "unchanged": [...],
+        "rejected": [...],  # paths that would escape base_dir
+        "hashes": {file: sha256}
+    }
+    """
+    base_dir = os.path.abspath(base_dir)
+    manifest = {"created": [], "modified": [], "unchanged": [], "rejected": [], "hashes": {}}
+
+    targets = []
+    for file in files:
+        path = os.path.abspath(os.path.join(base_dir, file["file"]))
+        if os.path.commonpath([base_dir, path]) != base_dir or path == base_dir:
+            manifest["rejected"].append(file["file"])
+            continue
+        targets.append((file["file"], path, file["code"].encode("utf-8")))
+
+    for directory in sorted({os.path.dirname(path) for _, path, _ in targets}):
+        os.makedirs(directory, exist_ok=True)
+
+    for name, path, data in targets:
+        new_hash = content_hash(data)
+        manifest["hashes"][name] = new_hash
+
+        old_hash, mode = _file_hash(path, len(data))
+        if old_hash == new_hash:
+            manifest["unchanged"].append(name)
+            continue
+
+        _atomic_write(path, data, mode)
+        manifest["created" if old_hash is None else "modified"].append(name)
+
+    return manifest
@@ -1,14 +1,113 @@
+"""
+Startup is staged: init_devika() only does the quick work (configuration and
+data directories) so the server can open its port right away, and
+start_warm_up() loads the slow components (keyword model, sandbox check,
+Ollama probe, provider SDKs) in the background. The readiness of each one is
+reported by get_readiness() and /api/status.
+"""
+
 import os
+import threading
+
 from src.config import Config
 from src.logger import Logger
 
+_readiness = {}
+_readiness_lock = threading.Lock()
+
+
+def set_readiness(component: str, state: str, error: str = None):
+    with _readiness_lock:
+        _readiness[component] = {"state": state, "error": error}
+
+
+def get_readiness() -> dict:
+    with _readiness_lock:
+        return {component: dict(status) for component, status in _readiness.items()}
+
+
+def is_ready() -> bool:
+    return all(status["state"] in ("ready", "disabled") for status in get_readiness().values())
+
+
+def _run_off_hub(func):
+    """
+    Under gevent, run CPU-bound work (imports) on a native thread so the hub
+    keeps serving requests meanwhile.
+    """
+    try:
+        from gevent.monkey import is_module_patched
+        if is_module_patched("threading"):
+            import gevent
+            return gevent.get_hub().threadpool.apply(func)
+    except ImportError:
+        pass
+    return func()
+
+
+def _warm_up_sandbox():
+    from src.sandbox.pool import SandboxPool
+
+    # workers are started per project, on its first command; this only
+    # checks the backend works
+    if not SandboxPool.enabled():
+        return "disabled"
+    SandboxPool()
+
+
+def _warm_up_keywords():
+    from src.bert.sentence import KeywordService
+
+    KeywordService().warm_up()
+
+
+def _warm_up_ollama():
+    from src.llm.llm import ollama
+
+    ollama.probe()
+
+
+def _warm_up_providers():
+    from src.llm.llm import warm_up_providers
+
+    _run_off_hub(warm_up_providers)
+
+
+WARM_UP_STEPS = [
+    ("sandbox", "Checking the sandbox backend...", _warm_up_sandbox),
+    ("keywords", "Loading sentence-transformer BERT models...", _warm_up_keywords),
+    ("ollama", "Checking for a local Ollama server...", _warm_up_ollama),
+    ("providers", "Loading LLM provider clients...", _warm_up_providers),
+]
+
+
+def warm_up():
+    logger = Logger()
+
+    for component, message, step in WARM_UP_STEPS:
+        logger.info(message)
+        set_readiness(component, "loading")
+        try:
+            set_readiness(component, step() or "ready")
+        except Exception as e:
+            logger.error(f"Warm-up of {component} failed: {e}")
+            set_readiness(component, "failed", str(e))
+
+    logger.info("Warm-up finished.")
+
+
+def start_warm_up():
+    for component, _, _ in WARM_UP_STEPS:
+        set_readiness(component, "pending")
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
 
 def init_devika():
     logger = Logger()
 
     logger.info("Initializing Swea...")
     logger.info("checking configurations...")
-    
+
     config = Config()
 
     sqlite_db = config.get_sqlite_db()
@@ -16,6 +115,8 @@ def init_devika():
     pdfs_dir = config.get_pdfs_dir()
     projects_dir = config.get_projects_dir()
     logs_dir = config.get_logs_dir()
+    cache_dir = config.get_cache_dir()
+    vectors_dir = config.get_vectors_dir()
 
     logger.info("Initializing Prerequisites Jobs...")
     os.makedirs(os.path.dirname(sqlite_db), exist_ok=True)
@@ -23,10 +124,5 @@ def init_devika():
     os.makedirs(pdfs_dir, exist_ok=True)
     os.makedirs(projects_dir, exist_ok=True)
     os.makedirs(logs_dir, exist_ok=True)
-
-    from src.bert.sentence import SentenceBert
-
-    logger.info("Loading sentence-transformer BERT models...")
-    prompt = "Light-weight keyword extraction exercise for BERT model loading.".strip()
-    SentenceBert(prompt).extract_keywords()
-    logger.info("BERT model loaded successfully.")
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(vectors_dir, exist_ok=True)
@@ -1 +1,7 @@
-from .llm import LLM
\ No newline at end of file
+def __getattr__(name):
+    # LLM (and what it imports) loads on first use, so importing
+    # src.llm.providers or a client module doesn't pull it in
+    if name == "LLM":
+        from .llm import LLM
+        return LLM
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -24,3 +24,18 @@ class Claude:
         )
 
         return message.content[0].text
+
+    def stream(self, model_id: str, prompt: str):
+        with self.client.messages.stream(
+            max_tokens=4096,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
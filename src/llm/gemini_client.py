@@ -31,3 +31,17 @@ class Gemini:
             print("Safety ratings:", response.candidates[0].safety_ratings)
             # Handle the error or return an appropriate message
             return "Error: Unable to generate content Gemini API"
+
+    def stream(self, model_id: str, prompt: str):
+        config = genai.GenerationConfig(temperature=0)
+        model = genai.GenerativeModel(model_id, generation_config=config)
+        safety_settings = {
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+        for chunk in model.generate_content(prompt, safety_settings=safety_settings, stream=True):
+            try:
+                yield chunk.text
+            except ValueError:
+                # blocked or empty chunk, nothing to emit
+                continue
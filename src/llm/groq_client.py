@@ -22,3 +22,19 @@ class Groq:
         )
 
         return chat_completion.choices[0].message.content
+
+    def stream(self, model_id: str, prompt: str):
+        stream = self.client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
+            temperature=0,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
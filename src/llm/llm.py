@@ -1,17 +1,11 @@
 import sys
 
 import tiktoken
-from typing import List, Tuple
+from typing import Callable, List, Tuple
 
 from src.socket_instance import emit_agent
 from .ollama_client import Ollama
-from .claude_client import Claude
-from .openai_client import OpenAi
-from .gemini_client import Gemini
-from .mistral_client import MistralAi
-from .groq_client import Groq
-from .lm_studio_client import LMStudio
-from .openrouter_client import OpenRouter
+from .providers import configured_providers, list_models, load_provider
 
 from src.state import AgentState
 
@@ -26,66 +20,55 @@ agentState = AgentState()
 config = Config()
 
 
+def get_client(model_enum: str):
+    if model_enum == "OLLAMA":
+        return ollama
+    return load_provider(model_enum)()
+
+
+def warm_up_providers():
+    """
+    Import the SDKs of the providers that have an API key or need none.
+    """
+    for model_enum in configured_providers():
+        load_provider(model_enum)
+
+
 class LLM:
     def __init__(self, model_id: str = None):
         self.config = Config()
         self.model_id = model_id
-        self.log_prompts = self.config.get_logging_prompts()
+
+    # read on every use so changes to the settings apply to running agents
+    @property
+    def log_prompts(self) -> bool:
+        return self.config.get_logging_prompts()
+
+    @property
+    def timeout_inference(self) -> int:
         # Use a shorter timeout for OpenRouter
-        self.timeout_inference = 20 if 'openrouter' in model_id.lower() else self.config.get_timeout_inference()
-        self.models = {
-            "OPENROUTER": [
-                ("GPT-4o-mini", "gpt-4o-mini"),
-                ("GPT-4o", "gpt-4o"),
-            ],
-            "CLAUDE": [
-                ("Claude 3 Opus", "claude-3-opus-20240229"),
-                ("Claude 3 Sonnet", "claude-3-sonnet-20240229"),
-                ("Claude 3 Haiku", "claude-3-haiku-20240307"),
-            ],
-            "OPENAI": [
-                ("GPT-4o-mini", "gpt-4o-mini"),
-                ("GPT-4o", "gpt-4o"),
-                ("GPT-4 Turbo", "gpt-4-turbo"),
-                ("GPT-3.5 Turbo", "gpt-3.5-turbo-0125"),
-            ],
-            "GOOGLE": [
-                ("Gemini 1.0 Pro", "gemini-pro"),
-                ("Gemini 1.5 Flash", "gemini-1.5-flash"),
-                ("Gemini 1.5 Pro", "gemini-1.5-pro"),
-            ],
-            "MISTRAL": [
-                ("Mistral 7b", "open-mistral-7b"),
-                ("Mistral 8x7b", "open-mixtral-8x7b"),
-                ("Mistral Medium", "mistral-medium-latest"),
-                ("Mistral Small", "mistral-small-latest"),
-                ("Mistral Large", "mistral-large-latest"),
-            ],
-            "GROQ": [
-                ("LLAMA3 8B", "llama3-8b-8192"),
-                ("LLAMA3 70B", "llama3-70b-8192"),
-                ("LLAMA2 70B", "llama2-70b-4096"),
-                ("Mixtral", "mixtral-8x7b-32768"),
-                ("GEMMA 7B", "gemma-7b-it"),
-            ],
-            "OLLAMA": [],
-            "LM_STUDIO": [
-                ("LM Studio", "local-model"),    
-            ],
-            
-        }
-        if ollama.client:
-            self.models["OLLAMA"] = [(model["name"], model["name"]) for model in ollama.models]
+        return 20 if self.model_id and 'openrouter' in self.model_id.lower() else self.config.get_timeout_inference()
+
+    @property
+    def models(self) -> dict:
+        return self.list_models()
 
     def list_models(self) -> dict:
-        return self.models
+        models = list_models()
+        models["OLLAMA"] = [(model["name"], model["name"]) for model in ollama.models] if ollama.client else []
+        return models
 
     def model_enum(self, model_name: str) -> Tuple[str, str]:
-        # Match on both friendly name and model_id for robustness
-        for model_enum, models in self.models.items():
+        # Match on both friendly name and model_id for robustness; the
+        # configured models first, so Ollama is only probed for its own
+        for model_enum, models in list_models().items():
             for friendly, model_id in models:
                 if model_name == friendly or model_name == model_id:
                     return model_enum, model_id
+        if ollama.client:
+            for model in ollama.models:
+                if model_name == model["name"]:
+                    return "OLLAMA", model["name"]
         return (None, None)
 
     @staticmethod
@@ -96,7 +79,20 @@ class LLM:
         total = agentState.get_latest_token_usage(project_name) + token_usage
         emit_agent("tokens", {"token_usage": total})
 
-    def inference(self, prompt: str, project_name: str) -> str:
+    @staticmethod
+    def stream_inference(model, model_name: str, prompt: str, on_token: Callable[[str], None]) -> str:
+        chunks = []
+        for chunk in model.stream(model_name, prompt):
+            chunks.append(chunk)
+            on_token(chunk)
+        return "".join(chunks)
+
+    def inference(self, prompt: str, project_name: str, on_token: Callable[[str], None] = None) -> str:
+        """
+        Run the prompt against the model. When `on_token` is given, the response
+        is streamed into it as it is generated (or passed whole, for providers
+        that can't stream).
+        """
         self.update_global_token_usage(prompt, project_name)
 
         model_enum, model_name = self.model_enum(self.model_id)
@@ -105,26 +101,19 @@ class LLM:
         if model_enum is None:
             raise ValueError(f"Model {self.model_id} not supported")
 
-        model_mapping = {
-            "OLLAMA": ollama,
-            "CLAUDE": Claude(),
-            "OPENAI": OpenAi(),
-            "GOOGLE": Gemini(),
-            "MISTRAL": MistralAi(),
-            "GROQ": Groq(),
-            "LM_STUDIO": LMStudio(),
-            "OPENROUTER": OpenRouter()
-        }
-
         try:
             import concurrent.futures
             import time
 
             start_time = time.time()
-            model = model_mapping[model_enum]
+            model = get_client(model_enum)
+            streaming = on_token is not None and hasattr(model, "stream")
             
             with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(model.inference, model_name, prompt)
+                if streaming:
+                    future = executor.submit(self.stream_inference, model, model_name, prompt, on_token)
+                else:
+                    future = executor.submit(model.inference, model_name, prompt)
                 try:
                     while True:
                         elapsed_time = time.time() - start_time
@@ -156,6 +145,9 @@ class LLM:
         except KeyError:
             raise ValueError(f"Model {model_enum} not supported")
 
+        if on_token is not None and not streaming:
+            on_token(response)
+
         if self.log_prompts:
             logger.debug(f"Response ({model}): --> {response}")
 
@@ -28,3 +28,18 @@ class LMStudio:
             model=model_id, # unused 
         )
         return chat_completion.choices[0].message.content
+
+    def stream(self, model_id: str, prompt: str):
+        stream = self.client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id, # unused
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
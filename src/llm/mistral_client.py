@@ -24,3 +24,18 @@ class MistralAi:
         )
         # Access the response using the new structure
         return chat_response.choices[0].message.content  # Extract content from the response
+
+    def stream(self, model_id: str, prompt: str):
+        stream = self.client.chat.stream(
+            model=model_id,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip()
+                }
+            ],
+        )
+        for event in stream:
+            content = event.data.choices[0].delta.content
+            if content:
+                yield content
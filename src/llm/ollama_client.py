@@ -1,4 +1,5 @@
-import ollama
+import threading
+
 from src.logger import Logger
 from src.config import Config
 
@@ -7,14 +8,51 @@ log = Logger()
 
 class Ollama:
     def __init__(self):
-        try:
-            self.client = ollama.Client(Config().get_ollama_api_endpoint())
-            self.models = self.client.list()["models"]
-            log.info("Ollama available")
-        except:
-            self.client = None
-            log.warning("Ollama not available")
-            log.warning("run ollama server to use ollama models otherwise use API models")
+        # the server is probed on first use, not at import
+        self._client = None
+        self._models = []
+        self._probed = False
+        self._lock = threading.Lock()
+        Config().subscribe(self._on_config_change, "API_ENDPOINTS")
+
+    def _on_config_change(self, changes: dict):
+        if "OLLAMA" in changes["API_ENDPOINTS"]:
+            self.reset()
+
+    def reset(self):
+        """
+        Probe the server again on next use, e.g. after its endpoint changed.
+        """
+        with self._lock:
+            self._client = None
+            self._models = []
+            self._probed = False
+
+    def probe(self):
+        with self._lock:
+            if self._probed:
+                return
+            try:
+                import ollama
+                client = ollama.Client(Config().get_ollama_api_endpoint())
+                self._models = client.list()["models"]
+                self._client = client
+                log.info("Ollama available")
+            except:
+                self._client = None
+                log.warning("Ollama not available")
+                log.warning("run ollama server to use ollama models otherwise use API models")
+            self._probed = True
+
+    @property
+    def client(self):
+        self.probe()
+        return self._client
+
+    @property
+    def models(self):
+        self.probe()
+        return self._models
 
     def inference(self, model_id: str, prompt: str) -> str:
         response = self.client.generate(
@@ -23,3 +61,12 @@ class Ollama:
             options={"temperature": 0}
         )
         return response['response']
+
+    def stream(self, model_id: str, prompt: str):
+        for chunk in self.client.generate(
+            model=model_id,
+            prompt=prompt.strip(),
+            options={"temperature": 0},
+            stream=True
+        ):
+            yield chunk['response']
@@ -0,0 +1,116 @@
+"""
+Registry of the LLM providers.
+
+A provider is known by its enum ("CLAUDE", "OPENAI", ...) and the
+"module:Class" of its client, which (with its SDK) is imported the first time
+the provider is used. The models each provider offers come from the MODELS
+section of the config, so listing them imports nothing.
+
+Other packages can add providers through the "swea.llm_providers" entry point
+group, named by enum:
+
+    [project.entry-points."swea.llm_providers"]
+    MY_PROVIDER = "my_package.client:MyProvider"
+
+Only their metadata is read until one is used. Their API key goes in
+API_KEYS under the same name, and their models in MODELS.
+"""
+
+import threading
+import importlib
+
+from src.config import Config
+
+ENTRY_POINT_GROUP = "swea.llm_providers"
+
+# enum -> ("module:Class" of the client, key of its API key in API_KEYS or None)
+PROVIDERS = {
+    "CLAUDE": ("src.llm.claude_client:Claude", "CLAUDE"),
+    "OPENAI": ("src.llm.openai_client:OpenAi", "OPENAI"),
+    "GOOGLE": ("src.llm.gemini_client:Gemini", "GEMINI"),
+    "MISTRAL": ("src.llm.mistral_client:MistralAi", "MISTRAL"),
+    "GROQ": ("src.llm.groq_client:Groq", "GROQ"),
+    "LM_STUDIO": ("src.llm.lm_studio_client:LMStudio", None),
+    "OPENROUTER": ("src.llm.openrouter_client:OpenRouter", "OPENROUTER"),
+}
+
+_clients = {}
+_plugins_loaded = False
+_registry_lock = threading.Lock()
+
+
+def register(model_enum: str, target: str, api_key: str = None):
+    """
+    Add a provider whose client is `target` ("module:Class").
+    """
+    with _registry_lock:
+        PROVIDERS[model_enum] = (target, api_key)
+        _clients.pop(model_enum, None)
+
+
+def _load_plugins():
+    global _plugins_loaded
+
+    with _registry_lock:
+        if _plugins_loaded:
+            return
+        _plugins_loaded = True
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            PROVIDERS.setdefault(entry_point.name.upper(), (entry_point.value, entry_point.name.upper()))
+
+
+def providers() -> dict:
+    _load_plugins()
+    return dict(PROVIDERS)
+
+
+def load_provider(model_enum: str):
+    """
+    The client class of the provider, imported on first use.
+    """
+    if model_enum in _clients:
+        return _clients[model_enum]
+
+    target, _ = providers()[model_enum]
+    module, _, name = target.partition(":")
+    client = getattr(importlib.import_module(module), name)
+    with _registry_lock:
+        _clients[model_enum] = client
+    return client
+
+
+def is_loaded(model_enum: str) -> bool:
+    return model_enum in _clients
+
+
+def configured_providers() -> list:
+    """
+    The providers that have an API key, or don't need one.
+    """
+    api_keys = Config().get_config()["API_KEYS"]
+    configured = []
+    for model_enum, (_, api_key_name) in providers().items():
+        if api_key_name is None:
+            configured.append(model_enum)
+            continue
+        api_key = api_keys.get(api_key_name)
+        if api_key and not api_key.startswith("<YOUR_"):
+            configured.append(model_enum)
+    return configured
+
+
+def list_models() -> dict:
+    """
+    {enum: [(name, model id)]} of the registered providers, from the config.
+    """
+    models = Config().get_models()
+    registered = providers()
+    # in the order of the config, then the providers it has no models for
+    order = [model_enum for model_enum in models if model_enum in registered]
+    order += [model_enum for model_enum in registered if model_enum not in models]
+    return {
+        model_enum: [tuple(model) for model in models.get(model_enum, [])]
+        for model_enum in order
+    }
@@ -1,40 +1,236 @@
+"""
+One logging pipeline per process, on the standard logging module.
+
+Logger() is cheap: every instance shares the pipeline of its log file. Records
+are put on a queue and written to the file (and the console) by a background
+listener, so logging never waits on disk. The file rotates at midnight (or
+LOGGING.ROTATE_WHEN) and whenever it grows past MAX_BYTES. Messages longer
+than MAX_MESSAGE_LENGTH are truncated, and every channel ("swea", "socket",
+...) has its own level from LOGGING.CHANNEL_LEVELS, defaulting to LEVEL.
+Levels and the message limit follow changes to the settings while running.
+"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
 from functools import wraps
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
-from fastlogging import LogInit
 from flask import request
 
 from src.config import Config
 
+DEFAULT_FILENAME = "Swea_agent.log"
+LOG_FORMAT = "%(asctime)s %(levelname)-8s [%(name)s] %(message)s"
+
+TAIL_BLOCK = 65536
+MAX_TAIL_BYTES = 1048576
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+_channels = {}
+
+
+class RotatingLogFileHandler(TimedRotatingFileHandler):
+    """
+    Rotates on a schedule and also when the file grows past `max_bytes`.
+    """
+
+    def __init__(self, filename: str, when: str, max_bytes: int, backup_count: int):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+
+    def rotation_filename(self, default_name: str) -> str:
+        # several size rollovers in one period would get the same name; a
+        # fixed-width time suffix keeps them unique and in order for cleanup
+        if os.path.exists(default_name):
+            return f"{default_name}.{datetime.now().strftime('%H%M%S%f')}"
+        return default_name
+
+
+def _pipeline(filename: str) -> str:
+    """
+    Set up the queue, file handler and listener for `filename` once, and
+    return the name of the logger they're attached to.
+    """
+    with _pipelines_lock:
+        if filename in _pipelines:
+            return _pipelines[filename][0]
 
-class Logger:
-    def __init__(self, filename="Swea_agent.log"):
         config = Config()
         logs_dir = config.get_logs_dir()
-        self.logger = LogInit(pathName=logs_dir + "/" + filename, console=True, colors=True, encoding="utf-8")
+        os.makedirs(logs_dir, exist_ok=True)
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [RotatingLogFileHandler(
+            os.path.join(logs_dir, filename),
+            when=config.get_logging_rotate_when(),
+            max_bytes=config.get_logging_max_bytes(),
+            backup_count=config.get_logging_backup_count(),
+        )]
+        if config.get_logging_console():
+            handlers.append(logging.StreamHandler(sys.stdout))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+        # the default file also gets the records of libraries using `logging`
+        if filename == DEFAULT_FILENAME:
+            name, target = "swea", logging.getLogger()
+        else:
+            name = f"swea-{os.path.splitext(filename)[0]}"
+            target = logging.getLogger(name)
+            target.propagate = False
+        target.addHandler(QueueHandler(records))
+
+        _pipelines[filename] = (name, handlers[0].baseFilename, listener)
+        if len(_pipelines) == 1:
+            config.subscribe(_on_config_change, "LOGGING")
+        return name
+
+
+def _channel_level(config: Config, channel: str) -> str:
+    return config.get_logging_channel_levels().get(channel, config.get_logging_level()).upper()
+
+
+def _on_config_change(changes: dict):
+    config = Config()
+    for channel, loggers in list(_channels.items()):
+        for channel_logger in loggers:
+            channel_logger.setLevel(_channel_level(config, channel))
+
+
+def _tail_start(file, size: int, lines: int) -> int:
+    """
+    Offset of the last `lines` complete lines, found by reading blocks
+    backwards from the end.
+    """
+    if lines <= 0:
+        return size
+
+    position, newlines = size, 0
+    while position > 0:
+        step = min(TAIL_BLOCK, position)
+        position -= step
+        file.seek(position)
+        block = file.read(step)
+        # the newline ending the last line doesn't start a line
+        if position + step == size and block.endswith(b"\n"):
+            block = block[:-1]
+        newlines += block.count(b"\n")
+        if newlines >= lines:
+            # the line start is after the (newlines - lines + 1)th newline of this block
+            index = -1
+            for _ in range(newlines - lines + 1):
+                index = block.index(b"\n", index + 1)
+            return position + index + 1
+    return 0
+
+
+class Logger:
+    def __init__(self, filename=DEFAULT_FILENAME, channel="swea"):
+        config = Config()
+        base = _pipeline(filename)
+        self.path = _pipelines[filename][1]
+        self.config = config
+
+        self.logger = logging.getLogger(base if channel == "swea" else f"{base}.{channel}")
+        self.logger.setLevel(_channel_level(config, channel))
+        with _pipelines_lock:
+            _channels.setdefault(channel, set()).add(self.logger)
+
+    @property
+    def max_length(self) -> int:
+        return self.config.get_logging_max_message_length()
 
     def read_log_file(self) -> str:
-        with open(self.logger.pathName, "r") as file:
+        with open(self.path, "r") as file:
             return file.read()
 
+    def tail(self, cursor: str = None, lines: int = 100) -> dict:
+        """
+        The lines written after `cursor`, or without one the last `lines`
+        lines, and the cursor to continue from. A cursor is "<inode>:<offset>",
+        so reading starts over at the top of a new file after rotation.
+        Reads never go through more than MAX_TAIL_BYTES.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {"logs": [], "cursor": None}
+
+        inode, _, offset = (cursor or "").partition(":")
+        if cursor and inode == str(stat.st_ino) and offset.isdigit() and int(offset) == stat.st_size:
+            return {"logs": [], "cursor": cursor}
+
+        with open(self.path, "rb") as file:
+            if not cursor:
+                start = _tail_start(file, stat.st_size, lines)
+            elif inode == str(stat.st_ino) and offset.isdigit() and int(offset) <= stat.st_size:
+                start = int(offset)
+            else:
+                start = 0
+
+            file.seek(start)
+            data = file.read(min(stat.st_size - start, MAX_TAIL_BYTES))
+
+        # only complete lines, unless a single line fills the whole read
+        end = data.rfind(b"\n") + 1
+        if not end and len(data) < MAX_TAIL_BYTES:
+            data = b""
+        elif end:
+            data = data[:end]
+
+        return {
+            "logs": data.decode("utf-8", errors="replace").splitlines(),
+            "cursor": f"{stat.st_ino}:{start + len(data)}",
+        }
+
+    def enabled(self, level: str) -> bool:
+        return self.logger.isEnabledFor(logging.getLevelName(level.upper()))
+
+    def _truncate(self, message) -> str:
+        message = str(message)
+        if self.max_length and len(message) > self.max_length:
+            return f"{message[:self.max_length]}... [{len(message) - self.max_length} more characters]"
+        return message
+
     def info(self, message: str):
-        self.logger.info(message)
-        self.logger.flush()
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(self._truncate(message))
 
     def error(self, message: str):
-        self.logger.error(message)
-        self.logger.flush()
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error(self._truncate(message))
 
     def warning(self, message: str):
-        self.logger.warning(message)
-        self.logger.flush()
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(self._truncate(message))
 
     def debug(self, message: str):
-        self.logger.debug(message)
-        self.logger.flush()
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(self._truncate(message))
 
     def exception(self, message: str):
-        self.logger.exception(message)
-        self.logger.flush()
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.exception(self._truncate(message))
 
 
 def route_logger(logger: Logger):
@@ -62,7 +258,7 @@ def route_logger(logger: Logger):
 
             # Log exit point, including response summary if possible
             try:
-                if log_enabled:
+                if log_enabled and logger.enabled("debug"):
                     if isinstance(response, Response) and response.direct_passthrough:
                         logger.debug(f"{request.path} {request.method} - Response: File response")
                     else:
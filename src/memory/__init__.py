@@ -1 +1,2 @@
-from .knowledge_base import KnowledgeBase
\ No newline at end of file
+from .knowledge_base import KnowledgeBase
+from .rag import VectorStore, get_vector_store
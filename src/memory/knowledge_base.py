@@ -1,16 +1,72 @@
+"""
+Stored knowledge, looked up by exact tag (indexed) or searched with BM25.
+
+Search uses an SQLite FTS5 index kept in sync with the knowledge table by
+triggers, so every add_knowledge is indexed incrementally. On SQLite builds
+without FTS5 the same BM25 (without stemming) is computed in-process over
+the stored rows.
+
+Research results are stored under their normalized query with where they came
+from and when, and are also found by query similarity (embeddings of the
+queries in the "knowledge" vector store).
+"""
+
+import re
+import math
+import time
 from typing import Optional
+from collections import Counter
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from sqlmodel import Field, Session, SQLModel, create_engine
 
 from src.config import Config
+from src.logger import Logger
+from src.memory.rag import get_vector_store
+
+TAG_WEIGHT = 2.0
+CONTENTS_WEIGHT = 1.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+FTS_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_tag ON knowledge (tag)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5("
+    "tag, contents, content='knowledge', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS knowledge_ai AFTER INSERT ON knowledge BEGIN "
+    "INSERT INTO knowledge_fts(rowid, tag, contents) VALUES (new.id, new.tag, new.contents); END",
+    "CREATE TRIGGER IF NOT EXISTS knowledge_ad AFTER DELETE ON knowledge BEGIN "
+    "INSERT INTO knowledge_fts(knowledge_fts, rowid, tag, contents) VALUES ('delete', old.id, old.tag, old.contents); END",
+    "CREATE TRIGGER IF NOT EXISTS knowledge_au AFTER UPDATE ON knowledge BEGIN "
+    "INSERT INTO knowledge_fts(knowledge_fts, rowid, tag, contents) VALUES ('delete', old.id, old.tag, old.contents); "
+    "INSERT INTO knowledge_fts(rowid, tag, contents) VALUES (new.id, new.tag, new.contents); END",
+]
+
+PROVENANCE_COLUMNS = {
+    "source_url": "VARCHAR",
+    "project": "VARCHAR",
+    "updated_at": "FLOAT",
+}
+
+logger = Logger()
+
+
+def tokenize(value: str) -> list:
+    return re.findall(r"\w+", value.lower())
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(tokenize(query))
 
-"""
-TODO: The tag check should be a BM25 search, it's just a simple equality check now.
-"""
 
 class Knowledge(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    tag: str
+    tag: str = Field(index=True)
     contents: str
+    source_url: Optional[str] = None
+    project: Optional[str] = None
+    updated_at: Optional[float] = None
 
 class KnowledgeBase:
     def __init__(self):
@@ -18,6 +74,30 @@ class KnowledgeBase:
         sqlite_path = config.get_sqlite_db()
         self.engine = create_engine(f"sqlite:///{sqlite_path}")
         SQLModel.metadata.create_all(self.engine)
+        self.fts = self._create_index()
+
+    def _create_index(self) -> bool:
+        with self.engine.begin() as connection:
+            # the tag index and provenance columns on databases created before them
+            connection.execute(text(FTS_SCHEMA[0]))
+            columns = {row[1] for row in connection.execute(text("PRAGMA table_info(knowledge)"))}
+            for column, column_type in PROVENANCE_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(text(f"ALTER TABLE knowledge ADD COLUMN {column} {column_type}"))
+
+        try:
+            with self.engine.begin() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_fts'")
+                ).first()
+                for statement in FTS_SCHEMA[1:]:
+                    connection.execute(text(statement))
+                if not exists:
+                    connection.execute(text("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild')"))
+            return True
+        except OperationalError:
+            # SQLite built without FTS5
+            return False
 
     def add_knowledge(self, tag: str, contents: str):
         knowledge = Knowledge(tag=tag, contents=contents)
@@ -30,4 +110,120 @@ class KnowledgeBase:
             knowledge = session.query(Knowledge).filter(Knowledge.tag == tag).first()
             if knowledge:
                 return knowledge.contents
-            return None
\ No newline at end of file
+            return None
+
+    def find_research(self, query: str, similarity_threshold: float) -> Optional[dict]:
+        """
+        The stored research for `query`: the entry under the same normalized
+        query, or else the one whose query is the most similar, if it is at
+        least `similarity_threshold` similar.
+        """
+        tag = normalize_query(query)
+        with Session(self.engine) as session:
+            knowledge = session.query(Knowledge).filter(
+                Knowledge.tag == tag, Knowledge.updated_at != None
+            ).order_by(Knowledge.updated_at.desc()).first()
+
+            if knowledge is None:
+                try:
+                    matches = get_vector_store("knowledge").search_text(tag, 1)
+                except Exception as e:
+                    logger.warning(f"Knowledge similarity search unavailable: {e}")
+                    matches = []
+                if matches and matches[0]["score"] >= similarity_threshold:
+                    knowledge = session.get(Knowledge, int(matches[0]["key"]))
+
+            if knowledge is None or knowledge.updated_at is None:
+                return None
+            return {
+                "id": knowledge.id,
+                "tag": knowledge.tag,
+                "contents": knowledge.contents,
+                "source_url": knowledge.source_url,
+                "project": knowledge.project,
+                "age": time.time() - knowledge.updated_at,
+            }
+
+    def save_research(self, query: str, contents: str, source_url: str = None, project: str = None):
+        """
+        Store (or refresh) the research result for `query`.
+        """
+        tag = normalize_query(query)
+        with Session(self.engine) as session:
+            knowledge = session.query(Knowledge).filter(
+                Knowledge.tag == tag, Knowledge.updated_at != None
+            ).first()
+            if knowledge is None:
+                knowledge = Knowledge(tag=tag, contents=contents)
+                session.add(knowledge)
+            knowledge.contents = contents
+            knowledge.source_url = source_url
+            knowledge.project = project
+            knowledge.updated_at = time.time()
+            session.commit()
+            knowledge_id = knowledge.id
+
+        try:
+            get_vector_store("knowledge").add_text(str(knowledge_id), tag, {"tag": tag})
+        except Exception as e:
+            logger.warning(f"Could not index research for '{tag}' by similarity: {e}")
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """
+        The `top_k` entries most relevant to `query` by BM25 (matches in the
+        tag weigh more), best first, as [{"id", "tag", "contents", "score"}].
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        if self.fts:
+            return self._search_fts(terms, top_k)
+        return self._search_bm25(terms, top_k)
+
+    def _search_fts(self, terms: list, top_k: int) -> list:
+        match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    "SELECT knowledge.id, knowledge.tag, knowledge.contents, "
+                    "bm25(knowledge_fts, :tag_weight, :contents_weight) AS rank "
+                    "FROM knowledge_fts JOIN knowledge ON knowledge.id = knowledge_fts.rowid "
+                    "WHERE knowledge_fts MATCH :match ORDER BY rank LIMIT :top_k"
+                ),
+                {"match": match, "tag_weight": TAG_WEIGHT, "contents_weight": CONTENTS_WEIGHT, "top_k": top_k},
+            ).all()
+        return [{"id": row[0], "tag": row[1], "contents": row[2], "score": -row[3]} for row in rows]
+
+    def _search_bm25(self, terms: list, top_k: int) -> list:
+        with Session(self.engine) as session:
+            entries = session.query(Knowledge).all()
+        if not entries:
+            return []
+
+        # the formula of FTS5's bm25(): idf over rows, the weighted count of
+        # the term over the columns, and the length of the whole row
+        documents = [
+            (Counter(tokenize(entry.tag)), Counter(tokenize(entry.contents)))
+            for entry in entries
+        ]
+        lengths = [sum(tag.values()) + sum(contents.values()) for tag, contents in documents]
+        average_length = (sum(lengths) / len(lengths)) or 1
+        scores = [0.0] * len(entries)
+
+        for term in set(terms):
+            hits = sum(1 for tag, contents in documents if tag[term] or contents[term])
+            if not hits:
+                continue
+            idf = math.log((len(documents) - hits + 0.5) / (hits + 0.5))
+            idf = idf if idf > 0 else 1e-6
+            for index, (tag, contents) in enumerate(documents):
+                frequency = TAG_WEIGHT * tag[term] + CONTENTS_WEIGHT * contents[term]
+                if frequency:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[index] / average_length)
+                    scores[index] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted((index for index, score in enumerate(scores) if score > 0), key=lambda index: -scores[index])
+        return [
+            {"id": entries[index].id, "tag": entries[index].tag, "contents": entries[index].contents, "score": scores[index]}
+            for index in ranked[:top_k]
+        ]
@@ -1,3 +1,409 @@
 """
 Vector Search for Code Docs + Docs Loading
-"""
\ No newline at end of file
+
+A local vector store: embeddings are kept in a memory-mapped NumPy array on
+disk (float32 or float16, one file per store), while keys, metadata and
+deletions are kept in side tables in the SQLite database.
+
+Stores with fewer than VECTOR_STORE.IVF_THRESHOLD live vectors are searched
+brute force, as one matrix product. Bigger ones get an IVF index: the vectors
+are clustered with k-means and a search only scores the clusters nearest to
+the query (IVF_PROBES of them). Deleted or replaced vectors are tombstoned,
+and the file is compacted once they make up COMPACT_RATIO of it.
+"""
+
+import os
+import math
+import json
+import glob
+import threading
+from typing import Optional
+
+import numpy as np
+from sqlmodel import Field, Session, SQLModel, create_engine
+
+from src.config import Config
+from src.bert.embeddings import get_embedding_backend
+
+MIN_CAPACITY = 1024
+SEARCH_CHUNK = 65536
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+
+
+class VectorStoreInfo(SQLModel, table=True):
+    __tablename__ = "vector_store"
+
+    name: str = Field(primary_key=True)
+    dimension: int
+    dtype: str
+    # vectors.<generation>.bin is the current file, bumped by compaction
+    generation: int = 0
+    # live vectors when the IVF index was last built, 0 if there is none
+    indexed: int = 0
+
+
+class VectorEntry(SQLModel, table=True):
+    __tablename__ = "vector_entry"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    store: str = Field(index=True)
+    key: str = Field(index=True)
+    row: int
+    metadata_json: str = "{}"
+    deleted: bool = False
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class VectorStore:
+    def __init__(self, name: str):
+        config = Config()
+        self.name = name
+        self.path = os.path.join(config.get_vectors_dir(), name)
+        self.ivf_threshold = config.get_vector_store_ivf_threshold()
+        self.ivf_probes = config.get_vector_store_ivf_probes()
+        self.compact_ratio = config.get_vector_store_compact_ratio()
+        self.default_dtype = config.get_vector_store_dtype()
+
+        self.engine = create_engine(f"sqlite:///{config.get_sqlite_db()}")
+        SQLModel.metadata.create_all(self.engine)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.lock = threading.RLock()
+        self.info = None
+        self.vectors = None
+        self.lists = None
+        self.centroids = None
+        self._inverted = None
+        self._load()
+
+    def _file(self, kind: str, generation: int = None) -> str:
+        generation = self.info.generation if generation is None else generation
+        return os.path.join(self.path, f"{kind}.{generation}.bin")
+
+    def _load(self):
+        with Session(self.engine) as session:
+            self.info = session.get(VectorStoreInfo, self.name)
+            entries = session.query(VectorEntry.row, VectorEntry.deleted).filter(VectorEntry.store == self.name).all()
+
+        self.count = max((row for row, _ in entries), default=-1) + 1
+        # rows without a live entry (deleted, or a write that didn't finish) are tombstones
+        self.deleted = np.ones(self.count, dtype=bool)
+        for row, deleted in entries:
+            if not deleted:
+                self.deleted[row] = False
+
+        if self.info is None:
+            return
+
+        for path in glob.glob(os.path.join(self.path, "*.bin")):
+            if path not in (self._file("vectors"), self._file("lists")):
+                os.remove(path)
+
+        self._map(self.count)
+        centroids_path = os.path.join(self.path, "centroids.npy")
+        if self.info.indexed and os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+
+    def _map(self, rows: int):
+        """
+        Memory-map the vector and IVF list files with room for `rows`, growing
+        them (doubling) when they're too small.
+        """
+        dtype = np.dtype(self.info.dtype)
+        row_size = self.info.dimension * dtype.itemsize
+        vectors_path, lists_path = self._file("vectors"), self._file("lists")
+
+        capacity = os.path.getsize(vectors_path) // row_size if os.path.exists(vectors_path) else 0
+        if rows > capacity or not capacity:
+            capacity = max(MIN_CAPACITY, capacity * 2, rows)
+            self._close()
+            with open(vectors_path, "ab") as f:
+                f.truncate(capacity * row_size)
+            old_size = os.path.getsize(lists_path) // 4 if os.path.exists(lists_path) else 0
+            with open(lists_path, "ab") as f:
+                f.truncate(capacity * 4)
+            if old_size < capacity:
+                lists = np.memmap(lists_path, dtype=np.int32, mode="r+", shape=(capacity,))
+                lists[old_size:] = -1
+                lists.flush()
+                del lists
+
+        if self.vectors is None or len(self.vectors) != capacity:
+            self._close()
+            self.vectors = np.memmap(vectors_path, dtype=dtype, mode="r+", shape=(capacity, self.info.dimension))
+            self.lists = np.memmap(lists_path, dtype=np.int32, mode="r+", shape=(capacity,))
+
+    def _close(self):
+        for array in (self.vectors, self.lists):
+            if array is not None:
+                array.flush()
+        self.vectors, self.lists = None, None
+
+    @property
+    def live(self) -> int:
+        return int(self.count - self.deleted.sum())
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def add(self, key: str, vector, metadata: dict = None):
+        self.add_many([key], [vector], [metadata])
+
+    def add_many(self, keys: list, vectors, metadatas: list = None):
+        """
+        Add vectors under `keys`, replacing the ones already stored under the
+        same keys.
+        """
+        if not keys:
+            return
+        metadatas = metadatas or [None] * len(keys)
+        vectors = normalize(np.asarray(vectors, dtype=np.float32).reshape(len(keys), -1))
+
+        # the last of repeated keys wins
+        latest = {key: index for index, key in enumerate(keys)}
+        indexes = sorted(latest.values())
+        keys = [keys[index] for index in indexes]
+        vectors = vectors[indexes]
+        metadatas = [metadatas[index] for index in indexes]
+
+        with self.lock:
+            with Session(self.engine) as session:
+                if self.info is None:
+                    self.info = VectorStoreInfo(name=self.name, dimension=vectors.shape[1], dtype=self.default_dtype)
+                    session.add(self.info)
+                    session.commit()
+                    session.refresh(self.info)
+                    session.expunge(self.info)
+                elif vectors.shape[1] != self.info.dimension:
+                    raise ValueError(f"Vector store {self.name} holds {self.info.dimension}-d vectors, got {vectors.shape[1]}-d")
+
+                start = self.count
+                self._map(start + len(keys))
+                self.vectors[start:start + len(keys)] = vectors
+                if self.centroids is not None:
+                    self.lists[start:start + len(keys)] = self._assign(vectors)
+                self.vectors.flush()
+                self.lists.flush()
+
+                replaced = session.query(VectorEntry).filter(
+                    VectorEntry.store == self.name,
+                    VectorEntry.key.in_(keys),
+                    VectorEntry.deleted == False,
+                ).all()
+                replaced_rows = [entry.row for entry in replaced]
+                for entry in replaced:
+                    entry.deleted = True
+                session.add_all([
+                    VectorEntry(store=self.name, key=key, row=start + offset, metadata_json=json.dumps(metadata or {}))
+                    for offset, (key, metadata) in enumerate(zip(keys, metadatas))
+                ])
+                session.commit()
+
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(keys), dtype=bool)])
+            self.deleted[replaced_rows] = True
+            self.count = start + len(keys)
+            self._inverted = None
+            self._maintain()
+
+    def delete(self, key: str) -> bool:
+        with self.lock:
+            with Session(self.engine) as session:
+                entries = session.query(VectorEntry).filter(
+                    VectorEntry.store == self.name,
+                    VectorEntry.key == key,
+                    VectorEntry.deleted == False,
+                ).all()
+                rows = [entry.row for entry in entries]
+                for entry in entries:
+                    entry.deleted = True
+                session.commit()
+
+            self.deleted[rows] = True
+            self._inverted = None
+            self._maintain()
+            return bool(rows)
+
+    def _maintain(self):
+        tombstones = self.count - self.live
+        if tombstones and tombstones >= self.compact_ratio * self.count:
+            self.compact()
+
+        # (re)build the index when the store crosses the threshold or doubles
+        if self.live >= self.ivf_threshold and (self.centroids is None or self.live >= 2 * self.info.indexed):
+            self.build_index()
+
+    def compact(self):
+        """
+        Rewrite the store without its tombstones into the next generation of
+        files.
+        """
+        with self.lock:
+            if self.info is None:
+                return
+            live_rows = np.flatnonzero(~self.deleted)
+            generation = self.info.generation + 1
+            dtype = np.dtype(self.info.dtype)
+            capacity = max(MIN_CAPACITY, len(live_rows))
+
+            vectors_path, lists_path = self._file("vectors", generation), self._file("lists", generation)
+            vectors = np.memmap(vectors_path, dtype=dtype, mode="w+", shape=(capacity, self.info.dimension))
+            lists = np.memmap(lists_path, dtype=np.int32, mode="w+", shape=(capacity,))
+            lists[:] = -1
+            for start in range(0, len(live_rows), SEARCH_CHUNK):
+                rows = live_rows[start:start + SEARCH_CHUNK]
+                vectors[start:start + len(rows)] = self.vectors[rows]
+                lists[start:start + len(rows)] = self.lists[rows]
+            vectors.flush()
+            lists.flush()
+            del vectors, lists
+
+            new_rows = {int(row): index for index, row in enumerate(live_rows)}
+            with Session(self.engine) as session:
+                for entry in session.query(VectorEntry).filter(VectorEntry.store == self.name).all():
+                    if entry.deleted or entry.row not in new_rows:
+                        session.delete(entry)
+                    else:
+                        entry.row = new_rows[entry.row]
+                info = session.get(VectorStoreInfo, self.name)
+                info.generation = generation
+                session.commit()
+
+            old_files = (self._file("vectors"), self._file("lists"))
+            self._close()
+            self.info.generation = generation
+            for path in old_files:
+                os.remove(path)
+
+            self.count = len(live_rows)
+            self.deleted = np.zeros(self.count, dtype=bool)
+            self._inverted = None
+            self._map(self.count)
+
+    def build_index(self):
+        """
+        Cluster the live vectors with spherical k-means (sqrt(n) lists) and
+        assign every vector to its nearest list.
+        """
+        with self.lock:
+            live_rows = np.flatnonzero(~self.deleted)
+            if not len(live_rows):
+                return
+
+            random = np.random.default_rng(0)
+            sample = np.sort(random.choice(live_rows, min(KMEANS_SAMPLE, len(live_rows)), replace=False))
+            data = np.asarray(self.vectors[sample], dtype=np.float32)
+            lists_count = max(1, int(math.sqrt(len(live_rows))))
+            centroids = data[random.choice(len(data), min(lists_count, len(data)), replace=False)]
+
+            for _ in range(KMEANS_ITERATIONS):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, data)
+                empty = ~sums.any(axis=1)
+                sums[empty] = centroids[empty]
+                centroids = normalize(sums)
+
+            self.centroids = centroids
+            for start in range(0, len(live_rows), SEARCH_CHUNK):
+                rows = live_rows[start:start + SEARCH_CHUNK]
+                self.lists[rows] = self._assign(np.asarray(self.vectors[rows], dtype=np.float32))
+            self.lists.flush()
+
+            centroids_path = os.path.join(self.path, "centroids.npy")
+            with open(f"{centroids_path}.tmp", "wb") as f:
+                np.save(f, centroids)
+            os.replace(f"{centroids_path}.tmp", centroids_path)
+
+            with Session(self.engine) as session:
+                info = session.get(VectorStoreInfo, self.name)
+                info.indexed = len(live_rows)
+                session.commit()
+            self.info.indexed = len(live_rows)
+            self._inverted = None
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        if self._inverted is None:
+            lists = np.where(self.deleted, -1, self.lists[:self.count])
+            order = np.argsort(lists, kind="stable")
+            bounds = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1))
+            self._inverted = (order, bounds)
+
+        order, bounds = self._inverted
+        probes = np.argsort(-(self.centroids @ query))[:self.ivf_probes]
+        return np.sort(np.concatenate([order[bounds[probe]:bounds[probe + 1]] for probe in probes]))
+
+    def search(self, vector, top_k: int = 5) -> list:
+        """
+        The `top_k` stored vectors most similar to `vector` (cosine), best
+        first, as [{"key", "score", "metadata"}].
+        """
+        query = normalize(np.asarray(vector, dtype=np.float32).reshape(-1))
+
+        with self.lock:
+            if self.info is None or not self.live:
+                return []
+            if query.shape[0] != self.info.dimension:
+                raise ValueError(f"Vector store {self.name} holds {self.info.dimension}-d vectors, got {query.shape[0]}-d")
+
+            if self.centroids is not None and self.live >= self.ivf_threshold:
+                rows = self._candidates(query)
+                scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            else:
+                rows = np.arange(self.count)
+                scores = np.concatenate([
+                    np.asarray(self.vectors[start:min(start + SEARCH_CHUNK, self.count)], dtype=np.float32) @ query
+                    for start in range(0, self.count, SEARCH_CHUNK)
+                ])
+                scores[self.deleted] = -np.inf
+
+            if not len(scores):
+                return []
+            top_k = min(top_k, len(scores))
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best])]
+            best = best[np.isfinite(scores[best])]
+            results = [(int(rows[index]), float(scores[index])) for index in best]
+
+        with Session(self.engine) as session:
+            entries = session.query(VectorEntry).filter(
+                VectorEntry.store == self.name,
+                VectorEntry.row.in_([row for row, _ in results]),
+                VectorEntry.deleted == False,
+            ).all()
+        by_row = {entry.row: entry for entry in entries}
+
+        return [
+            {"key": by_row[row].key, "score": score, "metadata": json.loads(by_row[row].metadata_json)}
+            for row, score in results
+            if row in by_row
+        ]
+
+    def add_text(self, key: str, text: str, metadata: dict = None):
+        self.add_many([key], get_embedding_backend().embed([text]), [metadata])
+
+    def add_texts(self, keys: list, texts: list, metadatas: list = None):
+        self.add_many(keys, get_embedding_backend().embed(texts), metadatas)
+
+    def search_text(self, query: str, top_k: int = 5) -> list:
+        return self.search(get_embedding_backend().embed([query])[0], top_k)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(name: str) -> VectorStore:
+    """
+    The process-wide store `name`; every user of a store shares the same
+    mapped files.
+    """
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = VectorStore(name)
+        return _stores[name]
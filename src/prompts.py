@@ -0,0 +1,76 @@
+"""
+Central registry for the agents' Jinja2 prompt templates.
+
+Templates are loaded from the package directory (not the working directory)
+and compiled once by a shared Environment, with the compiled bytecode cached
+on disk across restarts. With hot reload on, edited templates are picked up
+without a restart.
+"""
+
+import os
+import time
+import threading
+
+import tiktoken
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+from src.config import Config
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents")
+
+TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+
+
+class PromptRegistry:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._load_environment()
+        return cls._instance
+
+    def _load_environment(self):
+        config = Config()
+        cache_dir = os.path.join(config.get_cache_dir(), "templates")
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.hot_reload = config.get_prompts_hot_reload()
+        self.env = Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+            auto_reload=self.hot_reload,
+            cache_size=-1,
+        )
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def render(self, name: str, **context) -> str:
+        """
+        Render the template at `name` (relative to src/agents), e.g.
+        "coder/prompt.jinja2", and record its render time and token count.
+        """
+        start_time = time.perf_counter()
+        prompt = self.env.get_template(name).render(**context).strip()
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        tokens = len(TIKTOKEN_ENC.encode(prompt))
+
+        with self._lock:
+            stats = self.stats.setdefault(name, {
+                "renders": 0,
+                "total_ms": 0.0,
+                "last_ms": 0.0,
+                "total_tokens": 0,
+                "last_tokens": 0,
+            })
+            stats["renders"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["last_ms"] = elapsed_ms
+            stats["total_tokens"] += tokens
+            stats["last_tokens"] = tokens
+
+        return prompt
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
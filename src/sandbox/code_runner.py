@@ -0,0 +1,244 @@
+"""
+Runs the commands the Runner agent comes up with.
+
+Output (stdout and stderr) is streamed line by line into the terminal session
+of the agent state at a throttled rate. Commands are killed, with their whole
+process group, when they run past the wall-clock timeout or go quiet for
+longer than the idle timeout. Long-running servers are detected by a
+readiness log line or an open port and handed off to the background instead
+of being waited on. With sandboxing enabled, commands run in a warm worker
+from the SandboxPool instead of directly on the host.
+"""
+
+import os
+import re
+import shlex
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+from src.config import Config
+from src.logger import Logger
+from src.state import AgentState
+from src.sandbox.pool import SandboxPool, WorkerExecution
+
+SHELL_OPERATORS = re.compile(r"&&|\|\||[|;<>`$]")
+
+# only lines a server prints once it accepts connections: one-shot builds
+# (npm run build, webpack) also print "compiled successfully" and must be
+# waited on for their exit code
+READY_PATTERN = re.compile(
+    r"listening (on|at)|running (on|at)|serving (http )?on|server (is )?(running|started|listening)|ready in|"
+    r"local:\s+https?://|started server on|development server at|"
+    r"application startup complete",
+    re.IGNORECASE,
+)
+PORT_PATTERN = re.compile(r"(?:https?://)?(?:localhost|127\.0\.0\.1|0\.0\.0\.0|\[::\]|port)[:\s]+(\d{2,5})\b", re.IGNORECASE)
+
+MAX_OUTPUT_CHARS = 50000
+POLL_INTERVAL = 0.1
+
+_background = {}
+_background_lock = threading.Lock()
+
+
+def split_command(command: str) -> list:
+    """
+    Commands using shell syntax (&&, pipes, redirects, variables) go through
+    the shell, everything else is split with shell quoting rules.
+    """
+    if SHELL_OPERATORS.search(command):
+        if os.name == "nt":
+            return ["cmd", "/c", command]
+        return ["/bin/sh", "-c", command]
+    return shlex.split(command, posix=os.name != "nt")
+
+
+def kill_process_group(process: subprocess.Popen, grace_period: float = 3):
+    if process.poll() is not None:
+        return
+
+    if os.name == "nt":
+        process.kill()
+        return
+
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def get_background_processes(project_name: str) -> list:
+    with _background_lock:
+        return [entry for entry in _background.get(project_name, []) if entry["process"].poll() is None]
+
+
+def stop_background_processes(project_name: str):
+    with _background_lock:
+        entries = _background.pop(project_name, [])
+    for entry in entries:
+        kill_process_group(entry["process"])
+        if isinstance(entry["process"], WorkerExecution):
+            # the worker isn't going back to the pool, remove it and its cgroup
+            entry["process"].worker.stop()
+
+
+def _port_open(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+class CodeRunner:
+    def __init__(self, project_name: str, project_path: str, env: dict = None):
+        config = Config()
+        self.timeout = config.get_runner_timeout()
+        self.idle_timeout = config.get_runner_idle_timeout()
+        self.output_interval = config.get_runner_output_interval()
+
+        self.project_name = project_name
+        self.project_path = project_path
+        self.env = {"PYTHONUNBUFFERED": "1", **(env or {})}
+        self.sandbox = SandboxPool.enabled()
+        self.logger = Logger()
+
+    def popen(self, command: str) -> subprocess.Popen:
+        if self.sandbox:
+            return SandboxPool().execute(command, self.project_path, self.env)
+
+        env = os.environ.copy()
+        env.update(self.env)
+
+        return subprocess.Popen(
+            split_command(command),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            cwd=self.project_path,
+            env=env,
+            start_new_session=os.name != "nt",
+        )
+
+    def run(self, command: str) -> dict:
+        """
+        Run `command` in the project directory and return:
+
+        {
+            "command", "output", "returncode",
+            "timed_out",   # killed by the wall-clock or idle timeout
+            "background",  # a server that was handed off while still running
+            "duration"
+        }
+        """
+        agent_state = AgentState()
+        state = agent_state.new_state()
+        state["internal_monologue"] = "Running code..."
+        state["terminal_session"]["title"] = "Terminal"
+        state["terminal_session"]["command"] = command
+        state["terminal_session"]["output"] = ""
+        agent_state.add_to_current_state(self.project_name, state)
+
+        result = {
+            "command": command,
+            "output": "",
+            "returncode": None,
+            "timed_out": False,
+            "background": False,
+            "duration": 0.0,
+        }
+        start_time = time.time()
+
+        try:
+            process = self.popen(command)
+        except (OSError, ValueError) as e:
+            result["output"] = str(e)
+            result["returncode"] = 127
+            state["terminal_session"]["output"] = result["output"]
+            agent_state.update_state(self.project_name, state)
+            return result
+
+        lines = []
+        activity = {"last_output": time.time(), "lines": 0, "ready": False, "ports": set()}
+
+        def read_output():
+            for raw_line in iter(process.stdout.readline, b""):
+                line = raw_line.decode("utf-8", errors="replace")
+                lines.append(line)
+                if len(lines) > 2000:
+                    del lines[:1000]
+                activity["last_output"] = time.time()
+                activity["lines"] += 1
+                if READY_PATTERN.search(line):
+                    activity["ready"] = True
+                for port in PORT_PATTERN.findall(line):
+                    activity["ports"].add(int(port))
+            process.stdout.close()
+
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+
+        seen_ports, watched_ports = set(), set()
+        last_update, shown_lines = 0.0, 0
+        while True:
+            now = time.time()
+
+            if process.poll() is not None:
+                reader.join(timeout=1)
+                result["returncode"] = process.returncode
+                break
+
+            if now - start_time > self.timeout:
+                self.logger.warning(f"Command timed out after {self.timeout}s: {command}")
+                result["timed_out"] = True
+                break
+
+            if now - activity["last_output"] > self.idle_timeout:
+                self.logger.warning(f"Command produced no output for {self.idle_timeout}s: {command}")
+                result["timed_out"] = True
+                break
+
+            for port in activity["ports"] - seen_ports:
+                # ports that are already taken when first mentioned belong to something else
+                seen_ports.add(port)
+                if not _port_open(port):
+                    watched_ports.add(port)
+
+            if activity["ready"] or any(_port_open(port) for port in watched_ports):
+                result["background"] = True
+                break
+
+            if now - last_update >= self.output_interval and activity["lines"] != shown_lines:
+                shown_lines = activity["lines"]
+                state["terminal_session"]["output"] = "".join(lines)[-MAX_OUTPUT_CHARS:]
+                agent_state.update_state(self.project_name, state)
+                last_update = now
+
+            time.sleep(POLL_INTERVAL)
+
+        if result["timed_out"]:
+            kill_process_group(process)
+            reader.join(timeout=1)
+            lines.append(f"\n[Process killed: no exit after {int(time.time() - start_time)}s]\n")
+        elif result["background"]:
+            with _background_lock:
+                _background.setdefault(self.project_name, []).append({
+                    "command": command,
+                    "process": process,
+                    "ports": sorted(activity["ports"]),
+                })
+            lines.append("\n[Server is up, left running in the background]\n")
+
+        result["output"] = "".join(lines)[-MAX_OUTPUT_CHARS:]
+        result["duration"] = time.time() - start_time
+
+        state["terminal_session"]["output"] = result["output"]
+        agent_state.update_state(self.project_name, state)
+
+        return result
@@ -0,0 +1,234 @@
+"""
+Isolation backends for sandbox workers.
+
+- "firejail": seccomp, no new privileges, private /tmp and only the worker's
+  project and the package managers' caches whitelisted from the host
+  filesystem
+- "unshare": new user, mount, pid, ipc and uts namespaces (no root needed),
+  chrooted into a tmpfs that holds the system and runtime directories
+  read-only and the project and caches read-write
+
+Memory and CPU are capped with a cgroup (v2) per worker when the cgroup tree
+is writable. Otherwise memory is capped with RLIMIT_DATA, which unlike the
+address space limit doesn't count the address space Node, Go and the JVM
+reserve without using. CPU time is always capped with RLIMIT_CPU.
+"""
+
+import os
+import time
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from src.logger import Logger
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+CGROUP_PERIOD = 100000
+CGROUP_REMOVE_ATTEMPTS = 20
+
+# read-only in the unshare backend's root, with the install prefixes of the
+# runtimes on the PATH (pyenv, nvm, ...) that live outside of them
+SYSTEM_DIRS = ["/usr", "/bin", "/sbin", "/lib", "/lib32", "/lib64", "/libx32", "/etc", "/opt"]
+RUNTIME_BINARIES = ["python3", "node", "go", "java", "cargo", "ruby"]
+
+# sh -c script that builds the root: <root> ro:<dir>... rw:<dir>... -- <command>
+UNSHARE_ROOT_SETUP = """
+set -e
+root=$1
+shift
+mount -t tmpfs -o mode=755 swea-root "$root"
+mkdir -p "$root/proc" "$root/tmp"
+mount -t proc proc "$root/proc"
+mount -t tmpfs -o mode=1777 tmpfs "$root/tmp"
+bind() { mkdir -p "$root$1"; mount --rbind "$1" "$root$1"; }
+bind /dev
+while [ "$1" != "--" ]; do
+    case "$1" in
+        ro:*) bind "${1#ro:}"; mount -o remount,bind,ro "$root${1#ro:}" ;;
+        rw:*) bind "${1#rw:}" ;;
+    esac
+    shift
+done
+shift
+exec chroot "$root" "$@"
+"""
+
+logger = Logger()
+
+_available = {}
+_available_lock = threading.Lock()
+
+
+def _probe_unshare() -> bool:
+    if not all(shutil.which(binary) for binary in ("unshare", "mount", "chroot")):
+        return False
+
+    root = tempfile.mkdtemp(prefix="swea-root-")
+    try:
+        result = subprocess.run(
+            sandbox_prefix("unshare", [], 10, root=root) + ["/bin/sh", "-c", "true"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"unshare sandbox unavailable: {e}")
+        return False
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if result.returncode != 0:
+        logger.debug(f"unshare sandbox unavailable: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.returncode == 0
+
+
+def sandbox_available(backend: str) -> bool:
+    """
+    Whether the backend can start a worker here. For unshare that means
+    unprivileged user namespaces that are allowed to mount and chroot, which
+    is checked once by starting an empty sandbox.
+    """
+    if backend == "firejail":
+        return shutil.which("firejail") is not None
+
+    with _available_lock:
+        if backend not in _available:
+            _available[backend] = backend == "unshare" and _probe_unshare()
+        return _available[backend]
+
+
+def runtime_dirs() -> list:
+    """
+    The install prefixes of the runtimes on the PATH that aren't under the
+    system directories, e.g. ~/.pyenv for a pyenv shim.
+    """
+    dirs = []
+    for binary in RUNTIME_BINARIES:
+        path = shutil.which(binary)
+        if not path:
+            continue
+        prefix = os.path.dirname(os.path.dirname(os.path.realpath(path)))
+        if prefix != "/" and not any(prefix == root or prefix.startswith(root + "/") for root in SYSTEM_DIRS):
+            dirs.append(prefix)
+    return sorted(set(dirs))
+
+
+def sandbox_prefix(backend: str, shared_dirs: list, cpu_time: int, memory_mb: int = None, root: str = None) -> list:
+    """
+    The command prefix that starts a process inside the sandbox, with only
+    `shared_dirs` (the worker's project and the caches) writable from the
+    host. `memory_mb` caps memory with RLIMIT_DATA and is only given when no
+    cgroup does. The unshare backend builds its filesystem in `root`, an
+    empty directory the caller removes once the worker has exited.
+    """
+    shared_dirs = [os.path.abspath(path) for path in shared_dirs]
+
+    data = [f"--data={memory_mb * 1024 * 1024}"] if memory_mb else []
+    prlimit = shutil.which("prlimit") is not None
+
+    if backend == "firejail":
+        return (["prlimit", *data, "--"] if data and prlimit else []) + [
+            "firejail",
+            "--quiet",
+            "--noprofile",
+            "--nonewprivs",
+            "--seccomp",
+            "--nogroups",
+            "--private-tmp",
+            *[f"--whitelist={path}" for path in shared_dirs],
+            f"--rlimit-cpu={cpu_time}",
+            "--",
+        ]
+
+    if backend == "unshare":
+        if root is None:
+            raise ValueError("The unshare sandbox needs a root directory")
+        readonly = [path for path in SYSTEM_DIRS + runtime_dirs() if os.path.isdir(path)]
+        return (["prlimit", f"--cpu={cpu_time}", *data, "--"] if prlimit else []) + [
+            "unshare",
+            "--user",
+            "--map-root-user",
+            "--mount",
+            "--pid",
+            "--fork",
+            "--kill-child",
+            "--ipc",
+            "--uts",
+            "--",
+            "/bin/sh",
+            "-c",
+            UNSHARE_ROOT_SETUP,
+            "swea-sandbox",
+            root,
+            *[f"ro:{path}" for path in readonly],
+            *[f"rw:{path}" for path in shared_dirs],
+            "--",
+        ]
+
+    raise ValueError(f"Unknown sandbox backend: {backend}")
+
+
+class Cgroup:
+    def __init__(self, name: str, memory_mb: int, cpu_limit: float):
+        self.parent = os.path.join(CGROUP_ROOT, "swea")
+        self.path = os.path.join(self.parent, name)
+        self.memory_mb = memory_mb
+        self.cpu_limit = cpu_limit
+        self.active = False
+
+    @staticmethod
+    def _write(path: str, value: str):
+        with open(path, "w") as f:
+            f.write(value)
+
+    def create(self) -> bool:
+        """
+        Create the cgroup with its limits. Returns False (and the worker's
+        memory is capped with an rlimit instead) when cgroups v2 isn't
+        available or writable.
+        """
+        try:
+            os.makedirs(self.parent, exist_ok=True)
+            try:
+                self._write(os.path.join(self.parent, "cgroup.subtree_control"), "+memory +cpu")
+            except OSError:
+                pass  # already enabled, or delegated without controller access
+            os.makedirs(self.path, exist_ok=True)
+            self._write(os.path.join(self.path, "memory.max"), str(self.memory_mb * 1024 * 1024))
+            self._write(os.path.join(self.path, "cpu.max"), f"{int(self.cpu_limit * CGROUP_PERIOD)} {CGROUP_PERIOD}")
+        except OSError as e:
+            logger.debug(f"Sandbox cgroup limits unavailable, using rlimits only: {e}")
+            return False
+
+        self.active = True
+        return True
+
+    def add(self, pid: int):
+        if self.active:
+            try:
+                self._write(os.path.join(self.path, "cgroup.procs"), str(pid))
+            except OSError as e:
+                logger.debug(f"Could not move {pid} into {self.path}: {e}")
+
+    def remove(self):
+        if not self.active:
+            return
+        self.active = False
+
+        # processes that left the worker's process group (daemons, servers)
+        # would keep the cgroup alive
+        try:
+            self._write(os.path.join(self.path, "cgroup.kill"), "1")
+        except OSError:
+            pass  # kernels before 5.14
+        for _ in range(CGROUP_REMOVE_ATTEMPTS):
+            try:
+                os.rmdir(self.path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.05)  # processes still exiting
+        logger.debug(f"Could not remove {self.path}, processes are still running in it")
@@ -0,0 +1,298 @@
+"""
+Pool of warm, sandboxed shells the Runner's commands are executed in.
+
+Starting firejail (or new namespaces) costs far more than most commands, so
+each runtime keeps a few sandboxed shells started ahead of time. A command is
+written to an idle shell's stdin, its output is read back until an exit
+marker, and the shell goes back to the pool. Shells are replaced after a
+number of commands, and whenever they die (timeouts kill the whole shell).
+
+A shell only sees the project it was started for (and the package managers'
+caches), so the pool keeps its idle shells per runtime and project.
+"""
+
+import os
+import re
+import shlex
+import signal
+import shutil
+import uuid
+import tempfile
+import subprocess
+import threading
+
+from src.config import Config
+from src.logger import Logger
+from src.sandbox.firejail import Cgroup, sandbox_available, sandbox_prefix
+
+RUNTIME_PATTERNS = [
+    (re.compile(r"^(cd\s+\S+\s*&&\s*)?(python3?|pip3?|poetry|pipenv|uv|flask|uvicorn|gunicorn|pytest|streamlit)\b"), "python"),
+    (re.compile(r"^(cd\s+\S+\s*&&\s*)?(node|npm|npx|yarn|pnpm|bun|deno|tsc)\b"), "node"),
+]
+# the download caches shared by every project (see shared_cache_env)
+SHARED_CACHES = ["pip", "npm", "yarn", "pnpm"]
+RUNTIME_WARMUP = {
+    "python": "python3 -c '' 2>/dev/null",
+    "node": "node -e '' 2>/dev/null",
+    "default": "true",
+}
+
+logger = Logger()
+
+
+def detect_runtime(command: str) -> str:
+    for pattern, runtime in RUNTIME_PATTERNS:
+        if pattern.match(command.strip()):
+            return runtime
+    return "default"
+
+
+class SandboxWorker:
+    def __init__(self, runtime: str, project_path: str, prefix: list, cgroup: Cgroup, root: str = None):
+        self.runtime = runtime
+        self.project_path = project_path
+        self.cgroup = cgroup
+        self.root = root
+        self.uses = 0
+        self.process = subprocess.Popen(
+            prefix + ["/bin/sh"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        self.cgroup.add(self.process.pid)
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def warm_up(self) -> bool:
+        """
+        Run the runtime's no-op command so the sandbox, the interpreter and
+        its shared libraries are loaded before the first real command.
+        """
+        execution = self.execute(RUNTIME_WARMUP[self.runtime], "/", {}, pooled=False)
+        for _ in iter(execution.stdout.readline, b""):
+            pass
+        self.uses = 0
+        return execution.returncode is not None and self.alive()
+
+    def execute(self, command: str, cwd: str, env: dict, pooled: bool = True) -> "WorkerExecution":
+        marker = f"__SWEA_EXIT_{uuid.uuid4().hex}__"
+        exports = "".join(f"export {key}={shlex.quote(value)}; " for key, value in env.items())
+        # the marker goes on a line of its own even when the output doesn't end
+        # with a newline; WorkerExecution takes the extra newline out again
+        script = f"cd {shlex.quote(cwd)} && ( {exports}{command}\n) < /dev/null 2>&1; printf '\\n%s %d\\n' \"{marker}\" $?\n"
+
+        self.uses += 1
+        self.process.stdin.write(script.encode("utf-8"))
+        self.process.stdin.flush()
+        return WorkerExecution(self, marker, pooled)
+
+    def stop(self):
+        if self.alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+        self.cgroup.remove()
+        if self.root:
+            # the tmpfs mounted on it went away with the worker's namespace
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+class WorkerExecution:
+    """
+    One command running in a worker. Looks enough like a subprocess.Popen
+    (stdout.readline, poll, wait, pid) for the CodeRunner to treat it as one;
+    killing its process group kills the worker, which is then replaced.
+    """
+
+    def __init__(self, worker: SandboxWorker, marker: str, pooled: bool = True):
+        self.worker = worker
+        self.marker = marker.encode("utf-8")
+        self.pooled = pooled
+        self.pid = worker.pid
+        self.returncode = None
+        self.stdout = self
+        self._newline = b""
+
+    def readline(self) -> bytes:
+        # a line goes out right away (a server's readiness line must be seen
+        # while it runs) but its newline only with the next one: the last
+        # newline before the marker was printed with the marker
+        while self.returncode is None:
+            line = self.worker.process.stdout.readline()
+            if not line:
+                self.worker.stop()
+                self.returncode = self.worker.process.returncode
+                break
+
+            if line.startswith(self.marker):
+                self.returncode = int(line.split()[1])
+                self._newline = b""
+                if self.pooled:
+                    SandboxPool().release(self.worker)
+                break
+
+            output = self._newline + line.rstrip(b"\n")
+            self._newline = b"\n" if line.endswith(b"\n") else b""
+            if output:
+                return output
+
+        newline, self._newline = self._newline, b""
+        return newline
+
+    def close(self):
+        pass
+
+    def poll(self):
+        if self.returncode is None and not self.worker.alive():
+            self.returncode = self.worker.process.returncode
+        return self.returncode
+
+    def wait(self, timeout: float = None) -> int:
+        if self.returncode is None:
+            self.returncode = self.worker.process.wait(timeout=timeout)
+        return self.returncode
+
+
+class SandboxPool:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._load()
+        return cls._instance
+
+    def _load(self):
+        config = Config()
+        self.backend = config.get_sandbox_backend()
+        self.size = config.get_sandbox_pool_size()
+        self.max_uses = config.get_sandbox_max_uses()
+        self.memory_mb = config.get_sandbox_memory_limit()
+        self.cpu_limit = config.get_sandbox_cpu_limit()
+        self.cpu_time = config.get_sandbox_cpu_time_limit()
+        self.caches = [os.path.abspath(os.path.join(config.get_cache_dir(), cache)) for cache in SHARED_CACHES]
+
+        self.idle = {}
+        self._lock = threading.Lock()
+        self._filling = set()
+
+    @staticmethod
+    def enabled() -> bool:
+        config = Config()
+        if not config.get_sandbox_enabled():
+            return False
+        if not sandbox_available(config.get_sandbox_backend()):
+            logger.warning(f"Sandboxing is enabled but {config.get_sandbox_backend()} is not available here, running on the host")
+            return False
+        return True
+
+    def _spawn(self, runtime: str, project_path: str) -> SandboxWorker:
+        cgroup = Cgroup(f"worker-{uuid.uuid4().hex[:12]}", self.memory_mb, self.cpu_limit)
+        cgroup.create()
+        for cache in self.caches:
+            os.makedirs(cache, exist_ok=True)
+
+        root = tempfile.mkdtemp(prefix="swea-root-") if self.backend == "unshare" else None
+        prefix = sandbox_prefix(
+            self.backend,
+            [project_path, *self.caches],
+            self.cpu_time,
+            # the cgroup caps memory when there is one
+            memory_mb=None if cgroup.active else self.memory_mb,
+            root=root,
+        )
+        try:
+            return SandboxWorker(runtime, project_path, prefix, cgroup, root)
+        except OSError:
+            cgroup.remove()
+            if root:
+                shutil.rmtree(root, ignore_errors=True)
+            raise
+
+    def _fill(self, key: tuple):
+        runtime, project_path = key
+        try:
+            while True:
+                with self._lock:
+                    if len(self.idle.setdefault(key, [])) >= self.size:
+                        return
+                try:
+                    worker = self._spawn(runtime, project_path)
+                except OSError as e:
+                    logger.warning(f"Sandbox worker for {runtime} failed to start: {e}")
+                    return
+                if not worker.warm_up():
+                    logger.warning(f"Sandbox worker for {runtime} failed to start")
+                    worker.stop()
+                    return
+                with self._lock:
+                    if len(self.idle[key]) < self.size:
+                        self.idle[key].append(worker)
+                        continue
+                worker.stop()
+                return
+        finally:
+            with self._lock:
+                self._filling.discard(key)
+
+    def warm(self, project_path: str, runtimes: list = None):
+        """
+        Top up the idle workers of each runtime for the project in the
+        background.
+        """
+        project_path = os.path.abspath(project_path)
+        for runtime in runtimes or RUNTIME_WARMUP.keys():
+            key = (runtime, project_path)
+            with self._lock:
+                if key in self._filling:
+                    continue
+                self._filling.add(key)
+            threading.Thread(target=self._fill, args=(key,), daemon=True).start()
+
+    def acquire(self, runtime: str, project_path: str) -> SandboxWorker:
+        project_path = os.path.abspath(project_path)
+        worker = None
+        with self._lock:
+            idle = self.idle.setdefault((runtime, project_path), [])
+            while idle and worker is None:
+                candidate = idle.pop()
+                if candidate.alive():
+                    worker = candidate
+                else:
+                    candidate.stop()
+
+        self.warm(project_path, [runtime])
+        return worker or self._spawn(runtime, project_path)
+
+    def release(self, worker: SandboxWorker):
+        with self._lock:
+            idle = self.idle.setdefault((worker.runtime, worker.project_path), [])
+            if worker.alive() and worker.uses < self.max_uses and len(idle) < self.size:
+                idle.append(worker)
+                return
+        worker.stop()
+        self.warm(worker.project_path, [worker.runtime])
+
+    def execute(self, command: str, cwd: str, env: dict) -> WorkerExecution:
+        """
+        Run `command` in `cwd`, the project directory the worker is confined
+        to.
+        """
+        worker = self.acquire(detect_runtime(command), cwd)
+        return worker.execute(command, os.path.abspath(cwd), env)
+
+    def shutdown(self):
+        with self._lock:
+            workers = [worker for idle in self.idle.values() for worker in idle]
+            self.idle = {}
+        for worker in workers:
+            worker.stop()
@@ -1,16 +1,207 @@
+"""
+Headless Chromium shared by every page the agents open.
+
+A few Chromium instances are launched once and kept running on their own
+event loop thread. Every Browser gets a context (cookies, cache and storage)
+from the pool instead of a new Chromium, and contexts are cleaned up and
+reused for a number of pages before being replaced. Text-only contexts don't
+load images, fonts or media.
+"""
+
+import os
+import atexit
+import base64
+import asyncio
+import threading
+
+from playwright.async_api import async_playwright, TimeoutError
+
+from src.config import Config
+from src.logger import Logger
+from src.state import AgentState
+
+BLOCKED_RESOURCES = {"image", "font", "media"}
+
+logger = Logger()
+
+
+class BrowserPool:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._start()
+        return cls._instance
+
+    def _start(self):
+        config = Config()
+        self.size = config.get_browser_pool_size()
+        self.contexts_per_browser = config.get_browser_contexts_per_browser()
+        self.max_context_uses = config.get_browser_max_context_uses()
+        self.navigation_timeout = config.get_browser_navigation_timeout() * 1000
+
+        self.playwright = None
+        self.browsers = []
+        self.idle_contexts = {True: [], False: []}
+        self.context_uses = {}
+        self.semaphore = None
+        self.launch_lock = None
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="browser-pool", daemon=True).start()
+        atexit.register(self.shutdown)
+
+    def call(self, coroutine):
+        """
+        Run `coroutine` on the pool's event loop and return an awaitable for
+        the caller's loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        return asyncio.wrap_future(future)
+
+    async def _ensure_browsers(self):
+        if self.launch_lock is None:
+            self.launch_lock = asyncio.Lock()
+            self.semaphore = asyncio.Semaphore(self.size * self.contexts_per_browser)
+
+        async with self.launch_lock:
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+
+            self.browsers = [browser for browser in self.browsers if browser.is_connected()]
+            while len(self.browsers) < self.size:
+                self.browsers.append(await self.playwright.chromium.launch(headless=True))
+
+    async def _new_context(self, text_only: bool):
+        browser = min(self.browsers, key=lambda browser: len(browser.contexts))
+        context = await browser.new_context()
+        context.set_default_navigation_timeout(self.navigation_timeout)
+        if text_only:
+            await context.route(
+                "**/*",
+                lambda route: route.abort() if route.request.resource_type in BLOCKED_RESOURCES else route.continue_()
+            )
+        self.context_uses[context] = 0
+        return context
+
+    async def open_page(self, text_only: bool):
+        await self._ensure_browsers()
+        await self.semaphore.acquire()
+
+        try:
+            context = None
+            idle = self.idle_contexts[text_only]
+            while idle and context is None:
+                candidate = idle.pop()
+                if candidate.browser and candidate.browser.is_connected():
+                    context = candidate
+                else:
+                    self.context_uses.pop(candidate, None)
+
+            if context is None:
+                context = await self._new_context(text_only)
+
+            return context, await context.new_page()
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    async def release(self, context, page, text_only: bool):
+        try:
+            await page.close()
+            self.context_uses[context] = self.context_uses.get(context, 0) + 1
+
+            if self.context_uses[context] >= self.max_context_uses or not context.browser.is_connected():
+                self.context_uses.pop(context, None)
+                await context.close()
+            else:
+                await context.clear_cookies()
+                self.idle_contexts[text_only].append(context)
+        except Exception as e:
+            logger.warning(f"Browser context dropped: {e}")
+            self.context_uses.pop(context, None)
+        finally:
+            self.semaphore.release()
+
+    async def _close(self):
+        for browser in self.browsers:
+            await browser.close()
+        self.browsers = []
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    def shutdown(self):
+        if self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout=10)
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
 class Browser:
-    """Placeholder browser implementation"""
-    def __init__(self):
-        self.name = "Browser"
-    
-    def start_interaction(self):
-        """Placeholder interaction method"""
-        print(f"{self.name} interaction started")
+    def __init__(self, text_only: bool = False):
+        self.text_only = text_only
+        self.pool = BrowserPool()
+        self.context = None
+        self.page = None
+        self.response_headers = {}
+        self.agent = AgentState()
+
+    async def start(self):
+        self.context, self.page = await self.pool.call(self.pool.open_page(self.text_only))
+        return self
+
+    async def _go_to(self, url: str):
+        try:
+            response = await self.page.goto(url, wait_until="domcontentloaded")
+            self.response_headers = response.headers if response else {}
+        except TimeoutError:
+            logger.warning(f"Navigation to {url} timed out, using what has loaded so far")
+        except Exception as e:
+            logger.error(f"Error navigating to {url}: {e}")
+
+    async def go_to(self, url: str):
+        await self.pool.call(self._go_to(url))
+
+    async def _screenshot(self, project_name: str):
+        screenshots_save_path = Config().get_screenshots_dir()
+        path_to_save = os.path.join(screenshots_save_path, f"{os.urandom(20).hex()}.png")
+
+        screenshot = await self.page.screenshot()
+        with open(path_to_save, "wb") as f:
+            f.write(screenshot)
+
+        new_state = self.agent.new_state()
+        new_state["internal_monologue"] = "Browsing the web right now..."
+        new_state["browser_session"]["url"] = self.page.url
+        new_state["browser_session"]["screenshot"] = path_to_save
+        self.agent.add_to_current_state(project_name, new_state)
+
+        return path_to_save, base64.b64encode(screenshot).decode()
+
+    async def screenshot(self, project_name: str):
+        return await self.pool.call(self._screenshot(project_name))
+
+    async def _extract_text(self) -> str:
+        return await self.page.evaluate("() => document.body ? document.body.innerText : ''")
+
+    async def extract_text(self) -> str:
+        return await self.pool.call(self._extract_text())
+
+    async def get_html(self) -> str:
+        return await self.pool.call(self.page.content())
+
+    async def close(self):
+        if self.page:
+            await self.pool.call(self.pool.release(self.context, self.page, self.text_only))
+            self.context, self.page = None, None
 
 
 def start_interaction():
     """Placeholder function"""
     print("Browser interaction started")
-
-# Temporary placeholder to resolve import errors
-# Actual browser implementation needs to be restored
@@ -0,0 +1,154 @@
+"""
+Turns a researched page's HTML into clean Markdown without an LLM call.
+
+The main content is picked readability-style (<main>/<article> when they hold
+most of the text, otherwise the block with the most paragraph text and the
+fewest links), boilerplate like navigation, footers, cookie banners and
+share buttons is dropped, and repeated blocks (menus rendered twice, the same
+code sample in several tabs) are kept once. The result is capped to a token
+budget at a block boundary.
+"""
+
+import re
+import hashlib
+
+import tiktoken
+from bs4 import BeautifulSoup
+from markdownify import markdownify
+
+TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+
+REMOVED_TAGS = ["script", "style", "noscript", "svg", "iframe", "form", "nav", "footer", "aside", "button", "template"]
+# matched against whole id/class/role tokens, as the token itself or its
+# first part ("cookie-banner", "comments_area"), so "hljs-comment" and
+# "token comment" in highlighted code don't count
+BOILERPLATE = re.compile(
+    r"(nav|navbar|navigation|menu|footer|sidebar|cookie|consent|banner|breadcrumb|share|sharing|social|comment|"
+    r"advert|advertisement|ad|ads|promo|related|subscribe|newsletter|popup|modal|toc|skip)s?([-_].*)?",
+    re.IGNORECASE,
+)
+CODE_TAGS = ["pre", "code"]
+CONTENT_TAGS = ["article", "main", "section"]
+BLOCK_TAGS = ["div", "section", "td", "article", "main"]
+MIN_MAIN_SHARE = 0.5
+
+
+def _text_length(node) -> int:
+    return len(node.get_text(" ", strip=True))
+
+
+def _link_density(node) -> float:
+    length = _text_length(node)
+    if not length:
+        return 1.0
+    return sum(_text_length(link) for link in node.find_all("a")) / length
+
+
+def _remove_boilerplate(soup: BeautifulSoup):
+    for tag in soup(REMOVED_TAGS):
+        tag.decompose()
+
+    # the page's header, not the headers of articles and sections
+    for tag in soup("header"):
+        if not tag.decomposed and not tag.find_parent(CONTENT_TAGS):
+            tag.decompose()
+
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.name in ("html", "body", "main", "article", *CODE_TAGS):
+            continue
+        if tag.find_parent(CODE_TAGS):
+            continue
+        tokens = [tag.get("id") or "", *(tag.get("class") or []), tag.get("role") or ""]
+        if any(token and BOILERPLATE.fullmatch(token) for token in tokens):
+            tag.decompose()
+
+
+def _main_content(soup: BeautifulSoup):
+    body = soup.body or soup
+    body_length = _text_length(body) or 1
+
+    for selector in ["main", "article", "[role=main]"]:
+        candidates = soup.select(selector)
+        if candidates:
+            best = max(candidates, key=_text_length)
+            if _text_length(best) / body_length >= MIN_MAIN_SHARE:
+                return best
+
+    best, best_score = body, 0.0
+    for node in body.find_all(BLOCK_TAGS):
+        paragraphs = node.find_all(["p", "pre", "li"], recursive=False)
+        text = " ".join(paragraph.get_text(" ", strip=True) for paragraph in paragraphs)
+        if len(text) < 100:
+            continue
+        score = (len(text) / 100 + text.count(",")) * (1 - _link_density(node))
+        if score > best_score:
+            best, best_score = node, score
+
+    # a winning block that misses most of the page is probably a fragment of it
+    if _text_length(best) / body_length < 0.2:
+        return body
+    return best
+
+
+def _blocks(markdown: str) -> list:
+    """
+    Paragraphs, list and code blocks; fenced code is never split.
+    """
+    blocks, current, in_fence = [], [], False
+    for line in markdown.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append("\n".join(current).strip())
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current).strip())
+    return [block for block in blocks if block]
+
+
+def _deduplicate(markdown: str) -> str:
+    seen, kept = set(), []
+    for block in _blocks(markdown):
+        key = hashlib.sha1(re.sub(r"\s+", " ", block).lower().encode("utf-8")).hexdigest()
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(block)
+    return "\n\n".join(kept)
+
+
+def count_tokens(text: str) -> int:
+    return len(TIKTOKEN_ENC.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    kept, tokens = [], 0
+    for block in _blocks(text):
+        block_tokens = count_tokens(block) + 1
+        if tokens + block_tokens > max_tokens:
+            if not kept:
+                kept.append(TIKTOKEN_ENC.decode(TIKTOKEN_ENC.encode(block)[:max_tokens]))
+            break
+        kept.append(block)
+        tokens += block_tokens
+    return "\n\n".join(kept)
+
+
+def html_to_markdown(html: str, max_tokens: int) -> str:
+    """
+    The main content of `html` as Markdown, at most `max_tokens` long.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    _remove_boilerplate(soup)
+
+    markdown = markdownify(str(_main_content(soup)), heading_style="ATX", bullets="-")
+    markdown = re.sub(r"[ \t]+\n", "\n", markdown)
+    markdown = _deduplicate(markdown)
+
+    return truncate_tokens(markdown, max_tokens)
@@ -1,29 +1,227 @@
+"""
+Web search engines for research.
+
+Every engine shares one pooled HTTP session and a per-query result cache.
+FederatedSearch asks all configured engines at once and merges their results
+with reciprocal rank fusion, deduplicated by canonical URL.
+"""
+
+import time
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import Config
+from src.logger import Logger
+from src.services.url_cache import normalize_url
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+REQUEST_TIMEOUT = 10
+RRF_K = 60
+MAX_CACHED_QUERIES = 512
+# searches don't change anything, so DuckDuckGo's POST form is safe to retry
+RETRY = Retry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+)
+
+logger = Logger()
+
+_session = None
+_session_lock = threading.Lock()
+
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=8,
+                pool_maxsize=32,
+                max_retries=RETRY,
+            )
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers["User-Agent"] = USER_AGENT
+        return _session
+
+
+def canonical_url(url: str) -> str:
+    """
+    The same page reached over http/https or with/without www maps to one key.
+    """
+    parts = urlsplit(normalize_url(url))
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    return f"{host}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def _configured(value: str) -> bool:
+    return bool(value) and not value.startswith("<YOUR_")
+
+
 class SearchEngine:
-    """Base class for search engines"""
+    name = "search"
+
     def __init__(self):
-        self.name = "Search Engine"
-    
+        self.config = Config()
+        self.query_result = []
+
+    def available(self) -> bool:
+        return True
+
+    def fetch(self, query: str, count: int) -> list:
+        """
+        Results as [{"title", "url", "snippet"}], best first.
+        """
+        raise NotImplementedError
+
     def search(self, query: str) -> list:
-        """Placeholder search method"""
-        return [f"{self.name} result for '{query}'"]
+        count = self.config.get_search_result_count()
+        key = (self.name, query.strip().lower(), count)
+
+        with _result_cache_lock:
+            cached = _result_cache.get(key)
+            if cached and time.time() - cached[0] < self.config.get_search_cache_ttl():
+                _result_cache.move_to_end(key)
+                self.query_result = cached[1]
+                return self.query_result
+
+        try:
+            results = self.fetch(query, count)[:count]
+        except (requests.RequestException, KeyError, TypeError, ValueError) as e:
+            logger.error(f"{self.name} search failed for '{query}': {e}")
+            results = []
+
+        if results:
+            with _result_cache_lock:
+                _result_cache[key] = (time.time(), results)
+                while len(_result_cache) > MAX_CACHED_QUERIES:
+                    _result_cache.popitem(last=False)
+
+        self.query_result = results
+        return results
+
+    def get_first_link(self):
+        return self.query_result[0]["url"] if self.query_result else None
+
+    def get_links(self, count: int = None) -> list:
+        return [result["url"] for result in self.query_result[:count]]
 
 
 class BingSearch(SearchEngine):
-    """Bing search implementation"""
-    def __init__(self):
-        super().__init__()
-        self.name = "Bing"
+    name = "bing"
+
+    def available(self) -> bool:
+        return _configured(self.config.get_bing_api_key())
+
+    def fetch(self, query: str, count: int) -> list:
+        response = get_session().get(
+            self.config.get_bing_api_endpoint(),
+            headers={"Ocp-Apim-Subscription-Key": self.config.get_bing_api_key()},
+            params={"q": query, "mkt": "en-US", "count": count},
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        pages = response.json().get("webPages", {}).get("value", [])
+        return [{"title": page["name"], "url": page["url"], "snippet": page.get("snippet", "")} for page in pages]
 
 
 class GoogleSearch(SearchEngine):
-    """Google search implementation"""
-    def __init__(self):
-        super().__init__()
-        self.name = "Google"
+    name = "google"
+
+    def available(self) -> bool:
+        return _configured(self.config.get_google_search_api_key()) and \
+            _configured(self.config.get_google_search_engine_id())
+
+    def fetch(self, query: str, count: int) -> list:
+        response = get_session().get(
+            self.config.get_google_search_api_endpoint(),
+            params={
+                "key": self.config.get_google_search_api_key(),
+                "cx": self.config.get_google_search_engine_id(),
+                "q": query,
+                "num": min(count, 10),
+            },
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        items = response.json().get("items", [])
+        return [{"title": item["title"], "url": item["link"], "snippet": item.get("snippet", "")} for item in items]
 
 
 class DuckDuckGoSearch(SearchEngine):
-    """DuckDuckGo search implementation"""
+    name = "duckduckgo"
+
+    def fetch(self, query: str, count: int) -> list:
+        response = get_session().post(
+            self.config.get_duckduckgo_api_endpoint(),
+            data={"q": query},
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+
+        soup = BeautifulSoup(response.text, "html.parser")
+        results = []
+        for result in soup.select(".result"):
+            link = result.select_one("a.result__a")
+            if not link or not link.get("href") or "result--ad" in (result.get("class") or []):
+                continue
+            url = link["href"]
+            # results link through a redirect: //duckduckgo.com/l/?uddg=<url>
+            redirect = parse_qs(urlsplit(url).query).get("uddg")
+            if redirect:
+                url = unquote(redirect[0])
+            snippet = result.select_one(".result__snippet")
+            results.append({
+                "title": link.get_text(" ", strip=True),
+                "url": url,
+                "snippet": snippet.get_text(" ", strip=True) if snippet else "",
+            })
+        return results
+
+
+ENGINES = {
+    "bing": BingSearch,
+    "google": GoogleSearch,
+    "duckduckgo": DuckDuckGoSearch,
+}
+
+
+class FederatedSearch(SearchEngine):
+    name = "federated"
+
     def __init__(self):
         super().__init__()
-        self.name = "DuckDuckGo"
+        names = self.config.get_search_federated_engines()
+        self.engines = [ENGINES[name]() for name in names if name in ENGINES]
+        self.engines = [engine for engine in self.engines if engine.available()]
+
+    def fetch(self, query: str, count: int) -> list:
+        if not self.engines:
+            return []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.engines)) as executor:
+            rankings = list(executor.map(lambda engine: engine.search(query), self.engines))
+
+        merged = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking):
+                key = canonical_url(result["url"])
+                if key not in merged:
+                    merged[key] = {**result, "score": 0.0}
+                merged[key]["score"] += 1 / (RRF_K + rank + 1)
+
+        results = sorted(merged.values(), key=lambda result: result["score"], reverse=True)
+        return [{"title": result["title"], "url": result["url"], "snippet": result["snippet"]} for result in results]
@@ -0,0 +1,203 @@
+"""
+Cache of the pages fetched during research: the raw HTML, the extracted text
+and the Formatter's summary, keyed by normalized URL.
+
+Entries are fresh for the page's Cache-Control max-age (or the configured
+TTL). After that they are revalidated with a conditional request (ETag /
+Last-Modified): kept if the page hasn't changed (304), replaced by the page
+in the response otherwise (200). Entries are stored gzipped, one file per
+URL.
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from src.config import Config
+from src.logger import Logger
+
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|ref|ref_src)$")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+REVALIDATION_TIMEOUT = 10
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+logger = Logger()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Lowercase scheme and host, no default port, fragment, tracking parameters
+    or trailing slash, and sorted query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def _header(headers: dict, name: str) -> Optional[str]:
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class UrlCache:
+    def __init__(self, extract: Callable[[dict], str] = None):
+        """
+        `extract` turns a page ({"url", "html", "text"}) into the text to
+        store, for pages that changed when they were revalidated. Without
+        it, changed pages are dropped and have to be fetched again.
+        """
+        config = Config()
+        self.extract = extract
+        self.cache_dir = os.path.join(config.get_cache_dir(), "urls")
+        self.ttl = config.get_url_cache_ttl()
+        self.max_age = config.get_url_cache_max_age()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def _read(self, url: str) -> Optional[dict]:
+        try:
+            with gzip.open(self._path(url), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, url: str, entry: dict):
+        path = self._path(url)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps(entry).encode("utf-8"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _revalidate(self, url: str, entry: dict) -> Optional[dict]:
+        """
+        The entry to use after a conditional request: the same one when the
+        page hasn't changed, the page from the response when it has, or None.
+        """
+        headers = {"User-Agent": USER_AGENT}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if len(headers) == 1:
+            return None
+
+        try:
+            response = requests.get(url, headers=headers, timeout=REVALIDATION_TIMEOUT, allow_redirects=True)
+        except requests.RequestException as e:
+            logger.debug(f"Could not revalidate {url}: {e}")
+            return None
+
+        if response.status_code == 304:
+            entry["fetched_at"] = time.time()
+            ttl = self._ttl(response.headers)
+            if ttl is not None:
+                entry["ttl"] = ttl
+            self._write(url, entry)
+            return entry
+
+        if response.status_code != 200 or not self.extract:
+            return None
+
+        page = {"url": url, "html": response.text, "text": ""}
+        try:
+            text = self.extract(page)
+        except Exception as e:
+            logger.debug(f"Could not extract the revalidated page {url}: {e}")
+            return None
+        if not text:
+            return None
+
+        headers = dict(response.headers)
+        self.put(url, page["html"], text, headers)
+        return self._entry(url, page["html"], text, headers, self._ttl(headers) or 0)
+
+    def _ttl(self, headers: dict) -> Optional[int]:
+        """
+        How long the page can be used without revalidating it: 0 for no-cache
+        and max-age=0, so every use revalidates, and None for no-store.
+        """
+        cache_control = (_header(headers, "cache-control") or "").lower()
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return 0
+        match = MAX_AGE_PATTERN.search(cache_control)
+        if match:
+            return min(int(match.group(1)), self.max_age)
+        return self.ttl
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        The cached entry for `url` if it is fresh or still valid after
+        revalidation, None otherwise.
+        """
+        entry = self._read(url)
+        if not entry:
+            return None
+
+        age = time.time() - entry["fetched_at"]
+        if age < entry["ttl"]:
+            return entry
+        if age < self.max_age:
+            entry = self._revalidate(url, entry)
+            if entry:
+                logger.debug(f"Revalidated cached page: {url}")
+            return entry
+        return None
+
+    def _entry(self, url: str, html: str, text: str, headers: dict, ttl: int, summary: str = None) -> dict:
+        return {
+            "url": normalize_url(url),
+            "fetched_at": time.time(),
+            "ttl": ttl,
+            "etag": _header(headers, "etag"),
+            "last_modified": _header(headers, "last-modified"),
+            "html": html,
+            "text": text,
+            "summary": summary,
+        }
+
+    def put(self, url: str, html: str, text: str, headers: dict = None, summary: str = None):
+        ttl = self._ttl(headers)
+        if ttl is None:
+            return
+
+        self._write(url, self._entry(url, html, text, headers, ttl, summary))
+
+    def set_summary(self, url: str, summary: str):
+        entry = self._read(url)
+        if entry:
+            entry["summary"] = summary
+            self._write(url, entry)
@@ -3,13 +3,13 @@ from flask_socketio import SocketIO
 from src.logger import Logger
 socketio = SocketIO(cors_allowed_origins="*", async_mode="gevent")
 
-logger = Logger()
+logger = Logger(channel="socket")
 
 
 def emit_agent(channel, content, log=True):
     try:
         socketio.emit(channel, content)
-        if log:
+        if log and logger.enabled("info"):
             logger.info(f"SOCKET {channel} MESSAGE: {content}")
         return True
     except Exception as e:
@@ -1,5 +1,7 @@
 import json
 import os
+import uuid
+import threading
 from datetime import datetime
 from typing import Optional
 from sqlmodel import Field, Session, SQLModel, create_engine
@@ -7,6 +9,17 @@ from src.socket_instance import emit_agent
 from src.config import Config
 
 
+_project_locks = {}
+_project_locks_lock = threading.Lock()
+
+
+def _project_lock(project: str) -> threading.RLock:
+    # the state stack is read, changed and written back as one JSON value, so
+    # concurrent writers (e.g. Runner commands running in parallel) take turns
+    with _project_locks_lock:
+        return _project_locks.setdefault(project, threading.RLock())
+
+
 class AgentStateModel(SQLModel, table=True):
     __tablename__ = "agent_state"
 
@@ -26,6 +39,7 @@ class AgentState:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         return {
+            "id": uuid.uuid4().hex,
             "internal_monologue": '',
             "browser_session": {
                 "url": None,
@@ -63,19 +77,20 @@ class AgentState:
                 session.commit()
 
     def add_to_current_state(self, project: str, state: dict):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack.append(state)
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [state]
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        with _project_lock(project):
+            with Session(self.engine) as session:
+                agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
+                if agent_state:
+                    state_stack = json.loads(agent_state.state_stack_json)
+                    state_stack.append(state)
+                    agent_state.state_stack_json = json.dumps(state_stack)
+                    session.commit()
+                else:
+                    state_stack = [state]
+                    agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
+                    session.add(agent_state)
+                    session.commit()
+                emit_agent("agent-state", state_stack)
 
     def get_current_state(self, project: str):
         with Session(self.engine) as session:
@@ -85,19 +100,46 @@ class AgentState:
             return None
 
     def update_latest_state(self, project: str, state: dict):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1] = state
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [state]
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        with _project_lock(project):
+            with Session(self.engine) as session:
+                agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
+                if agent_state:
+                    state_stack = json.loads(agent_state.state_stack_json)
+                    state_stack[-1] = state
+                    agent_state.state_stack_json = json.dumps(state_stack)
+                    session.commit()
+                else:
+                    state_stack = [state]
+                    agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
+                    session.add(agent_state)
+                    session.commit()
+                emit_agent("agent-state", state_stack)
+
+    def update_state(self, project: str, state: dict):
+        """
+        Replace the entry of the stack with the same id as `state`, or append
+        `state` when it isn't there (any more). Unlike update_latest_state it
+        doesn't overwrite what other writers pushed after it.
+        """
+        with _project_lock(project):
+            with Session(self.engine) as session:
+                agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
+                if agent_state:
+                    state_stack = json.loads(agent_state.state_stack_json)
+                    for index in range(len(state_stack) - 1, -1, -1):
+                        if state_stack[index].get("id") == state.get("id"):
+                            state_stack[index] = state
+                            break
+                    else:
+                        state_stack.append(state)
+                    agent_state.state_stack_json = json.dumps(state_stack)
+                    session.commit()
+                else:
+                    state_stack = [state]
+                    agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
+                    session.add(agent_state)
+                    session.commit()
+                emit_agent("agent-state", state_stack)
 
     def get_latest_state(self, project: str):
         with Session(self.engine) as session:
@@ -107,20 +149,21 @@ class AgentState:
             return None
 
     def set_agent_active(self, project: str, is_active: bool):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1]["agent_is_active"] = is_active
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [self.new_state()]
-                state_stack[-1]["agent_is_active"] = is_active
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        with _project_lock(project):
+            with Session(self.engine) as session:
+                agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
+                if agent_state:
+                    state_stack = json.loads(agent_state.state_stack_json)
+                    state_stack[-1]["agent_is_active"] = is_active
+                    agent_state.state_stack_json = json.dumps(state_stack)
+                    session.commit()
+                else:
+                    state_stack = [self.new_state()]
+                    state_stack[-1]["agent_is_active"] = is_active
+                    agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
+                    session.add(agent_state)
+                    session.commit()
+                emit_agent("agent-state", state_stack)
 
     def is_agent_active(self, project: str):
         with Session(self.engine) as session:
@@ -130,21 +173,22 @@ class AgentState:
             return None
 
     def set_agent_completed(self, project: str, is_completed: bool):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1]["internal_monologue"] = "Agent has completed the task."
-                state_stack[-1]["completed"] = is_completed
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [self.new_state()]
-                state_stack[-1]["completed"] = is_completed
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
-            emit_agent("agent-state", state_stack)
+        with _project_lock(project):
+            with Session(self.engine) as session:
+                agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
+                if agent_state:
+                    state_stack = json.loads(agent_state.state_stack_json)
+                    state_stack[-1]["internal_monologue"] = "Agent has completed the task."
+                    state_stack[-1]["completed"] = is_completed
+                    agent_state.state_stack_json = json.dumps(state_stack)
+                    session.commit()
+                else:
+                    state_stack = [self.new_state()]
+                    state_stack[-1]["completed"] = is_completed
+                    agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
+                    session.add(agent_state)
+                    session.commit()
+                emit_agent("agent-state", state_stack)
 
     def is_agent_completed(self, project: str):
         with Session(self.engine) as session:
@@ -154,19 +198,20 @@ class AgentState:
             return None
             
     def update_token_usage(self, project: str, token_usage: int):
-        with Session(self.engine) as session:
-            agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
-            if agent_state:
-                state_stack = json.loads(agent_state.state_stack_json)
-                state_stack[-1]["token_usage"] += token_usage
-                agent_state.state_stack_json = json.dumps(state_stack)
-                session.commit()
-            else:
-                state_stack = [self.new_state()]
-                state_stack[-1]["token_usage"] = token_usage
-                agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
-                session.add(agent_state)
-                session.commit()
+        with _project_lock(project):
+            with Session(self.engine) as session:
+                agent_state = session.query(AgentStateModel).filter(AgentStateModel.project == project).first()
+                if agent_state:
+                    state_stack = json.loads(agent_state.state_stack_json)
+                    state_stack[-1]["token_usage"] += token_usage
+                    agent_state.state_stack_json = json.dumps(state_stack)
+                    session.commit()
+                else:
+                    state_stack = [self.new_state()]
+                    state_stack[-1]["token_usage"] = token_usage
+                    agent_state = AgentStateModel(project=project, state_stack_json=json.dumps(state_stack))
+                    session.add(agent_state)
+                    session.commit()
 
     def get_latest_token_usage(self, project: str):
         with Session(self.engine) as session:
@@ -0,0 +1,89 @@
+import time
+import threading
+
+import pytest
+
+from src.bert import sentence
+from src.bert.sentence import KeywordService
+
+
+@pytest.fixture
+def keyword_service(monkeypatch):
+    """
+    A fresh service whose extraction returns the words of each sentence, and
+    which records the sentences it extracted.
+    """
+    monkeypatch.setattr(KeywordService, "_instance", None)
+    monkeypatch.setattr(sentence, "_gevent_threadpool", lambda: None)
+    extracted = []
+
+    def extract(self, sentences, top_n):
+        time.sleep(0.01)
+        extracted.extend(sentences)
+        return [[(word, 1.0) for word in text.split()[:top_n]] for text in sentences]
+
+    monkeypatch.setattr(KeywordService, "_extract", extract)
+    return extracted
+
+
+def run_concurrently(func, count: int = 8) -> list:
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        results[index] = func()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_first_calls_create_one_instance(keyword_service, monkeypatch):
+    setups = []
+    setup = KeywordService._setup
+
+    def slow_setup(self):
+        setups.append(self)
+        time.sleep(0.05)
+        setup(self)
+
+    monkeypatch.setattr(KeywordService, "_setup", slow_setup)
+
+    # used right away: no caller may get the instance before it is set up
+    results = run_concurrently(lambda: (KeywordService(), KeywordService().extract_keywords("flask app")))
+
+    assert len(setups) == 1
+    assert all(instance is setups[0] for instance, _ in results)
+    assert all(keywords == [("flask", 1.0), ("app", 1.0)] for _, keywords in results)
+
+
+def test_results_are_cached_per_sentence_and_top_n(keyword_service):
+    service = KeywordService()
+
+    assert service.extract_keywords_batch(["flask app", "react app", "flask app"]) == [
+        [("flask", 1.0), ("app", 1.0)],
+        [("react", 1.0), ("app", 1.0)],
+        [("flask", 1.0), ("app", 1.0)],
+    ]
+    assert service.extract_keywords("flask app", top_n=1) == [("flask", 1.0)]
+    assert service.extract_keywords("react app") == [("react", 1.0), ("app", 1.0)]
+    assert keyword_service == ["flask app", "react app", "flask app"]
+
+
+def test_concurrent_extractions_keep_the_cache_consistent(keyword_service, monkeypatch):
+    monkeypatch.setattr(sentence, "MAX_CACHED_SENTENCES", 16)
+    service = KeywordService()
+
+    def extract():
+        texts = [f"word{index} other" for index in range(24)]
+        return service.extract_keywords_batch(texts, top_n=1)
+
+    results = run_concurrently(extract)
+
+    expected = [[(f"word{index}", 1.0)] for index in range(24)]
+    assert all(result == expected for result in results)
+    assert len(service.cache) == 16
@@ -0,0 +1,98 @@
+"""
+Shared fixtures.
+
+The tests run in a scratch directory with a copy of sample.config.toml, so
+Config (which reads and writes config.toml in the working directory) and
+everything it points at (data/, logs) stay out of the checkout.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORK_DIR = tempfile.mkdtemp(prefix="swea-tests-")
+shutil.copy(os.path.join(ROOT, "sample.config.toml"), WORK_DIR)
+os.chdir(WORK_DIR)
+
+
+class StubServer:
+    """
+    HTTP server on localhost that answers each path with queued responses
+    (the last one repeats) and records the requests it got.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode("utf-8") if length else ""
+                path = self.path.split("?", 1)[0]
+                with stub._lock:
+                    stub.requests.append({"method": self.command, "path": path, "headers": dict(self.headers), "body": body})
+                    responses = stub.routes.get(path) or [(404, {}, "")]
+                    status, headers, payload = responses.pop(0) if len(responses) > 1 else responses[0]
+
+                if callable(payload):
+                    status, headers, payload = payload(self)
+                if not isinstance(payload, (str, bytes)):
+                    payload = json.dumps(payload)
+                    headers = {"Content-Type": "application/json", **headers}
+                data = payload.encode("utf-8") if isinstance(payload, str) else payload
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def route(self, path: str, *responses):
+        """
+        Answer `path` with `responses`, each (status, headers, body). A body
+        that isn't text is sent as JSON; a callable body gets the request
+        handler and returns the (status, headers, body) to send.
+        """
+        with self._lock:
+            self.routes[path] = list(responses)
+
+    def requests_to(self, path: str) -> list:
+        with self._lock:
+            return [request for request in self.requests if request["path"] == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
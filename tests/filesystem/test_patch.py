@@ -0,0 +1,168 @@
+import pytest
+
+from src.filesystem.patch import PatchError, apply_edit, apply_edit_response, parse_unified_diff
+
+SOURCE = """\
+import os
+
+
+def load(path):
+    with open(path) as f:
+        data = f.read()
+    return data.strip()
+
+
+def save(path, data):
+    with open(path, "w") as f:
+        f.write(data)
+"""
+
+
+def test_udiff_is_applied_exactly():
+    diff = """\
+--- a/app.py
++++ b/app.py
+@@ -4,4 +4,4 @@
+ def load(path):
+     with open(path) as f:
+-        data = f.read()
++        data = f.read().decode()
+     return data.strip()
+"""
+
+    assert apply_edit(SOURCE, diff, "udiff") == SOURCE.replace("f.read()", "f.read().decode()")
+
+
+def test_several_hunks_and_file_headers_with_line_counts():
+    diff = """\
+--- a/app.py
++++ b/app.py
+@@ -1,1 +1,2 @@
+ import os
++import sys
+@@ -11,2 +12,2 @@
+     with open(path, "w") as f:
+-        f.write(data)
++        f.write(data + "\\n")
+"""
+
+    edited = apply_edit(SOURCE, diff, "udiff")
+
+    assert edited.startswith("import os\nimport sys\n")
+    assert edited.endswith('        f.write(data + "\\n")\n')
+
+
+def test_context_with_different_indentation_still_applies():
+    diff = """\
+@@ @@
+ def save(path, data):
+-  with open(path, "w") as f:
+-    f.write(data)
++  with open(path, "a") as f:
++    f.write(data)
+"""
+
+    assert 'with open(path, "a") as f:' in apply_edit(SOURCE, diff, "udiff")
+
+
+def test_slightly_wrong_context_is_matched_fuzzily():
+    search_replace = """\
+<<<<<<< SEARCH
+def load(path):
+    with open(path) as f:
+        data = f.read()
+    return data.strip()  # cleaned
+=======
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        data = f.read()
+    return data.strip()
+>>>>>>> REPLACE
+"""
+
+    edited = apply_edit(SOURCE, search_replace, "search_replace")
+
+    assert 'with open(path, encoding="utf-8") as f:' in edited
+    assert edited.count("def load") == 1
+
+
+def test_context_that_is_not_close_enough_is_refused():
+    search_replace = """\
+<<<<<<< SEARCH
+def load(path):
+    with open(path, "rb") as handle:
+        contents = handle.read()
+    return contents.decode()
+=======
+def load(path):
+    return ""
+>>>>>>> REPLACE
+"""
+
+    with pytest.raises(PatchError):
+        apply_edit(SOURCE, search_replace, "search_replace")
+
+
+def test_context_found_in_several_places_is_refused():
+    diff = """\
+@@ @@
+     with open(path) as f:
+-        data = f.read()
++        data = f.read(1024)
+"""
+    source = SOURCE + "\n\ndef peek(path):\n    with open(path) as f:\n        data = f.read()\n    return data\n"
+
+    with pytest.raises(PatchError, match="2 places"):
+        apply_edit(source, diff, "udiff")
+
+
+def test_fuzzy_matches_about_equally_good_in_two_places_are_refused():
+    block = "def handler_{}(event):\n    value = event.get('value')\n    result = compute(value)\n    log(result)\n    return result\n"
+    source = block.format("a") + "\n\n" + block.format("b")
+    search_replace = """\
+<<<<<<< SEARCH
+def handler_c(event):
+    value = event.get('value')
+    result = compute(value)
+    log(result)
+    return result
+=======
+def handler_c(event):
+    return None
+>>>>>>> REPLACE
+"""
+
+    with pytest.raises(PatchError, match="several places"):
+        apply_edit(source, search_replace, "search_replace")
+
+
+def test_hunk_without_context_is_refused_for_an_existing_file():
+    with pytest.raises(PatchError):
+        apply_edit(SOURCE, "@@ @@\n+import sys\n", "udiff")
+
+    assert apply_edit(None, "@@ @@\n+import sys\n", "udiff") == "import sys\n"
+
+
+def test_removed_lines_starting_with_dashes_are_not_file_headers():
+    diff = "@@ @@\n--- comment\n+-- new\n SELECT 1;"
+
+    assert parse_unified_diff(diff) == [(["-- comment", "SELECT 1;"], ["-- new", "SELECT 1;"])]
+    assert apply_edit("-- comment\nSELECT 1;\n", diff, "udiff") == "-- new\nSELECT 1;\n"
+
+
+def test_added_lines_starting_with_pluses_are_not_file_headers():
+    diff = "--- a/main.c\n+++ b/main.c\n@@ -1,2 +1,3 @@\n int i = 0;\n+++i;\n return i;\n"
+
+    assert apply_edit("int i = 0;\nreturn i;\n", diff, "udiff") == "int i = 0;\n++i;\nreturn i;\n"
+
+
+def test_edits_that_dont_apply_fall_back_to_full_files(tmp_path):
+    (tmp_path / "app.py").write_text(SOURCE)
+    good = {"file": "app.py", "code": "@@ @@\n import os\n+import sys\n"}
+    bad = {"file": "app.py", "code": "@@ @@\n import json\n+import sys\n"}
+
+    applied = apply_edit_response([good], "response", "udiff", str(tmp_path), "patcher")
+    assert applied == [{"file": "app.py", "code": SOURCE.replace("import os\n", "import os\nimport sys\n")}]
+
+    assert apply_edit_response([good, bad], "response", "udiff", str(tmp_path), "patcher") is False
+    assert (tmp_path / "app.py").read_text() == SOURCE
@@ -0,0 +1,84 @@
+import pytest
+
+from src.config import Config
+from src.memory.knowledge_base import KnowledgeBase
+
+
+@pytest.fixture(params=["fts5", "bm25"])
+def knowledge_base(request, tmp_path, monkeypatch):
+    """
+    A knowledge base searched through the FTS5 index, and one searched with
+    the in-process BM25 used on SQLite builds without FTS5.
+    """
+    monkeypatch.setitem(Config().config["STORAGE"], "SQLITE_DB", str(tmp_path / "knowledge.db"))
+    knowledge_base = KnowledgeBase()
+    assert knowledge_base.fts
+    if request.param == "bm25":
+        knowledge_base.fts = False
+
+    knowledge_base.add_knowledge("flask sessions", "Flask keeps sessions in a signed cookie.")
+    knowledge_base.add_knowledge("django orm", "Querysets are lazy, unlike the flask-sqlalchemy query API.")
+    knowledge_base.add_knowledge("react hooks", "useEffect runs after every render by default.")
+    return knowledge_base
+
+
+def tags(results: list) -> list:
+    return [result["tag"] for result in results]
+
+
+def test_matches_in_the_tag_rank_first(knowledge_base):
+    results = knowledge_base.search("flask")
+
+    assert tags(results) == ["flask sessions", "django orm"]
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert results[0]["contents"] == "Flask keeps sessions in a signed cookie."
+
+
+def test_more_matching_terms_rank_higher(knowledge_base):
+    assert tags(knowledge_base.search("lazy query flask")) == ["django orm", "flask sessions"]
+    assert tags(knowledge_base.search("render hooks")) == ["react hooks"]
+
+
+def test_top_k_limits_the_results(knowledge_base):
+    for index in range(10):
+        knowledge_base.add_knowledge(f"python tip {index}", "python " * (index + 1))
+
+    assert len(knowledge_base.search("python", top_k=3)) == 3
+    assert len(knowledge_base.search("python")) == 5
+
+
+def test_added_knowledge_is_searchable_right_away(knowledge_base):
+    assert knowledge_base.search("vite") == []
+
+    knowledge_base.add_knowledge("vite config", "Vite serves sources over native ES modules.")
+
+    assert tags(knowledge_base.search("vite")) == ["vite config"]
+
+
+@pytest.mark.parametrize("query", ['"; DROP TABLE knowledge; --', "flask NOT sessions", "flask* OR (cookie", "NEAR(flask"])
+def test_query_syntax_is_searched_as_plain_words(knowledge_base, query):
+    knowledge_base.search(query)
+
+    assert tags(knowledge_base.search("flask"))[0] == "flask sessions"
+    assert knowledge_base.get_knowledge("react hooks") == "useEffect runs after every render by default."
+
+
+def test_query_without_words_finds_nothing(knowledge_base):
+    assert knowledge_base.search("'\"; --") == []
+
+
+def test_fallback_scores_like_fts5(tmp_path, monkeypatch):
+    monkeypatch.setitem(Config().config["STORAGE"], "SQLITE_DB", str(tmp_path / "knowledge.db"))
+    knowledge_base = KnowledgeBase()
+    knowledge_base.add_knowledge("flask sessions", "Flask keeps sessions in a signed cookie.")
+    knowledge_base.add_knowledge("vite", "Vite builds react apps with a signed manifest.")
+    knowledge_base.add_knowledge("react hooks", "useEffect runs after every render by default.")
+
+    for query in ("cookie", "react manifest", "signed"):
+        fts5 = knowledge_base.search(query)
+        knowledge_base.fts = False
+        bm25 = knowledge_base.search(query)
+        knowledge_base.fts = True
+
+        assert tags(bm25) == tags(fts5)
+        assert [result["score"] for result in bm25] == pytest.approx([result["score"] for result in fts5])
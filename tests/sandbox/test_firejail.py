@@ -0,0 +1,48 @@
+import subprocess
+
+import pytest
+
+from src.sandbox.firejail import sandbox_available, sandbox_prefix
+
+
+def test_firejail_whitelists_only_the_shared_dirs(tmp_path):
+    prefix = sandbox_prefix("firejail", [tmp_path / "project", tmp_path / "cache"], 60)
+
+    assert [arg for arg in prefix if arg.startswith("--whitelist=")] == [
+        f"--whitelist={tmp_path / 'project'}",
+        f"--whitelist={tmp_path / 'cache'}",
+    ]
+    assert not any(arg.startswith("--rlimit-as") for arg in prefix)
+
+
+def test_memory_rlimit_is_on_data_and_only_without_a_cgroup(tmp_path):
+    with_cgroup = sandbox_prefix("unshare", [tmp_path], 60, root=str(tmp_path))
+    without_cgroup = sandbox_prefix("unshare", [tmp_path], 60, memory_mb=512, root=str(tmp_path))
+
+    assert not any(arg.startswith(("--data", "--as")) for arg in with_cgroup)
+    if without_cgroup[0] == "prlimit":
+        assert f"--data={512 * 1024 * 1024}" in without_cgroup
+        assert not any(arg.startswith("--as") for arg in without_cgroup)
+
+
+@pytest.mark.skipif(not sandbox_available("unshare"), reason="needs unprivileged user and mount namespaces")
+def test_unshare_sees_only_its_project(tmp_path):
+    project, other, root = tmp_path / "project", tmp_path / "other", tmp_path / "root"
+    for path in (project, other, root):
+        path.mkdir()
+    (other / "secret").write_text("secret")
+
+    script = f"""
+        cd {project} && echo written > out
+        cat {other}/secret || echo hidden
+        echo changed > /etc/swea-test || echo read-only
+    """
+    result = subprocess.run(
+        sandbox_prefix("unshare", [project], 60, root=str(root)) + ["/bin/sh", "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+    assert result.stdout.split() == ["hidden", "read-only"]
+    assert (project / "out").read_text() == "written\n"
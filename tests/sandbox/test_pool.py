@@ -0,0 +1,160 @@
+import pytest
+
+from src.config import Config
+from src.sandbox import code_runner, pool
+from src.sandbox.code_runner import CodeRunner, stop_background_processes
+from src.sandbox.firejail import Cgroup
+from src.sandbox.pool import SandboxPool, WorkerExecution
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """
+    A pool whose workers are plain shells on the host: the backend prefix is
+    empty and there are no cgroups. Background top-ups are off so which
+    worker a command gets is up to the test.
+    """
+    config = Config().config
+    monkeypatch.setitem(config["STORAGE"], "SQLITE_DB", str(tmp_path / "state.db"))
+    monkeypatch.setitem(config["STORAGE"], "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setitem(config["SANDBOX"], "ENABLED", "true")
+    monkeypatch.setitem(config["SANDBOX"], "POOL_SIZE", 2)
+    monkeypatch.setitem(config["SANDBOX"], "MAX_USES", 20)
+    monkeypatch.setattr(pool, "sandbox_available", lambda backend: True)
+    monkeypatch.setattr(pool, "sandbox_prefix", lambda *args, **kwargs: [])
+    monkeypatch.setattr(Cgroup, "create", lambda self: False)
+    monkeypatch.setattr(SandboxPool, "warm", lambda self, project_path, runtimes=None: None)
+    monkeypatch.setattr(SandboxPool, "_instance", None)
+
+    project = tmp_path / "project"
+    project.mkdir()
+    yield SandboxPool(), project
+
+    SandboxPool().shutdown()
+
+
+def read_all(execution: WorkerExecution) -> bytes:
+    return b"".join(iter(execution.stdout.readline, b""))
+
+
+def test_output_and_exit_code_pass_through(sandbox):
+    sandbox_pool, project = sandbox
+
+    execution = sandbox_pool.execute("printf 'one\\ntwo'; echo \"$GREETING\" >&2; exit 3", str(project), {"GREETING": "hi"})
+
+    assert read_all(execution) == b"one\ntwohi\n"
+    assert execution.wait() == 3
+
+
+@pytest.mark.parametrize("output", ["", "\n", "a", "a\n", "a\n\nb\n\n", "\n\na"])
+def test_output_is_passed_on_unchanged(sandbox, output):
+    sandbox_pool, project = sandbox
+
+    execution = sandbox_pool.execute(f"printf '{output}'", str(project), {})
+
+    assert read_all(execution) == output.encode()
+
+
+def test_command_runs_in_the_project_directory(sandbox):
+    sandbox_pool, project = sandbox
+
+    execution = sandbox_pool.execute("pwd", str(project), {})
+
+    assert read_all(execution).strip() == str(project).encode()
+    assert execution.returncode == 0
+
+
+def test_worker_is_reused_after_a_command_finishes(sandbox):
+    sandbox_pool, project = sandbox
+
+    first = sandbox_pool.execute("true", str(project), {})
+    read_all(first)
+    second = sandbox_pool.execute("echo again", str(project), {})
+
+    assert read_all(second) == b"again\n"
+    assert second.worker is first.worker
+    assert second.worker.uses == 2
+
+
+def test_workers_are_kept_per_project(sandbox, tmp_path):
+    sandbox_pool, project = sandbox
+    other = tmp_path / "other"
+    other.mkdir()
+
+    first = sandbox_pool.execute("true", str(project), {})
+    read_all(first)
+    second = sandbox_pool.execute("true", str(other), {})
+    read_all(second)
+
+    assert second.worker is not first.worker
+    assert second.worker.project_path == str(other)
+
+
+def test_worker_is_recycled_after_max_uses(sandbox):
+    sandbox_pool, project = sandbox
+    sandbox_pool.max_uses = 2
+
+    executions = []
+    for _ in range(3):
+        executions.append(sandbox_pool.execute("true", str(project), {}))
+        read_all(executions[-1])
+
+    assert executions[1].worker is executions[0].worker
+    assert not executions[1].worker.alive()
+    assert executions[2].worker is not executions[0].worker
+
+
+def test_timed_out_command_kills_its_worker(sandbox, monkeypatch):
+    sandbox_pool, project = sandbox
+    monkeypatch.setitem(Config().config["RUNNER"], "TIMEOUT", 1)
+    monkeypatch.setitem(Config().config["RUNNER"], "OUTPUT_INTERVAL", 0.1)
+
+    result = CodeRunner("timeout", str(project)).run("echo started; sleep 30")
+
+    assert result["timed_out"]
+    assert "started" in result["output"]
+    assert sandbox_pool.idle.get(("default", str(project)), []) == []
+
+    # the next command gets a new worker
+    execution = sandbox_pool.execute("echo fresh", str(project), {})
+    assert read_all(execution) == b"fresh\n"
+
+
+def test_stopping_background_processes_stops_the_worker(sandbox, monkeypatch):
+    sandbox_pool, project = sandbox
+    monkeypatch.setitem(Config().config["RUNNER"], "OUTPUT_INTERVAL", 0.1)
+
+    result = CodeRunner("server", str(project)).run("echo 'Server listening on http://localhost:1'; sleep 30")
+    assert result["background"]
+    entry, = code_runner.get_background_processes("server")
+    worker = entry["process"].worker
+
+    stop_background_processes("server")
+
+    assert not worker.alive()
+    assert code_runner.get_background_processes("server") == []
+
+
+def test_commands_run_on_the_host_when_the_backend_is_unavailable(sandbox, monkeypatch):
+    _, project = sandbox
+    monkeypatch.setattr(pool, "sandbox_available", lambda backend: False)
+
+    runner = CodeRunner("host", str(project))
+    result = runner.run("echo on the host")
+
+    assert not runner.sandbox
+    assert result["returncode"] == 0
+    assert result["output"].strip() == "on the host"
+    assert not isinstance(runner.popen("true"), WorkerExecution)
+
+
+def test_unshare_root_is_removed_when_the_worker_stops(sandbox, tmp_path):
+    sandbox_pool, project = sandbox
+    root = tmp_path / "root"
+    root.mkdir()
+
+    worker = pool.SandboxWorker("default", str(project), [], Cgroup("unused", 1, 1), str(root))
+    worker.stop()
+
+    assert not root.exists()
+    assert not worker.alive()
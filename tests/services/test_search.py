@@ -0,0 +1,119 @@
+from urllib.parse import parse_qs, quote
+
+import pytest
+
+from src.config import Config
+from src.services import search
+from src.services.search import BingSearch, DuckDuckGoSearch, FederatedSearch, GoogleSearch
+
+
+@pytest.fixture
+def engines(stub_server, monkeypatch):
+    """
+    Every engine pointed at the stub server, with keys configured.
+    """
+    config = Config().config
+    monkeypatch.setitem(config["API_ENDPOINTS"], "BING", f"{stub_server.url}/bing")
+    monkeypatch.setitem(config["API_ENDPOINTS"], "GOOGLE", f"{stub_server.url}/google")
+    monkeypatch.setitem(config["API_ENDPOINTS"], "DUCKDUCKGO", f"{stub_server.url}/duckduckgo")
+    monkeypatch.setitem(config["API_KEYS"], "BING", "bing-key")
+    monkeypatch.setitem(config["API_KEYS"], "GOOGLE_SEARCH", "google-key")
+    monkeypatch.setitem(config["API_KEYS"], "GOOGLE_SEARCH_ENGINE_ID", "engine-id")
+    monkeypatch.setitem(config["SEARCH"], "RESULT_COUNT", 5)
+    search._result_cache.clear()
+    yield stub_server
+    search._result_cache.clear()
+
+
+def bing_results(*urls):
+    return {"webPages": {"value": [{"name": url, "url": url, "snippet": f"about {url}"} for url in urls]}}
+
+
+def google_results(*urls):
+    return {"items": [{"title": url, "link": url, "snippet": f"about {url}"} for url in urls]}
+
+
+def duckduckgo_results(*urls):
+    results = "".join(
+        f'<div class="result"><a class="result__a" href="//duckduckgo.com/l/?uddg={quote(url, safe="")}">{url}</a>'
+        f'<a class="result__snippet">about {url}</a></div>'
+        for url in urls
+    )
+    ad = '<div class="result result--ad"><a class="result__a" href="https://ads.example.com/">ad</a></div>'
+    return f"<html><body>{ad}{results}</body></html>"
+
+
+def test_bing_sends_the_key_and_parses_results(engines):
+    engines.route("/bing", (200, {}, bing_results("https://a.example.com/", "https://b.example.com/")))
+
+    results = BingSearch().search("flask sessions")
+
+    assert [result["url"] for result in results] == ["https://a.example.com/", "https://b.example.com/"]
+    assert results[0]["snippet"] == "about https://a.example.com/"
+    request, = engines.requests_to("/bing")
+    assert request["headers"]["Ocp-Apim-Subscription-Key"] == "bing-key"
+
+
+def test_results_are_cached_per_query(engines):
+    engines.route("/bing", (200, {}, bing_results("https://a.example.com/")))
+
+    BingSearch().search("flask sessions")
+    results = BingSearch().search("  Flask Sessions ")
+
+    assert [result["url"] for result in results] == ["https://a.example.com/"]
+    assert len(engines.requests_to("/bing")) == 1
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_google_retries_rate_limits_and_server_errors(engines, status):
+    engines.route("/google", (status, {}, ""), (status, {}, ""), (200, {}, google_results("https://a.example.com/")))
+
+    results = GoogleSearch().search("flask sessions")
+
+    assert [result["url"] for result in results] == ["https://a.example.com/"]
+    assert len(engines.requests_to("/google")) == 3
+
+
+def test_failure_after_the_retries_gives_no_results(engines):
+    engines.route("/google", (500, {}, ""))
+
+    assert GoogleSearch().search("flask sessions") == []
+    assert len(engines.requests_to("/google")) == 3
+
+
+def test_duckduckgo_post_is_retried_and_follows_the_redirect_links(engines):
+    engines.route("/duckduckgo", (502, {}, ""), (200, {"Content-Type": "text/html"}, duckduckgo_results(
+        "https://a.example.com/docs?page=1", "https://b.example.com/",
+    )))
+
+    results = DuckDuckGoSearch().search("flask sessions")
+
+    assert [result["url"] for result in results] == ["https://a.example.com/docs?page=1", "https://b.example.com/"]
+    assert results[1]["snippet"] == "about https://b.example.com/"
+    requests = engines.requests_to("/duckduckgo")
+    assert [request["method"] for request in requests] == ["POST", "POST"]
+    assert parse_qs(requests[-1]["body"]) == {"q": ["flask sessions"]}
+
+
+def test_federated_search_merges_by_canonical_url(engines):
+    engines.route("/bing", (200, {}, bing_results("https://a.example.com/", "https://b.example.com/")))
+    engines.route("/google", (200, {}, google_results("https://www.b.example.com/", "https://c.example.com/")))
+    engines.route("/duckduckgo", (200, {}, duckduckgo_results("http://b.example.com/", "https://a.example.com/")))
+
+    results = FederatedSearch().search("flask sessions")
+
+    # b is ranked by all three engines, a by two, c by one
+    assert [search.canonical_url(result["url"]) for result in results] == [
+        "b.example.com/", "a.example.com/", "c.example.com/",
+    ]
+
+
+def test_federated_search_skips_engines_without_keys(engines, monkeypatch):
+    monkeypatch.setitem(Config().config["API_KEYS"], "BING", "<YOUR_BING_API_KEY>")
+    engines.route("/google", (200, {}, google_results("https://a.example.com/")))
+    engines.route("/duckduckgo", (500, {}, ""))
+
+    results = FederatedSearch().search("flask sessions")
+
+    assert [result["url"] for result in results] == ["https://a.example.com/"]
+    assert engines.requests_to("/bing") == []
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from src.config import Config
+from src.services.url_cache import UrlCache
+
+
+@pytest.fixture
+def url_cache(tmp_path, monkeypatch):
+    monkeypatch.setitem(Config().config["STORAGE"], "CACHE_DIR", str(tmp_path))
+    return UrlCache(extract=lambda page: page["html"].upper())
+
+
+def expire(url_cache: UrlCache, url: str):
+    entry = url_cache._read(url)
+    entry["fetched_at"] = time.time() - entry["ttl"] - 1
+    url_cache._write(url, entry)
+
+
+def test_fresh_entry_is_served_without_a_request(url_cache, stub_server):
+    url = f"{stub_server.url}/page"
+    url_cache.put(url, "<p>old</p>", "old", {"Cache-Control": "max-age=600", "ETag": '"v1"'})
+
+    assert url_cache.get(url)["text"] == "old"
+    assert stub_server.requests_to("/page") == []
+
+
+def test_unchanged_page_is_revalidated_with_304(url_cache, stub_server):
+    url = f"{stub_server.url}/page"
+    url_cache.put(url, "<p>old</p>", "old", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    expire(url_cache, url)
+    stub_server.route("/page", (304, {"Cache-Control": "max-age=600"}, ""))
+
+    entry = url_cache.get(url)
+
+    assert entry["text"] == "old"
+    request, = stub_server.requests_to("/page")
+    assert request["headers"]["If-None-Match"] == '"v1"'
+    assert request["headers"]["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    # fresh again for the new max-age
+    assert url_cache.get(url)["text"] == "old"
+    assert len(stub_server.requests_to("/page")) == 1
+
+
+def test_changed_page_is_stored_from_the_200_response(url_cache, stub_server):
+    url = f"{stub_server.url}/page"
+    url_cache.put(url, "<p>old</p>", "old", {"ETag": '"v1"'})
+    expire(url_cache, url)
+    stub_server.route("/page", (200, {"ETag": '"v2"', "Content-Type": "text/html"}, "<p>new</p>"))
+
+    entry = url_cache.get(url)
+
+    assert entry["html"] == "<p>new</p>"
+    assert entry["text"] == "<P>NEW</P>"
+    assert entry["etag"] == '"v2"'
+
+    stored = url_cache.get(url)
+    assert stored["html"] == "<p>new</p>"
+    assert len(stub_server.requests_to("/page")) == 1
+
+
+def test_changed_page_without_extractor_is_dropped(url_cache, stub_server):
+    url = f"{stub_server.url}/page"
+    url_cache.put(url, "<p>old</p>", "old", {"ETag": '"v1"'})
+    expire(url_cache, url)
+    stub_server.route("/page", (200, {}, "<p>new</p>"))
+
+    url_cache.extract = None
+    assert url_cache.get(url) is None
+
+
+def test_no_cache_page_is_revalidated_on_every_use(url_cache, stub_server):
+    url = f"{stub_server.url}/page"
+    url_cache.put(url, "<p>old</p>", "old", {"Cache-Control": "no-cache", "ETag": '"v1"'})
+    stub_server.route("/page", (304, {"Cache-Control": "no-cache"}, ""))
+
+    assert url_cache.get(url)["text"] == "old"
+    assert url_cache.get(url)["text"] == "old"
+    assert len(stub_server.requests_to("/page")) == 2
+
+
+def test_304_with_max_age_0_is_revalidated_on_the_next_use(url_cache, stub_server):
+    url = f"{stub_server.url}/page"
+    url_cache.put(url, "<p>old</p>", "old", {"Cache-Control": "max-age=600", "ETag": '"v1"'})
+    expire(url_cache, url)
+    stub_server.route("/page", (304, {"Cache-Control": "max-age=0, must-revalidate"}, ""))
+
+    assert url_cache.get(url)["ttl"] == 0
+    assert url_cache.get(url)["text"] == "old"
+    assert len(stub_server.requests_to("/page")) == 2
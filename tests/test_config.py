@@ -0,0 +1,27 @@
+import logging
+
+from src.config import Config
+
+
+def test_failing_subscriber_is_logged_not_printed(monkeypatch, caplog, capsys):
+    config = Config()
+    # the subscribers and the changed value are put back afterwards
+    monkeypatch.setattr(config, "_subscribers", list(config._subscribers))
+    monkeypatch.setattr(config, "_snapshot", config._snapshot)
+    monkeypatch.setitem(config.config["SEARCH"], "RESULT_COUNT", config.config["SEARCH"]["RESULT_COUNT"])
+    received = []
+
+    def failing(changes):
+        raise RuntimeError("subscriber broke")
+
+    config.subscribe(failing, "SEARCH")
+    config.subscribe(received.append, "SEARCH")
+
+    with caplog.at_level(logging.ERROR, logger="swea.config"):
+        config.config["SEARCH"]["RESULT_COUNT"] += 1
+        config._notify()
+
+    record, = [record for record in caplog.records if record.name == "swea.config"]
+    assert "subscriber broke" in record.exc_text
+    assert received == [{"SEARCH": {"RESULT_COUNT": config.config["SEARCH"]["RESULT_COUNT"]}}]
+    assert capsys.readouterr().out == ""
@@ -158,8 +158,9 @@ export async function updateSettings(settings) {
   });
 }
 
-export async function fetchLogs() {
-  const response = await fetch(`${API_BASE_URL}/api/logs`);
-  const data = await response.json();
-  return data.logs;
+export async function fetchLogs(cursor = null, lines = 100) {
+  const params = new URLSearchParams({ lines });
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${API_BASE_URL}/api/logs?${params}`);
+  return await response.json();
 }